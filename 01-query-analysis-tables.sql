@@ -2,13 +2,34 @@ CREATE DATABASE IF NOT EXISTS schedules;
 USE schedules;
 CREATE SCHEMA IF NOT EXISTS workload_test;
 
+-- Index layout parameter: the time-ordered indexes below use the default range layout
+-- (index_layout=range).  For index_layout=hash run 01a-hash-sharded-indexes.sql right
+-- after this script to swap them for hash-sharded variants with the same names.
+
 
 DROP TABLE IF EXISTS workload_test.test_run_configurations CASCADE;
 DROP TABLE IF EXISTS workload_test.ingest_state CASCADE;
+DROP TABLE IF EXISTS workload_test.ingest_leases CASCADE;
+DROP TABLE IF EXISTS workload_test.ingest_replicas CASCADE;
+DROP TABLE IF EXISTS workload_test.agg_bucket_state CASCADE;
+DROP TABLE IF EXISTS workload_test.contention_graphs CASCADE;
+DROP TABLE IF EXISTS workload_test.plan_changes CASCADE;
+DROP TABLE IF EXISTS workload_test.client_latency CASCADE;
+DROP TABLE IF EXISTS workload_test.stmt_table_refs CASCADE;
+DROP VIEW IF EXISTS workload_test.inspection_cache_stats;
+DROP TABLE IF EXISTS workload_test.inspection_cache_results CASCADE;
+DROP TABLE IF EXISTS workload_test.inspection_cache_entries CASCADE;
 DROP TABLE IF EXISTS workload_test.transaction_contention_events CASCADE;
 DROP TABLE IF EXISTS workload_test.cluster_execution_insights CASCADE;
 DROP TABLE IF EXISTS workload_test.txn_id_map CASCADE;
 DROP TABLE IF EXISTS workload_test.cluster_transaction_statistics CASCADE;
+-- after 01b-dedup-stmt-stats.sql cluster_statement_statistics is a view over the dedup
+-- table, which DROP TABLE refuses.  Dropping the dedup table and the dictionaries first
+-- with CASCADE takes the view with them, so the DROP below only ever sees the table or
+-- nothing (DROP VIEW IF EXISTS can't be used here, it fails when the name is a table).
+DROP TABLE IF EXISTS workload_test.cluster_statement_statistics_dedup CASCADE;
+DROP TABLE IF EXISTS workload_test.stmt_fingerprint_dictionary CASCADE;
+DROP TABLE IF EXISTS workload_test.plan_dictionary CASCADE;
 DROP TABLE IF EXISTS workload_test.cluster_statement_statistics CASCADE;
 
 
@@ -27,17 +48,70 @@ CREATE TABLE workload_test.test_run_configurations (
 WITH (ttl = 'on', ttl_expiration_expression = e'(end_time + INTERVAL \'90 days\')');
 
 
--- track ingestion state for each stream to enable incremental copying and backfilling
+-- track ingestion state for each stream to enable incremental copying and backfilling;
+-- last_rows_at moves only when a commit wrote rows, it invalidates cached inspections
 CREATE TABLE IF NOT EXISTS workload_test.ingest_state (
   test_run     STRING NOT NULL,
   stream       STRING NOT NULL,
   watermark_ts TIMESTAMPTZ NOT NULL,
   updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+  last_rows_at TIMESTAMPTZ,
   PRIMARY KEY (test_run, stream)
 )
 WITH (ttl = 'on', ttl_expiration_expression = e'(updated_at + INTERVAL \'90 days\')');
 
 
+-- ownership of each (test_run, stream) when several daemon replicas run; the epoch
+-- is bumped on every takeover and fences the watermark write of the previous owner
+CREATE TABLE IF NOT EXISTS workload_test.ingest_leases (
+  test_run     STRING NOT NULL,
+  stream       STRING NOT NULL,
+  owner        STRING NOT NULL,
+  epoch        INT8 NOT NULL DEFAULT 1,
+  expires_at   TIMESTAMPTZ NOT NULL,
+  updated_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (test_run, stream),
+  INDEX idx_leases_by_owner (owner) STORING (epoch, expires_at)
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(expires_at + INTERVAL \'1 day\')');
+
+
+-- daemon replicas and their last heartbeat, used to compute each replica's fair share
+CREATE TABLE IF NOT EXISTS workload_test.ingest_replicas (
+  replica_id   STRING PRIMARY KEY,
+  heartbeat_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(heartbeat_at + INTERVAL \'1 day\')');
+
+
+-- hourly aggregation buckets of the stats streams; a bucket is re-synced while it is
+-- open and marked closed once its statistics stop changing after the hour ended
+CREATE TABLE IF NOT EXISTS workload_test.agg_bucket_state (
+  test_run       STRING NOT NULL,
+  stream         STRING NOT NULL,
+  aggregated_ts  TIMESTAMPTZ NOT NULL,
+  last_synced_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  closed_at      TIMESTAMPTZ NULL,
+  PRIMARY KEY (test_run, stream, aggregated_ts)
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(aggregated_ts + INTERVAL \'90 days\')');
+
+
+-- contention dependency graphs computed by analysis/contention_graph.py --store;
+-- result holds the blame ranking, blocking cycles and heaviest chains for the window
+CREATE TABLE IF NOT EXISTS workload_test.contention_graphs (
+  test_run     STRING NOT NULL,
+  window_start TIMESTAMPTZ NOT NULL,
+  window_end   TIMESTAMPTZ NOT NULL,
+  computed_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  nodes        INT8 NOT NULL,
+  edges        INT8 NOT NULL,
+  result       JSONB NOT NULL,
+  PRIMARY KEY (test_run, window_start, window_end)
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(window_end + INTERVAL \'90 days\')');
+
+
 -- crdb_internal.transaction_contention_events
 CREATE TABLE workload_test.transaction_contention_events (
 	id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -168,3 +242,121 @@ CREATE TABLE workload_test.cluster_statement_statistics (
 		STORING (metadata, statistics, sampled_plan, aggregation_interval, index_recommendations)
 )
 WITH (ttl = 'on', ttl_expiration_expression = e'(aggregated_ts + INTERVAL \'90 days\')');
+
+
+-- statement fingerprints that switched plans mid-run, detected by the daemon while
+-- ingesting stmt_stats; latency is the mean service latency (s) of each plan
+CREATE TABLE workload_test.plan_changes (
+	id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    test_run STRING NOT NULL,
+	fingerprint_id BYTES NOT NULL,
+	app_name STRING NOT NULL,
+	aggregated_ts TIMESTAMPTZ NOT NULL,
+	detected_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+	old_plan_hash BYTES NOT NULL,
+	new_plan_hash BYTES NOT NULL,
+	old_aggregated_ts TIMESTAMPTZ NOT NULL,
+	latency_before FLOAT8 NULL,
+	latency_after FLOAT8 NULL,
+	executions_after INT8 NOT NULL,
+    CONSTRAINT fk_trpc_to_trc FOREIGN KEY (test_run)
+        REFERENCES workload_test.test_run_configurations (test_run)
+		ON DELETE CASCADE,
+    INDEX idx_plan_changes_by_run (test_run, aggregated_ts)
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(aggregated_ts + INTERVAL \'90 days\')');
+
+
+-- client-observed latency of each workload op, one HDR-style histogram per second and
+-- workload process: histogram maps a bucket's lower bound in microseconds to its count,
+-- with 32 linear sub-buckets per power of two (under 3% error)
+CREATE TABLE workload_test.client_latency (
+    test_run STRING NOT NULL,
+	op STRING NOT NULL,
+	second TIMESTAMPTZ NOT NULL,
+	client_id STRING NOT NULL,
+	count INT8 NOT NULL,
+	mean_ms FLOAT8 NOT NULL,
+	min_ms FLOAT8 NOT NULL,
+	p50_ms FLOAT8 NOT NULL,
+	p90_ms FLOAT8 NOT NULL,
+	p99_ms FLOAT8 NOT NULL,
+	max_ms FLOAT8 NOT NULL,
+	histogram JSONB NOT NULL,
+	PRIMARY KEY (test_run, op, second, client_id)
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(second + INTERVAL \'90 days\')');
+
+
+-- tables each statement fingerprint reads or writes, parsed once by the daemon when the
+-- fingerprint is first ingested (no TTL: rows are shared by every test run)
+CREATE TABLE workload_test.stmt_table_refs (
+	fingerprint_id BYTES NOT NULL,
+	database_name STRING NOT NULL,
+	schema_name STRING NOT NULL,
+	table_name STRING NOT NULL,
+	access_kind STRING NOT NULL,    -- read | write
+	first_seen TIMESTAMPTZ NOT NULL DEFAULT now(),
+	PRIMARY KEY (fingerprint_id, database_name, schema_name, table_name, access_kind),
+	INDEX idx_stmt_table_refs_by_table (table_name, schema_name, database_name)
+);
+
+
+-- inspections are cached per parsed exception signature and call options; an entry is
+-- valid while no ingest has landed rows for its run since it was computed
+CREATE TABLE workload_test.inspection_cache_entries (
+  test_run          STRING NOT NULL,
+  signature         STRING NOT NULL,     -- md5 of the parsed signature and options
+  retry_error_type  STRING,
+  contention_key    STRING,
+  txn_id_prefix     STRING,
+  conflict_ts       TIMESTAMPTZ,
+  app_name          STRING,
+  schema_name       STRING,
+  option            STRING,
+  valid_as_of       TIMESTAMPTZ,         -- max(ingest_state.last_rows_at) when computed
+  computed_at       TIMESTAMPTZ NOT NULL DEFAULT now(),
+  last_hit_at       TIMESTAMPTZ,
+  hits              INT8 NOT NULL DEFAULT 0,
+  misses            INT8 NOT NULL DEFAULT 0,
+  PRIMARY KEY (test_run, signature),
+  CONSTRAINT fk_ice_to_trc FOREIGN KEY (test_run)
+      REFERENCES workload_test.test_run_configurations (test_run)
+  ON DELETE CASCADE
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(computed_at + INTERVAL \'30 days\')');
+
+
+CREATE TABLE workload_test.inspection_cache_results (
+  test_run                 STRING NOT NULL,
+  signature                STRING NOT NULL,
+  row_no                   INT NOT NULL,
+  ord                      INT,
+  role                     STRING,
+  status                   STRING,
+  collection_ts            TIMESTAMPTZ,
+  aggregated_ts            TIMESTAMPTZ,
+  app_name                 STRING,
+  database_name            STRING,
+  schema_name              STRING,
+  table_name               STRING,
+  index_name               STRING,
+  txn_metadata             JSONB,
+  txn_statistics           JSONB,
+  contention_type          STRING,
+  contention               BOOL,
+  fingerprint_id           BYTES,
+  transaction_fingerprint_id BYTES,
+  plan_hash                BYTES,
+  stmt_metadata            JSONB,
+  stmt_statistics          JSONB,
+  sampled_plan             JSONB,
+  aggregation_interval     INTERVAL,
+  index_recommendations    STRING[],
+  computed_at              TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (test_run, signature, row_no),
+  CONSTRAINT fk_icr_to_trc FOREIGN KEY (test_run)
+      REFERENCES workload_test.test_run_configurations (test_run)
+  ON DELETE CASCADE
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(computed_at + INTERVAL \'30 days\')');
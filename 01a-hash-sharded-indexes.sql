@@ -0,0 +1,38 @@
+USE schedules;
+
+-- Optional index layout for 01-query-analysis-tables.sql (index_layout=hash).
+--
+-- The default (range) layout leads every time-ordered index with collection_ts or
+-- (test_run, aggregated_ts), so each slice the daemon writes lands on the tail of the
+-- same range.  The hash-sharded variants below keep the same index names, columns and
+-- STORING lists (so ON CONFLICT ON CONSTRAINT and the analysis queries are unchanged),
+-- but spread the writes across bucket_count shards.
+--
+-- Run this right after 01-query-analysis-tables.sql, while the tables are still empty.
+
+
+-- transaction_contention_events: time-ordered scan index
+DROP INDEX IF EXISTS workload_test.transaction_contention_events@idx_trce_by_collection_ts;
+
+CREATE INDEX idx_trce_by_collection_ts
+	ON workload_test.transaction_contention_events (collection_ts DESC, id DESC)
+	USING HASH WITH (bucket_count = 16)
+	STORING (test_run, blocking_txn_id, blocking_txn_fingerprint_id, waiting_txn_id, waiting_txn_fingerprint_id, contention_duration, contending_key, contending_pretty_key, waiting_stmt_id, waiting_stmt_fingerprint_id, database_name, schema_name, table_name, index_name, contention_type);
+
+
+-- cluster_transaction_statistics: upsert key used by the txn_stats stream
+DROP INDEX IF EXISTS workload_test.cluster_transaction_statistics@uq_txn_stats CASCADE;
+
+CREATE UNIQUE INDEX uq_txn_stats
+	ON workload_test.cluster_transaction_statistics (test_run, aggregated_ts, fingerprint_id, app_name)
+	USING HASH WITH (bucket_count = 16)
+	STORING (metadata, statistics, aggregation_interval);
+
+
+-- cluster_statement_statistics: upsert key used by the stmt_stats stream
+DROP INDEX IF EXISTS workload_test.cluster_statement_statistics@uq_stmt_stats CASCADE;
+
+CREATE UNIQUE INDEX uq_stmt_stats
+	ON workload_test.cluster_statement_statistics (test_run, aggregated_ts, fingerprint_id, transaction_fingerprint_id, plan_hash, app_name)
+	USING HASH WITH (bucket_count = 16)
+	STORING (metadata, statistics, sampled_plan, aggregation_interval, index_recommendations);
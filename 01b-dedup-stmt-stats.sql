@@ -0,0 +1,86 @@
+USE schedules;
+
+-- Optional deduplicated layout for statement statistics (STMT_STATS_LAYOUT=dedup).
+--
+-- Every hourly row in cluster_statement_statistics repeats the fingerprint's metadata
+-- (query text, querySummary, db, flags) and the sampled_plan for an unchanged plan_hash.
+-- This layout stores those once per fingerprint / (fingerprint, plan_hash) in two
+-- dictionary tables, keeps only the per-bucket statistics in the hourly rows, and
+-- replaces cluster_statement_statistics with a compatibility view of the same shape,
+-- so the analysis SQL and the inspect_contention_from_exception routines keep working.
+--
+-- Run this after 01-query-analysis-tables.sql, then start the daemon with
+-- STMT_STATS_LAYOUT=dedup.  uq_stmt_stats on the dedup table is declared with the
+-- range layout; for index_layout=hash recreate it with the USING HASH variant from
+-- 01a-hash-sharded-indexes.sql (same columns, STORING only the columns below).
+
+
+DROP TABLE IF EXISTS workload_test.cluster_statement_statistics_dedup CASCADE;
+DROP TABLE IF EXISTS workload_test.stmt_fingerprint_dictionary CASCADE;
+DROP TABLE IF EXISTS workload_test.plan_dictionary CASCADE;
+DROP TABLE IF EXISTS workload_test.cluster_statement_statistics CASCADE;
+
+
+-- metadata per statement fingerprint, minus the plan dependent flags
+-- (no TTL: rows are shared by every test run that executes the fingerprint)
+CREATE TABLE workload_test.stmt_fingerprint_dictionary (
+	fingerprint_id BYTES PRIMARY KEY,
+	metadata JSONB NOT NULL,
+	first_seen TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+
+-- sampled plan and plan dependent metadata flags (distsql, fullScan, vec) per plan
+CREATE TABLE workload_test.plan_dictionary (
+	fingerprint_id BYTES NOT NULL,
+	plan_hash BYTES NOT NULL,
+	plan_flags JSONB NOT NULL,
+	sampled_plan JSONB NOT NULL,
+	first_seen TIMESTAMPTZ NOT NULL DEFAULT now(),
+	PRIMARY KEY (fingerprint_id, plan_hash)
+);
+
+
+-- crdb_internal.cluster_statement_statistics, per bucket values only
+CREATE TABLE workload_test.cluster_statement_statistics_dedup (
+	id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    test_run STRING NOT NULL,
+	aggregated_ts TIMESTAMPTZ NOT NULL,
+	fingerprint_id BYTES NOT NULL,
+	transaction_fingerprint_id BYTES NOT NULL,
+	plan_hash BYTES NOT NULL,
+	app_name STRING NOT NULL,
+	statistics JSONB NOT NULL,
+	aggregation_interval INTERVAL NOT NULL,
+	index_recommendations STRING[] NOT NULL,
+    CONSTRAINT fk_trssd_to_trc FOREIGN KEY (test_run)
+        REFERENCES workload_test.test_run_configurations (test_run)
+		ON DELETE CASCADE,
+    CONSTRAINT uq_stmt_stats
+		UNIQUE (test_run, aggregated_ts, fingerprint_id, transaction_fingerprint_id, plan_hash, app_name)
+		STORING (statistics, aggregation_interval, index_recommendations)
+)
+WITH (ttl = 'on', ttl_expiration_expression = e'(aggregated_ts + INTERVAL \'90 days\')');
+
+
+-- compatibility view with the columns of the original table
+CREATE VIEW workload_test.cluster_statement_statistics AS
+SELECT
+	s.id,
+	s.test_run,
+	s.aggregated_ts,
+	s.fingerprint_id,
+	s.transaction_fingerprint_id,
+	s.plan_hash,
+	s.app_name,
+	COALESCE(f.metadata, '{}'::JSONB) || COALESCE(p.plan_flags, '{}'::JSONB) AS metadata,
+	s.statistics,
+	COALESCE(p.sampled_plan, '{}'::JSONB) AS sampled_plan,
+	s.aggregation_interval,
+	s.index_recommendations
+FROM workload_test.cluster_statement_statistics_dedup AS s
+LEFT JOIN workload_test.stmt_fingerprint_dictionary AS f
+  ON f.fingerprint_id = s.fingerprint_id
+LEFT JOIN workload_test.plan_dictionary AS p
+  ON p.fingerprint_id = s.fingerprint_id
+ AND p.plan_hash = s.plan_hash;
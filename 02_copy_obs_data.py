@@ -1,17 +1,36 @@
 #!/usr/bin/env python3
 
 import os
+import sys
+import json
+import queue
 import time
+import heapq
+import pstats
 import signal
+import re
 import random
+import socket
+import cProfile
+import hashlib
 import logging
+import threading
+import argparse
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
 from logging.handlers import RotatingFileHandler
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Tuple, Any
 
 import psycopg
 from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
 
 from prometheus_client import start_http_server, Counter, Gauge, Histogram
 
@@ -24,11 +43,26 @@ LOG_FILE = os.getenv("LOG_FILE", "/var/log/copy_obs_data.log")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
 METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+CONTROL_PORT = int(os.getenv("CONTROL_PORT", "8001"))    # 0 disables the control endpoints
+
+# on-demand cProfile/tracemalloc capture (SIGUSR1 or GET /profile?loops=N)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/copy_obs_data_profiles")
+PROFILE_LOOPS = int(os.getenv("PROFILE_LOOPS", "5"))
+
+# always-on record of the slowest ticks with their per-stream breakdown
+SLOW_TICK_TOP_K = int(os.getenv("SLOW_TICK_TOP_K", "10"))
+SLOW_TICK_LOG_SECONDS = float(os.getenv("SLOW_TICK_LOG_SECONDS", "5"))
 
 LOOP_INTERVAL_SECONDS = float(os.getenv("LOOP_INTERVAL_SECONDS", "15"))
 JITTER_SECONDS = float(os.getenv("JITTER_SECONDS", "3"))
 
+# schema holding the observability sources; benchmarks point this at stand-in tables,
+# which accept DML the crdb_internal virtual tables reject (see backfill_contention)
+SOURCE_SCHEMA = os.getenv("SOURCE_SCHEMA", "crdb_internal")
+
 SLICE_SECONDS = int(os.getenv("SLICE_SECONDS", "30"))
+# slice size used when draining a run on demand (GET /flush?test_run=...)
+FLUSH_SLICE_SECONDS = int(os.getenv("FLUSH_SLICE_SECONDS", "3600"))
 SAFETY_DELAY_SECONDS = int(os.getenv("SAFETY_DELAY_SECONDS", "5"))
 
 BACKFILL_ENABLED = os.getenv("BACKFILL_ENABLED", "true").lower() in ("1", "true", "yes")
@@ -36,12 +70,94 @@ BACKFILL_EVERY_N_LOOPS = int(os.getenv("BACKFILL_EVERY_N_LOOPS", "20"))
 BACKFILL_WINDOW_HOURS = int(os.getenv("BACKFILL_WINDOW_HOURS", "2"))
 BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "250"))
 
+INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE", "500"))
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "100000"))
+
+# slice -> agg streams advance a watermark over aggregated_ts like the live streams
+# bucket -> keep the open hourly buckets under watch and re-upsert changed rows only
+AGG_SYNC_MODE = os.getenv("AGG_SYNC_MODE", "slice").lower()
+# after the hour ends, wait this long for the last in-memory stats flush before closing
+AGG_BUCKET_CLOSE_SECONDS = int(os.getenv("AGG_BUCKET_CLOSE_SECONDS", "900"))
+
+# commit live/slice-mode streams in sub-slices of this many seconds, each with its own
+# watermark (0 = one transaction per slice); bucket mode commits one bucket at a time
+COMMIT_CHUNK_SECONDS = int(os.getenv("COMMIT_CHUNK_SECONDS", "0"))
+# client-side retries of a chunk on serialization failures (40001), backoff doubles per retry
+COMMIT_RETRIES = int(os.getenv("COMMIT_RETRIES", "3"))
+COMMIT_RETRY_BACKOFF_MS = int(os.getenv("COMMIT_RETRY_BACKOFF_MS", "100"))
+
+# replicas share (test_run, stream) work through leases in workload_test.ingest_leases
+LEASES_ENABLED = os.getenv("LEASES_ENABLED", "true").lower() in ("1", "true", "yes")
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS", "60"))
+REPLICA_ID = os.getenv("REPLICA_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+# full  -> cluster_statement_statistics holds metadata/sampled_plan on every row
+# dedup -> 01b-dedup-stmt-stats.sql layout with fingerprint/plan dictionaries
+STMT_STATS_LAYOUT = os.getenv("STMT_STATS_LAYOUT", "full").lower()
+
+# record statement fingerprints that switch plans in workload_test.plan_changes
+PLAN_CHANGES_ENABLED = os.getenv("PLAN_CHANGES_ENABLED", "true").lower() in ("1", "true", "yes")
+# executions a new plan needs within one pass before it counts as the fingerprint's plan
+PLAN_CHANGE_MIN_EXECUTIONS = int(os.getenv("PLAN_CHANGE_MIN_EXECUTIONS", "10"))
+
+# parse statement fingerprints without refs yet into workload_test.stmt_table_refs
+TABLE_REFS_ENABLED = os.getenv("TABLE_REFS_ENABLED", "true").lower() in ("1", "true", "yes")
+
 LIVE_STREAMS = ("contention", "insights")
 AGG_STREAMS  = ("stmt_stats", "txn_stats")
 ALL_STREAMS  = LIVE_STREAMS + AGG_STREAMS
 
 ZERO_FP_HEX = "0000000000000000"
 
+# timestamp the sources are read at, for all streams or per stream
+#   current       read at the present timestamp inside the slice transaction
+#   follower      AS OF SYSTEM TIME follower_read_timestamp(), served by any replica
+#   staleness:N   AS OF SYSTEM TIME '-Ns'
+# e.g. READ_TIMESTAMP="follower" READ_TIMESTAMP_BY_STREAM="stmt_stats=staleness:30"
+READ_TIMESTAMP = os.getenv("READ_TIMESTAMP", "current")
+READ_TIMESTAMP_BY_STREAM = os.getenv("READ_TIMESTAMP_BY_STREAM", "")
+# how far follower_read_timestamp() trails now() with the default closed timestamp settings
+FOLLOWER_READ_LAG_SECONDS = float(os.getenv("FOLLOWER_READ_LAG_SECONDS", "5"))
+
+# priority of the daemon's own transactions, so they yield to the workload under test
+DAEMON_TXN_PRIORITY = os.getenv("DAEMON_TXN_PRIORITY", "low")
+
+# stretch the loop and shrink live slices while the cluster is saturated, judged by
+# node CPU (0-1) and the admission control wait queues in SOURCE_SCHEMA.node_metrics
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "true").lower() in ("1", "true", "yes")
+THROTTLE_CPU_HIGH = float(os.getenv("THROTTLE_CPU_HIGH", "0.8"))
+THROTTLE_QUEUE_HIGH = float(os.getenv("THROTTLE_QUEUE_HIGH", "10"))
+THROTTLE_MAX_FACTOR = float(os.getenv("THROTTLE_MAX_FACTOR", "8"))
+
+def _parse_read_mode(value: str) -> Tuple[str, float]:
+    """ "current" | "follower" | "staleness:N" -> (mode, seconds behind now) """
+    value = value.strip().lower()
+    if value == "current":
+        return "current", 0.0
+    if value == "follower":
+        return "follower", FOLLOWER_READ_LAG_SECONDS
+    if value.startswith("staleness:"):
+        return "staleness", float(value.partition(":")[2])
+    raise ValueError(f"Unknown read timestamp mode {value!r}")
+
+READ_MODES = {stream: _parse_read_mode(READ_TIMESTAMP) for stream in ALL_STREAMS}
+for _item in filter(None, (v.strip() for v in READ_TIMESTAMP_BY_STREAM.split(","))):
+    _stream, _, _mode = _item.partition("=")
+    READ_MODES[_stream.strip()] = _parse_read_mode(_mode)
+
+# per error class: consecutive failures before a (test_run, stream) breaker opens,
+# then the first and the longest backoff in seconds, e.g. BREAKER_POLICIES="schema=1:600:7200"
+BREAKER_POLICIES = {
+    "retryable":  (5, 5, 60),       # 40001 and other transaction rollbacks
+    "connection": (2, 10, 120),     # connection refused or lost
+    "schema":     (1, 300, 3600),   # class 42, e.g. source columns changed by an upgrade
+    "other":      (3, 30, 600),
+}
+for _item in filter(None, (v.strip() for v in os.getenv("BREAKER_POLICIES", "").split(","))):
+    _class, _, _policy = _item.partition("=")
+    _threshold, _backoff, _max_backoff = _policy.split(":")
+    BREAKER_POLICIES[_class.strip()] = (int(_threshold), float(_backoff), float(_max_backoff))
+
 log = logging.getLogger("copy-obs-data")
 log.setLevel(LOG_LEVEL)
 
@@ -64,6 +180,8 @@ file_handler.setFormatter(formatter)
 log.addHandler(file_handler)
 
 shutdown_requested = False
+# set to end the current sleep early: shutdown, or a flush request
+wake_event = threading.Event()
 
 # ==========================================================
 # PROMETHEUS METRICS
@@ -72,12 +190,33 @@ shutdown_requested = False
 INGEST_ROWS = Counter("obs_ingest_rows_total", "Rows inserted/updated", ["stream"])
 INGEST_ERRORS = Counter("obs_ingest_errors_total", "Ingest errors", ["stream"])
 INGEST_DURATION = Histogram("obs_ingest_duration_seconds", "Ingest duration", ["stream"])
+INGEST_ERROR_CLASSES = Counter("obs_ingest_error_classes_total", "Ingest errors by class", ["stream", "error_class"])
+BREAKER_STATE = Gauge("obs_breaker_state", "Stream circuit breaker: 0 closed, 1 half-open, 2 open", ["stream", "test_run"])
 
 ACTIVE_TEST_RUNS = Gauge("obs_active_test_runs", "Active test runs")
 WATERMARK_LAG = Gauge("obs_watermark_lag_seconds", "Watermark lag", ["stream", "test_run"])
 
 BACKFILL_UPDATED = Counter("obs_backfill_updated_total", "Placeholder updates", ["test_run"])
 
+OWNED_LEASES = Gauge("obs_owned_leases", "(test_run, stream) leases held by this replica", ["replica"])
+LIVE_REPLICAS = Gauge("obs_live_replicas", "Daemon replicas with a live heartbeat")
+LEASE_CHANGES = Counter("obs_lease_changes_total", "Leases acquired, released or lost", ["change"])
+
+COMMIT_RETRIES_TOTAL = Counter("obs_commit_retries_total", "Chunk transactions retried after a serialization failure", ["stream"])
+CHUNK_COMMITS = Counter("obs_chunk_commits_total", "Chunk transactions committed", ["stream"])
+
+AGG_ROWS_CHANGED = Counter("obs_agg_rows_changed_total", "Stats rows re-upserted after their cnt changed", ["stream"])
+PLAN_CHANGES = Counter("obs_plan_changes_total", "Statement fingerprints that switched plans", ["test_run"])
+TABLE_REFS_PARSED = Counter("obs_stmt_table_refs_parsed_total", "Statement fingerprints parsed for table refs")
+
+CLUSTER_CPU = Gauge("obs_cluster_cpu_ratio", "Node CPU sampled for the throttle")
+ADMISSION_QUEUE = Gauge("obs_cluster_admission_queue", "Admission control wait queue length sampled for the throttle")
+THROTTLE_FACTOR = Gauge("obs_throttle_factor", "Loop interval multiplier and live slice divisor")
+DAEMON_OVERHEAD = Gauge("obs_daemon_overhead_ratio", "Estimated share of wall time the daemon has work on the cluster")
+
+DEDUP_CACHE_HITS = Counter("obs_dedup_cache_hits_total", "Rows skipped as already persisted", ["table"])
+DEDUP_CACHE_MISSES = Counter("obs_dedup_cache_misses_total", "Rows written after a cache miss", ["table"])
+
 # ==========================================================
 # SIGNAL HANDLING
 # ==========================================================
@@ -85,11 +224,9 @@ BACKFILL_UPDATED = Counter("obs_backfill_updated_total", "Placeholder updates",
 def _handle_signal(sig, frame):
     global shutdown_requested
     shutdown_requested = True
+    wake_event.set()
     log.info("Shutdown requested...")
 
-signal.signal(signal.SIGINT, _handle_signal)
-signal.signal(signal.SIGTERM, _handle_signal)
-
 # ==========================================================
 # DB HELPERS
 # ==========================================================
@@ -97,8 +234,28 @@ signal.signal(signal.SIGTERM, _handle_signal)
 def get_connection():
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL not set")
+    if DAEMON_TXN_PRIORITY:
+        return psycopg.connect(DATABASE_URL, autocommit=False,
+                               options=f"-c default_transaction_priority={DAEMON_TXN_PRIORITY}")
     return psycopg.connect(DATABASE_URL, autocommit=False)
 
+def read_source(conn, stream, sql, params=None):
+    """
+    Read source rows for a stream at its READ_MODES timestamp.  Stale reads run in
+    their own read-only transaction, since AS OF SYSTEM TIME can't be combined
+    with the writes of the slice transaction.
+    """
+    mode, lag = READ_MODES[stream]
+    if mode == "current":
+        return fetchall(conn, sql, params)
+
+    aost = "follower_read_timestamp()" if mode == "follower" else f"'-{lag:g}s'"
+    with get_connection() as rconn:
+        execute(rconn, f"SET TRANSACTION AS OF SYSTEM TIME {aost}")
+        rows = fetchall(rconn, sql, params)
+        rconn.commit()
+    return rows
+
 def fetchall(conn, sql, params=None):
     with conn.cursor(row_factory=dict_row) as cur:
         cur.execute(sql, params)
@@ -173,190 +330,1004 @@ def set_watermark(conn, test_run, stream, ts):
         (test_run, stream, ts)
     )
 
+def mark_rows_landed(conn, test_run, stream):
+    """Stamp last_rows_at in the committing transaction, cached inspections of the run go stale."""
+    execute(conn,
+        "UPDATE workload_test.ingest_state SET last_rows_at = now() WHERE test_run=%s AND stream=%s",
+        (test_run, stream)
+    )
+
+# ==========================================================
+# LEASES
+# ==========================================================
+
+class LeaseLost(Exception):
+    pass
+
+# (test_run, stream) -> epoch of the leases we hold
+_owned_leases: dict = {}
+
+SQL_HEARTBEAT = """
+UPSERT INTO workload_test.ingest_replicas (replica_id, heartbeat_at) VALUES (%s, now())
+"""
+
+SQL_LIVE_REPLICAS = """
+SELECT count(*) AS replicas
+FROM workload_test.ingest_replicas
+WHERE heartbeat_at > now() - %s * INTERVAL '1 second'
+"""
+
+SQL_RENEW_LEASES = """
+UPDATE workload_test.ingest_leases
+SET expires_at = now() + %s * INTERVAL '1 second', updated_at = now()
+WHERE owner = %s
+  AND expires_at > now()
+RETURNING test_run, stream, epoch
+"""
+
+SQL_LEASES = """
+SELECT test_run, stream, owner, expires_at <= now() AS expired
+FROM workload_test.ingest_leases
+WHERE test_run = ANY(%s)
+"""
+
+SQL_CLAIM_LEASE = """
+INSERT INTO workload_test.ingest_leases (test_run, stream, owner, epoch, expires_at)
+VALUES (%s, %s, %s, 1, now() + %s * INTERVAL '1 second')
+ON CONFLICT (test_run, stream) DO UPDATE
+SET owner = excluded.owner,
+    epoch = ingest_leases.epoch + 1,
+    expires_at = excluded.expires_at,
+    updated_at = now()
+WHERE ingest_leases.expires_at <= now()
+RETURNING epoch
+"""
+
+SQL_RELEASE_LEASE = """
+DELETE FROM workload_test.ingest_leases WHERE test_run = %s AND stream = %s AND owner = %s
+"""
+
+SQL_FENCE_LEASE = """
+SELECT 1 AS held
+FROM workload_test.ingest_leases
+WHERE test_run = %s AND stream = %s AND owner = %s AND epoch = %s AND expires_at > now()
+"""
+
+def plan_leases(keys, owned, replicas) -> Tuple[list, int]:
+    """
+    (owned leases to release, how many more to claim) to hold the fair share
+    ceil(keys / replicas): leases of inactive keys go first, then the active ones
+    beyond the share, highest keys first so replicas agree on what to shed.
+    """
+    share = -(-len(keys) // max(1, replicas))
+    active = set(keys)
+    release = [k for k in sorted(owned) if k not in active]
+    release += sorted(k for k in owned if k in active)[share:]
+    return release, share - (len(owned) - len(release))
+
+def sync_leases(runs):
+    """
+    Heartbeat, renew what we hold, then release or claim leases until we own our
+    fair share, ceil(keys / live replicas), of the active (test_run, stream) keys.
+    A replica that joins takes over what the others release; leases of a replica
+    that dies expire after LEASE_SECONDS and are claimed with a new epoch.
+    """
+    if not LEASES_ENABLED:
+        return
+
+    keys = [(r.test_run, s) for r in runs for s in ALL_STREAMS]
+    with get_connection() as conn:
+        execute(conn, SQL_HEARTBEAT, (REPLICA_ID,))
+        replicas = max(1, fetchone(conn, SQL_LIVE_REPLICAS, (LEASE_SECONDS,))["replicas"])
+        renewed = fetchall(conn, SQL_RENEW_LEASES, (LEASE_SECONDS, REPLICA_ID))
+        conn.commit()
+
+        for key in set(_owned_leases) - {(r["test_run"], r["stream"]) for r in renewed}:
+            log.warning("Lease on %s/%s expired before renewal", *key)
+            LEASE_CHANGES.labels(change="lost").inc()
+        _owned_leases.clear()
+        _owned_leases.update({(r["test_run"], r["stream"]): r["epoch"] for r in renewed})
+
+        extra, deficit = plan_leases(keys, _owned_leases, replicas)
+        for key in extra:
+            execute(conn, SQL_RELEASE_LEASE, (*key, REPLICA_ID))
+            conn.commit()
+            del _owned_leases[key]
+            LEASE_CHANGES.labels(change="released").inc()
+
+        if deficit > 0:
+            held = {(r["test_run"], r["stream"]): r for r in
+                    fetchall(conn, SQL_LEASES, (list({r.test_run for r in runs}),))}
+            free = [k for k in keys if k not in held or held[k]["expired"]]
+            random.shuffle(free)
+            for key in free[:deficit]:
+                row = fetchone(conn, SQL_CLAIM_LEASE, (*key, REPLICA_ID, LEASE_SECONDS))
+                conn.commit()
+                if row:
+                    _owned_leases[key] = row["epoch"]
+                    LEASE_CHANGES.labels(change="acquired").inc()
+                    log.info("Acquired lease on %s/%s (epoch %s)", *key, row["epoch"])
+
+    LIVE_REPLICAS.set(replicas)
+    OWNED_LEASES.labels(replica=REPLICA_ID).set(len(_owned_leases))
+
+def owns_lease(test_run, stream) -> bool:
+    return not LEASES_ENABLED or (test_run, stream) in _owned_leases
+
+def fence_lease(conn, test_run, stream):
+    """Read our lease in the slice's transaction, so a takeover conflicts with the watermark write."""
+    if not LEASES_ENABLED:
+        return
+    epoch = _owned_leases.get((test_run, stream))
+    if epoch is None or not fetchone(conn, SQL_FENCE_LEASE, (test_run, stream, REPLICA_ID, epoch)):
+        _owned_leases.pop((test_run, stream), None)
+        LEASE_CHANGES.labels(change="lost").inc()
+        raise LeaseLost(f"{test_run}/{stream}")
+
+def release_all_leases():
+    if not LEASES_ENABLED:
+        return
+    with get_connection() as conn:
+        execute(conn, "DELETE FROM workload_test.ingest_leases WHERE owner = %s", (REPLICA_ID,))
+        execute(conn, "DELETE FROM workload_test.ingest_replicas WHERE replica_id = %s", (REPLICA_ID,))
+        conn.commit()
+    _owned_leases.clear()
+    OWNED_LEASES.labels(replica=REPLICA_ID).set(0)
+
 # ==========================================================
 # SLICE LOGIC
 # ==========================================================
 
-def compute_live_slice(watermark, run, now_ts):
+# a stale read can't see rows newer than its timestamp, so the slice must end
+# SAFETY_DELAY_SECONDS before the read timestamp rather than before now
+
+def compute_live_slice(watermark, run, now_ts, read_lag=0.0, slice_seconds=SLICE_SECONDS,
+                       safety_delay=SAFETY_DELAY_SECONDS):
     from_ts = watermark or run.start_time
     to_ts = min(
-        from_ts + timedelta(seconds=SLICE_SECONDS),
-        now_ts - timedelta(seconds=SAFETY_DELAY_SECONDS),
+        from_ts + timedelta(seconds=slice_seconds),
+        now_ts - timedelta(seconds=safety_delay + read_lag),
         run.end_time
     )
     return (from_ts, to_ts) if to_ts > from_ts else (None, None)
 
-def compute_agg_slice(watermark, run, now_ts):
+def compute_agg_slice(watermark, run, now_ts, read_lag=0.0, slice_seconds=SLICE_SECONDS,
+                      safety_delay=SAFETY_DELAY_SECONDS):
     from_ts = watermark or run.start_time
     to_ts = min(
-        from_ts + timedelta(seconds=SLICE_SECONDS),
-        now_ts - timedelta(seconds=SAFETY_DELAY_SECONDS),
+        from_ts + timedelta(seconds=slice_seconds),
+        now_ts - timedelta(seconds=safety_delay + read_lag),
         run.end_time + run.agg_grace_interval
     )
     return (from_ts, to_ts) if to_ts > from_ts else (None, None)
 
+# ==========================================================
+# STREAM COLUMN CATALOG
+# ==========================================================
+
+@dataclass
+class StreamSpec:
+    source: str                  # crdb_internal table
+    target: str                  # workload_test table
+    alias: str
+    ts_column: str
+    by_database: bool            # filter the source on run.database_name
+    extra_filter: str = ""
+    conflict: str = ""           # ON CONFLICT target, if any
+    update_columns: Tuple[str, ...] = ()
+
+STREAM_SPECS = {
+    "contention": StreamSpec(
+        source="transaction_contention_events",
+        target="transaction_contention_events",
+        alias="e",
+        ts_column="collection_ts",
+        by_database=True,
+    ),
+    "insights": StreamSpec(
+        source="cluster_execution_insights",
+        target="cluster_execution_insights",
+        alias="i",
+        ts_column="start_time",
+        by_database=True,
+        extra_filter="AND i.query <> 'SELECT _'",
+        conflict="ON CONFLICT ON CONSTRAINT uq_trei_run_txn_stmt DO NOTHING",
+    ),
+    "stmt_stats": StreamSpec(
+        source="cluster_statement_statistics",
+        target=("cluster_statement_statistics_dedup" if STMT_STATS_LAYOUT == "dedup"
+                else "cluster_statement_statistics"),
+        alias="s",
+        ts_column="aggregated_ts",
+        by_database=False,
+        conflict="ON CONFLICT ON CONSTRAINT uq_stmt_stats",
+        update_columns=("metadata", "statistics", "sampled_plan", "index_recommendations"),
+    ),
+    "txn_stats": StreamSpec(
+        source="cluster_transaction_statistics",
+        target="cluster_transaction_statistics",
+        alias="x",
+        ts_column="aggregated_ts",
+        by_database=False,
+        conflict="ON CONFLICT ON CONSTRAINT uq_txn_stats",
+        update_columns=("metadata", "statistics"),
+    ),
+}
+
+def _parse_column_config(value: str) -> dict:
+    """ "stream.column[=value],..." -> {(stream, column): value} """
+    out = {}
+    for item in filter(None, (v.strip() for v in value.split(","))):
+        key, _, val = item.partition("=")
+        stream, _, column = key.partition(".")
+        out[(stream.strip(), column.strip())] = val.strip()
+    return out
+
+# heavy columns we don't want to move on every slice, e.g.
+#   DROP_COLUMNS="contention.contending_key"
+#   SAMPLE_COLUMNS="stmt_stats.sampled_plan=0.1"
+DROP_COLUMNS = set(_parse_column_config(os.getenv("DROP_COLUMNS", "")))
+SAMPLE_COLUMNS = {k: float(v) for k, v in _parse_column_config(os.getenv("SAMPLE_COLUMNS", "")).items()}
+
+@dataclass
+class StreamCatalog:
+    stream: str
+    target: str
+    columns: List[str]           # target columns we write, in target order
+    types: List[str]             # crdb_sql_type per column
+    projections: List[str]       # source expression per column
+    conflict: str                # ON CONFLICT clause for inserts into target
+    select_sql: str              # read the projected source rows of a slice
+    insert_sql: str              # INSERT ... SELECT the slice server side
+
+SQL_COLUMNS = """
+SELECT column_name, crdb_sql_type, is_nullable
+FROM information_schema.columns
+WHERE table_schema = %s
+  AND table_name = %s
+  AND is_hidden = 'NO'
+ORDER BY ordinal_position
+"""
+
+def _empty_value(sql_type: str, nullable: bool) -> str:
+    """Typed placeholder for a target column we don't copy from the source."""
+    if nullable:
+        return f"NULL::{sql_type}"
+    if sql_type.endswith("[]"):
+        return f"ARRAY[]::{sql_type}"
+    return {
+        "BYTES": "''::BYTES",
+        "JSONB": "'{}'::JSONB",
+        "STRING": "''",
+        "INTERVAL": "'0s'::INTERVAL",
+        "BOOL": "false",
+    }.get(sql_type, f"0::{sql_type}")
+
+def build_catalog(conn, stream) -> StreamCatalog:
+    spec = STREAM_SPECS[stream]
+    a = spec.alias
+
+    target = fetchall(conn, SQL_COLUMNS, ("workload_test", spec.target))
+    source = {r["column_name"] for r in fetchall(conn, SQL_COLUMNS, (SOURCE_SCHEMA, spec.source))}
+    if not target or not source:
+        raise RuntimeError(f"Cannot discover columns for stream {stream}")
+
+    columns, types, projections, unmapped, empties = [], [], [], [], {}
+    for col in target:
+        name = col["column_name"]
+        if name in ("id", "test_run"):
+            continue
+        empty = empties[name] = _empty_value(col["crdb_sql_type"], col["is_nullable"] == "YES")
+        if name not in source:
+            if col["is_nullable"] == "YES":
+                unmapped.append(name)
+                continue
+            expr = empty
+            unmapped.append(name)
+        elif (stream, name) in DROP_COLUMNS:
+            expr = empty
+        elif (stream, name) in SAMPLE_COLUMNS:
+            expr = f"CASE WHEN random() < {SAMPLE_COLUMNS[(stream, name)]} THEN {a}.{name} ELSE {empty} END"
+        else:
+            expr = f"{a}.{name}"
+        columns.append(name)
+        types.append(col["crdb_sql_type"])
+        projections.append(expr)
+
+    conflict = spec.conflict
+    if spec.update_columns:
+        sets = []
+        for name in spec.update_columns:
+            if name not in columns or name in unmapped or (stream, name) in DROP_COLUMNS:
+                continue
+            if (stream, name) in SAMPLE_COLUMNS:
+                # keep the last sampled value when this slice didn't sample it
+                # (IS NOT DISTINCT FROM, the empty value of a nullable column is NULL)
+                sets.append(f"{name} = CASE WHEN EXCLUDED.{name} IS NOT DISTINCT FROM {empties[name]} "
+                            f"THEN {spec.target}.{name} ELSE EXCLUDED.{name} END")
+            else:
+                sets.append(f"{name} = EXCLUDED.{name}")
+        conflict += (" DO UPDATE SET\n  " + ",\n  ".join(sets)) if sets else " DO NOTHING"
+
+    db_filter = f"{a}.database_name = %s AND " if spec.by_database else ""
+    column_list = ",\n        ".join(columns)
+    projection_list = ",\n        ".join(projections)
+    select_list = ",\n        ".join(f"{p} AS {c}" for p, c in zip(projections, columns))
+    source_sql = f"""
+    FROM {SOURCE_SCHEMA}.{spec.source} {a}
+    WHERE {db_filter}{a}.{spec.ts_column} >= %s
+      AND {a}.{spec.ts_column} < %s
+      {spec.extra_filter}"""
+
+    select_sql = f"""
+    SELECT
+        {select_list}
+    {source_sql};
+    """
+
+    insert_sql = f"""
+    INSERT INTO workload_test.{spec.target} (
+        test_run,
+        {column_list}
+    )
+    SELECT
+        %s,
+        {projection_list}
+    {source_sql}
+    {conflict};
+    """
+
+    dropped = sorted(n for (s, n) in DROP_COLUMNS if s == stream)
+    sampled = sorted(n for (s, n) in SAMPLE_COLUMNS if s == stream)
+    skipped = sorted(source - set(columns))
+    log.info("Catalog %s: %d columns mapped, dropped=%s sampled=%s unmapped target=%s unused source=%s",
+             stream, len(columns), dropped, sampled, unmapped, skipped)
+    return StreamCatalog(stream, spec.target, columns, types, projections, conflict, select_sql, insert_sql)
+
+_catalogs: dict = {}
+
+def load_column_catalogs(conn):
+    for stream in ALL_STREAMS:
+        _catalogs[stream] = build_catalog(conn, stream)
+    conn.commit()
+
+def get_catalog(conn, stream) -> StreamCatalog:
+    if stream not in _catalogs:
+        _catalogs[stream] = build_catalog(conn, stream)
+    return _catalogs[stream]
+
 # ==========================================================
 # STREAM HANDLERS
 # ==========================================================
 
 def ingest_stream(conn, stream, run, from_ts, to_ts):
 
-    if stream == "contention":
+    if stream not in STREAM_SPECS:
+        raise ValueError(f"Unknown stream {stream}")
+
+    rows = 0
+    if stream == "stmt_stats" and STMT_STATS_LAYOUT == "dedup":
+        rows += upsert_stmt_dictionaries(conn, from_ts, to_ts)
+
+    if stream == "insights":
+        return rows + ingest_insights(conn, run, from_ts, to_ts)
+
+    catalog = get_catalog(conn, stream)
+    if STREAM_SPECS[stream].by_database:
+        params = (run.database_name, from_ts, to_ts)
+    else:
+        params = (from_ts, to_ts)
+
+    if READ_MODES[stream][0] == "current":
+        rows += execute(conn, catalog.insert_sql, (run.test_run, *params))
+    else:
+        src_rows = read_source(conn, stream, catalog.select_sql, params)
+        rows += insert_values(conn, catalog, run.test_run, src_rows)
+
+    if stream == "stmt_stats" and TABLE_REFS_ENABLED:
+        a = STREAM_SPECS[stream].alias
+        upsert_stmt_table_refs(conn, stream, f"{a}.aggregated_ts >= %s AND {a}.aggregated_ts < %s", (from_ts, to_ts))
+
+    if stream == "stmt_stats" and PLAN_CHANGES_ENABLED:
+        # a bucket is read once in slice mode, so all of its executions are new
+        spec = STREAM_SPECS[stream]
+        a = spec.alias
+        light = read_source(conn, stream, _cnt_sql(
+            f"{SOURCE_SCHEMA}.{spec.source}", a, AGG_KEY_COLUMNS[stream],
+            f"{a}.aggregated_ts >= %s AND {a}.aggregated_ts < %s {spec.extra_filter}",
+            _svc_lat_sql(a) + f", {a}.aggregated_ts AS aggregated_ts"), params)
+        detect_plan_changes(conn, run, [(r, r["aggregated_ts"], r["cnt"]) for r in light])
+
+    return rows
+
+def _adapt(value, sql_type):
+    return Jsonb(value) if sql_type == "JSONB" and value is not None else value
+
+def insert_values(conn, catalog, test_run, rows) -> int:
+    """Write source rows read through catalog.select_sql, in multi-row batches."""
+    if not rows:
+        return 0
+
+    row_placeholders = "(" + ",".join(["%s"] * (len(catalog.columns) + 1)) + ")"
+    total = 0
+    for batch in _chunk(rows, INSERT_BATCH_SIZE):
+        params: List[Any] = []
+        for r in batch:
+            params.append(test_run)
+            params.extend(_adapt(r[c], t) for c, t in zip(catalog.columns, catalog.types))
         sql = f"""
-        INSERT INTO workload_test.transaction_contention_events (
-            test_run,
-            collection_ts,
-            blocking_txn_id,
-            blocking_txn_fingerprint_id,
-            waiting_txn_id,
-            waiting_txn_fingerprint_id,
-            contention_duration,
-            contending_key,
-            contending_pretty_key,
-            waiting_stmt_id,
-            waiting_stmt_fingerprint_id,
-            database_name,
-            schema_name,
-            table_name,
-            index_name,
-            contention_type
-        )
-        SELECT %s, e.*
-        FROM crdb_internal.transaction_contention_events e
-        WHERE e.database_name=%s
-          AND e.collection_ts >= %s
-          AND e.collection_ts < %s;
-        """
-        return execute(conn, sql, (run.test_run, run.database_name, from_ts, to_ts))
-
-    elif stream == "insights":
-        # 1) Insert into cluster_execution_insights
-        sql_insights = f"""
-        INSERT INTO workload_test.cluster_execution_insights (
-            test_run,
-            session_id,
-            txn_id,
-            txn_fingerprint_id,
-            stmt_id,
-            stmt_fingerprint_id,
-            problem,
-            causes,
-            query,
-            status,
-            start_time,
-            end_time,
-            full_scan,
-            user_name,
-            app_name,
-            database_name,
-            plan_gist,
-            rows_read,
-            rows_written,
-            priority,
-            retries,
-            last_retry_reason,
-            exec_node_ids,
-            kv_node_ids,
-            contention,
-            index_recommendations,
-            implicit_txn,
-            cpu_sql_nanos,
-            error_code,
-            last_error_redactable,
-            query_tags
-        )
-        SELECT %s, i.*
-        FROM crdb_internal.cluster_execution_insights i
-        WHERE i.database_name=%s
-          AND i.start_time >= %s
-          AND i.start_time < %s
-          AND i.query <> 'SELECT _'
-        ON CONFLICT ON CONSTRAINT uq_trei_run_txn_stmt DO NOTHING;
+        INSERT INTO workload_test.{catalog.target} (test_run, {", ".join(catalog.columns)})
+        VALUES {",".join([row_placeholders] * len(batch))}
+        {catalog.conflict};
         """
+        total += execute(conn, sql, params)
+    return total
 
-        rows_insights = execute(
-            conn,
-            sql_insights,
-            (run.test_run, run.database_name, from_ts, to_ts)
-        )
+def ingest_insights(conn, run, from_ts, to_ts) -> int:
+    """
+    Read the slice's insights once and write only the rows whose unique keys
+    (uq_trei_run_txn_stmt, uq_txn_map_run_id) we haven't persisted yet, so repeat
+    executions of a failing fingerprint stop costing a server side conflict check.
+    """
+    catalog = get_catalog(conn, "insights")
+    src_rows = read_source(conn, "insights", catalog.select_sql, (run.database_name, from_ts, to_ts))
 
-        # 2) Insert into txn_id_map (restore v24 behavior)
-        sql_txn_map = """
-        INSERT INTO workload_test.txn_id_map (
-            test_run,
-            txn_id,
-            txn_fingerprint_id
-        )
-        SELECT DISTINCT
-            %s,
-            i.txn_id,
-            i.txn_fingerprint_id
-        FROM crdb_internal.cluster_execution_insights i
-        WHERE i.database_name = %s
-        AND i.start_time >= %s
-        AND i.start_time < %s
-        AND i.query <> 'SELECT _'
+    insights_cache = dedup_cache(run.test_run, "cluster_execution_insights")
+    map_cache = dedup_cache(run.test_run, "txn_id_map")
+
+    new_insights, insight_keys = [], set()
+    new_maps, map_keys = [], set()
+    for r in src_rows:
+        key = insight_key(r)
+        if key in insight_keys or insights_cache.seen(key):
+            DEDUP_CACHE_HITS.labels(table="cluster_execution_insights").inc()
+        else:
+            DEDUP_CACHE_MISSES.labels(table="cluster_execution_insights").inc()
+            insight_keys.add(key)
+            new_insights.append(r)
+
+        key = _dedup_key(r["txn_id"])
+        if key in map_keys or map_cache.seen(key):
+            DEDUP_CACHE_HITS.labels(table="txn_id_map").inc()
+        else:
+            DEDUP_CACHE_MISSES.labels(table="txn_id_map").inc()
+            map_keys.add(key)
+            new_maps.append(r)
+
+    rows = insert_values(conn, catalog, run.test_run, new_insights)
+
+    # txn_id_map (restore v24 behavior)
+    for batch in _chunk(new_maps, INSERT_BATCH_SIZE):
+        params: List[Any] = []
+        for r in batch:
+            params.extend([run.test_run, r["txn_id"], r["txn_fingerprint_id"]])
+        rows += execute(conn, f"""
+        INSERT INTO workload_test.txn_id_map (test_run, txn_id, txn_fingerprint_id)
+        VALUES {",".join(["(%s,%s,%s)"] * len(batch))}
         ON CONFLICT ON CONSTRAINT uq_txn_map_run_id DO NOTHING;
-        """
+        """, params)
 
-        rows_map = execute(
-            conn,
-            sql_txn_map,
-            (run.test_run, run.database_name, from_ts, to_ts)
-        )
+    # only remember the keys once the slice's transaction has committed
+    _pending_dedup_keys.append((insights_cache, insight_keys))
+    _pending_dedup_keys.append((map_cache, map_keys))
+    return rows
 
-        return rows_insights + rows_map
+# ==========================================================
+# DEDUP CACHE
+# ==========================================================
 
-    elif stream == "stmt_stats":
-        sql = f"""
-        INSERT INTO workload_test.cluster_statement_statistics (
-            test_run,
-            aggregated_ts,
-            fingerprint_id,
-            transaction_fingerprint_id,
-            plan_hash,
-            app_name,
-            metadata,
-            statistics,
-            sampled_plan,
-            aggregation_interval,
-            index_recommendations
-        )
-        SELECT %s, s.*
-        FROM crdb_internal.cluster_statement_statistics s
-        WHERE s.aggregated_ts >= %s
-          AND s.aggregated_ts < %s
-        ON CONFLICT ON CONSTRAINT uq_stmt_stats DO UPDATE SET
-          metadata = EXCLUDED.metadata,
-          statistics = EXCLUDED.statistics,
-          sampled_plan = EXCLUDED.sampled_plan,
-          index_recommendations = EXCLUDED.index_recommendations;
-        """
-        return execute(conn, sql, (run.test_run, from_ts, to_ts))
+class DedupCache:
+    """LRU of unique keys already persisted for one (test_run, table)."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.keys: OrderedDict = OrderedDict()
+
+    def seen(self, key: bytes) -> bool:
+        if key in self.keys:
+            self.keys.move_to_end(key)
+            return True
+        return False
+
+    def add(self, key: bytes):
+        self.keys[key] = None
+        self.keys.move_to_end(key)
+        while len(self.keys) > self.capacity:
+            self.keys.popitem(last=False)
+
+_dedup_caches: dict = {}
+_pending_dedup_keys: List[Tuple[DedupCache, set]] = []
+
+def _dedup_key(*parts) -> bytes:
+    """Digest of a unique key; None, '' and 'None' hash apart and no part runs into the next."""
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        if p is None:
+            h.update(b"n")
+            continue
+        data = p if isinstance(p, (bytes, bytearray)) else str(p).encode()
+        h.update(b"v" + len(data).to_bytes(8, "big") + data)
+    return h.digest()
+
+def insight_key(r) -> bytes:
+    """uq_trei_run_txn_stmt exactly, COALESCE(last_error_redactable, '<<NULL>>') included."""
+    error = r.get("last_error_redactable")
+    return _dedup_key(r["txn_fingerprint_id"], r["stmt_fingerprint_id"], r["status"], r["app_name"],
+                      "<<NULL>>" if error is None else error)
+
+def dedup_cache(test_run, table) -> DedupCache:
+    key = (test_run, table)
+    if key not in _dedup_caches:
+        _dedup_caches[key] = DedupCache(DEDUP_CACHE_SIZE)
+    return _dedup_caches[key]
+
+def commit_dedup_keys():
+    for cache, keys in _pending_dedup_keys:
+        for k in keys:
+            cache.add(k)
+    _pending_dedup_keys.clear()
+
+def discard_dedup_keys():
+    _pending_dedup_keys.clear()
+
+def prune_dedup_caches(active_test_runs):
+    for key in [k for k in _dedup_caches if k[0] not in active_test_runs]:
+        del _dedup_caches[key]
+
+# ==========================================================
+# DEDUPLICATED STMT STATS LAYOUT
+# ==========================================================
+
+# metadata keys that depend on the plan rather than the fingerprint
+PLAN_METADATA_KEYS = ("distsql", "fullScan", "vec")
+
+def upsert_stmt_dictionaries(conn, from_ts, to_ts) -> int:
+    """
+    Insert the fingerprints and (fingerprint, plan_hash) pairs of this slice that
+    aren't in the dictionaries yet.  Known keys are excluded at the source with an
+    anti join on the dictionary's primary key, so repeat buckets don't move or
+    rewrite any metadata/sampled_plan JSONB and the cost follows the slice, not the
+    number of keys ever seen.
+
+    The rows are written in the caller's transaction, never committed here, so
+    they are fenced by the slice or bucket lease like the stats rows they describe.
+    """
+    stripped = " - ".join(["s.metadata"] + [f"'{k}'" for k in PLAN_METADATA_KEYS])
+    flags = ", ".join(f"'{k}', s.metadata->'{k}'" for k in PLAN_METADATA_KEYS)
+
+    sql_fingerprints = f"""
+    INSERT INTO workload_test.stmt_fingerprint_dictionary (fingerprint_id, metadata)
+    SELECT DISTINCT ON (s.fingerprint_id)
+        s.fingerprint_id,
+        {stripped} AS metadata
+    FROM {SOURCE_SCHEMA}.cluster_statement_statistics s
+    WHERE s.aggregated_ts >= %s
+      AND s.aggregated_ts < %s
+      AND NOT EXISTS (
+        SELECT 1 FROM workload_test.stmt_fingerprint_dictionary d
+        WHERE d.fingerprint_id = s.fingerprint_id
+      )
+    ON CONFLICT (fingerprint_id) DO NOTHING
+    """
+
+    sql_plans = f"""
+    INSERT INTO workload_test.plan_dictionary (fingerprint_id, plan_hash, plan_flags, sampled_plan)
+    SELECT DISTINCT ON (s.fingerprint_id, s.plan_hash)
+        s.fingerprint_id,
+        s.plan_hash,
+        jsonb_strip_nulls(jsonb_build_object({flags})) AS plan_flags,
+        s.sampled_plan
+    FROM {SOURCE_SCHEMA}.cluster_statement_statistics s
+    WHERE s.aggregated_ts >= %s
+      AND s.aggregated_ts < %s
+      AND NOT EXISTS (
+        SELECT 1 FROM workload_test.plan_dictionary p
+        WHERE p.fingerprint_id = s.fingerprint_id
+          AND p.plan_hash = s.plan_hash
+      )
+    ON CONFLICT (fingerprint_id, plan_hash) DO NOTHING
+    """
+
+    rows = execute(conn, sql_fingerprints, (from_ts, to_ts))
+    rows += execute(conn, sql_plans, (from_ts, to_ts))
+    return rows
+
+# ==========================================================
+# STATEMENT TABLE REFS
+# ==========================================================
+
+# normalized statement text: quoted identifiers, words, strings, placeholders, punctuation
+_SQL_TOKEN = re.compile(r"""\"(?:[^"]|"")*"|'(?:[^']|'')*'|[A-Za-z_][A-Za-z0-9_$]*|\$\d+|::|\S""")
+
+# words that can't be a table name or an alias in the positions we parse
+_SQL_KEYWORDS = {
+    "ALL", "AND", "AS", "ASC", "BY", "CASE", "CROSS", "DEFAULT", "DELETE", "DESC", "DISTINCT",
+    "DO", "ELSE", "END", "EXCEPT", "FETCH", "FOR", "FROM", "FULL", "GROUP", "HAVING", "IN",
+    "INNER", "INSERT", "INTERSECT", "INTO", "IS", "JOIN", "LATERAL", "LEFT", "LIMIT", "MERGE",
+    "NATURAL", "NOT", "NULL", "OF", "OFFSET", "ON", "OR", "ORDER", "OUTER", "RETURNING",
+    "RIGHT", "SELECT", "SET", "TABLE", "THEN", "UNION", "UPDATE", "UPSERT", "USING", "VALUES",
+    "WHEN", "WHERE", "WINDOW", "WITH",
+}
+
+_SYSTEM_SCHEMAS = {"crdb_internal", "information_schema", "pg_catalog", "pg_extension"}
+
+def _ident(tok: str) -> Optional[str]:
+    if tok.startswith('"'):
+        return tok[1:-1].replace('""', '"')
+    if (tok[0].isalpha() or tok[0] == "_") and tok.upper() not in _SQL_KEYWORDS:
+        return tok.lower()
+    return None
+
+def parse_table_refs(query: str, db: str) -> set:
+    """
+    (database_name, schema_name, table_name, access_kind) of the tables a statement
+    reads (FROM, JOIN) or writes (INSERT/UPSERT/MERGE INTO, UPDATE, DELETE FROM).
+    Single names resolve to db.public, two part names to a schema of db unless the
+    first part is db itself or system.  FROM inside function calls (extract, substring),
+    subqueries, table functions, CTE names and system schemas are skipped.
+    """
+    toks = _SQL_TOKEN.findall(query or "")
+    words = [t.upper() for t in toks]
+    n = len(toks)
+    ctes = {toks[i].lower() for i in range(n - 2) if words[i + 1] == "AS" and toks[i + 2] == "("}
+    refs = set()
+
+    def name_at(j, columns):
+        """Qualified name starting at j, or (None, j) for a subquery or table function."""
+        parts = []
+        while j < n:
+            part = _ident(toks[j])
+            if part is None:
+                break
+            parts.append(part)
+            j += 1
+            if j < n and toks[j] == "." and len(parts) < 3:
+                j += 1
+            else:
+                break
+        if not parts or (not columns and j < n and toks[j] == "("):
+            return None, j
+        return parts, j
+
+    def add(parts, kind):
+        if len(parts) == 1:
+            ref = (db, "public", parts[0])
+        elif len(parts) == 2:
+            ref = (parts[0], "public", parts[1]) if parts[0] in (db, "system") else (db, parts[0], parts[1])
+        else:
+            ref = tuple(parts)
+        if ref[0] != "system" and ref[1] not in _SYSTEM_SCHEMAS and ref[2] not in ctes:
+            refs.add(ref + (kind,))
+
+    def tables_at(j, kind, many):
+        while j < n:
+            if words[j] in ("LATERAL", "ONLY"):
+                j += 1
+                continue
+            # an INSERT target may be followed by its column list
+            parts, j = name_at(j, kind == "write")
+            if parts:
+                add(parts, kind)
+            # alias, but not AS OF SYSTEM TIME
+            if j < n and words[j] == "AS" and j + 1 < n and words[j + 1] != "OF":
+                j += 2
+            elif j < n and _ident(toks[j]) is not None:
+                j += 1
+            if not (many and j < n and toks[j] == ","):
+                return
+            j += 1
+
+    frames = []     # "call" for function arguments, "group" otherwise
+    for i, (tok, word) in enumerate(zip(toks, words)):
+        prev = words[i - 1] if i else ""
+        if tok == "(":
+            after = words[i + 1] if i + 1 < n else ""
+            call = i and _ident(toks[i - 1]) is not None and after not in ("SELECT", "WITH", "VALUES")
+            frames.append("call" if call else "group")
+        elif tok == ")":
+            if frames:
+                frames.pop()
+        elif frames and frames[-1] == "call":
+            continue
+        elif word == "INTO" and prev in ("INSERT", "UPSERT", "MERGE", "IMPORT"):
+            tables_at(i + 1, "write", False)
+        elif word == "UPDATE" and prev not in ("FOR", "DO", "ON", "KEY"):
+            tables_at(i + 1, "write", False)
+        elif word == "FROM" and prev == "DELETE":
+            tables_at(i + 1, "write", False)
+        elif word == "FROM":
+            tables_at(i + 1, "read", True)
+        elif word == "JOIN":
+            tables_at(i + 1, "read", False)
+    return refs
+
+def upsert_stmt_table_refs(conn, stream, where, params) -> int:
+    """
+    Parse the statements of this slice's fingerprints that have no refs yet and
+    write their table refs in the slice's transaction.  Fingerprints with refs are
+    excluded on the server by an anti join, so nothing grows with the fingerprints
+    seen; one that touches no table is parsed again in each slice it appears in.
+    """
+    spec = STREAM_SPECS[stream]
+    a = spec.alias
+    src = read_source(conn, stream, f"""
+    SELECT DISTINCT ON ({a}.fingerprint_id)
+        {a}.fingerprint_id,
+        coalesce({a}.metadata->>'query', {a}.metadata->>'querySummary') AS query,
+        {a}.metadata->>'db' AS db
+    FROM {SOURCE_SCHEMA}.{spec.source} {a}
+    WHERE {where} {spec.extra_filter}
+      AND NOT EXISTS (
+        SELECT 1 FROM workload_test.stmt_table_refs r
+        WHERE r.fingerprint_id = {a}.fingerprint_id
+      )
+    """, params)
+    if not src:
+        return 0
+
+    refs = []
+    for r in src:
+        fingerprint_id = bytes(r["fingerprint_id"])
+        refs.extend((fingerprint_id, *ref) for ref in sorted(parse_table_refs(r["query"], r["db"] or "")))
+    TABLE_REFS_PARSED.inc(len(src))
+
+    for batch in _chunk(refs, INSERT_BATCH_SIZE):
+        execute(conn, f"""
+        INSERT INTO workload_test.stmt_table_refs
+          (fingerprint_id, database_name, schema_name, table_name, access_kind)
+        VALUES {",".join(["(%s,%s,%s,%s,%s)"] * len(batch))}
+        ON CONFLICT DO NOTHING;
+        """, [v for ref in batch for v in ref])
+    return len(refs)
+
+# ==========================================================
+# AGG BUCKET SYNC
+# ==========================================================
+
+AGG_KEY_COLUMNS = {
+    "stmt_stats": ("fingerprint_id", "transaction_fingerprint_id", "plan_hash", "app_name"),
+    "txn_stats": ("fingerprint_id", "app_name"),
+}
+
+BUCKET = timedelta(hours=1)
 
-    elif stream == "txn_stats":
+# (test_run, stream, aggregated_ts) -> {row key digest: cnt last persisted}
+_bucket_counts: dict = {}
+_pending_bucket_counts: List[Tuple[dict, dict]] = []
+
+SQL_CLOSED_BUCKETS = """
+SELECT aggregated_ts
+FROM workload_test.agg_bucket_state
+WHERE test_run = %s AND stream = %s AND closed_at IS NOT NULL
+"""
+
+SQL_TOUCH_BUCKET = """
+UPSERT INTO workload_test.agg_bucket_state (test_run, stream, aggregated_ts, last_synced_at, closed_at)
+VALUES (%s, %s, %s, now(), %s)
+"""
+
+def _cnt_sql(table: str, alias: str, keys, where: str, extra: str = "") -> str:
+    key_list = ", ".join(f"{alias}.{k} AS {k}" for k in keys)
+    return f"""
+    SELECT {key_list}, ({alias}.statistics->'statistics'->>'cnt')::INT8 AS cnt{extra}
+    FROM {table} {alias}
+    WHERE {where}
+    """
+
+def _hours(from_ts: datetime, to_ts: datetime):
+    h = from_ts.replace(minute=0, second=0, microsecond=0)
+    while h < to_ts:
+        yield h
+        h += BUCKET
+
+def bucket_counts(conn, run, stream, bucket) -> dict:
+    """cnt per row key already persisted for a bucket, seeded from the target after a restart."""
+    key = (run.test_run, stream, bucket)
+    if key not in _bucket_counts:
+        spec, keys = STREAM_SPECS[stream], AGG_KEY_COLUMNS[stream]
+        rows = fetchall(conn, _cnt_sql(f"workload_test.{spec.target}", "t", keys,
+                                       "t.test_run = %s AND t.aggregated_ts = %s"),
+                        (run.test_run, bucket))
+        _bucket_counts[key] = {_dedup_key(*(r[k] for k in keys)): r["cnt"] for r in rows}
+    return _bucket_counts[key]
+
+def sync_bucket(conn, run, stream, bucket) -> Tuple[int, int]:
+    """
+    Two phase re-sync of one bucket: a light read of row keys and cnt, then a full
+    read and upsert of only the rows whose cnt moved.  Returns (rows, changed).
+    """
+    spec, keys = STREAM_SPECS[stream], AGG_KEY_COLUMNS[stream]
+    a = spec.alias
+    catalog = get_catalog(conn, stream)
+    counts = bucket_counts(conn, run, stream, bucket)
+
+    extra = _svc_lat_sql(a) if stream == "stmt_stats" and PLAN_CHANGES_ENABLED else ""
+    light = read_source(conn, stream, _cnt_sql(f"{SOURCE_SCHEMA}.{spec.source}", a, keys,
+                                               f"{a}.aggregated_ts = %s {spec.extra_filter}", extra), (bucket,))
+    changed = {}
+    for r in light:
+        digest = _dedup_key(*(r[k] for k in keys))
+        if counts.get(digest) != r["cnt"]:
+            changed[digest] = r
+    if not changed:
+        return 0, 0
+
+    if extra:
+        detect_plan_changes(conn, run, [
+            (r, bucket, r["cnt"] - (counts.get(d) or 0)) for d, r in changed.items()
+        ])
+
+    if stream == "stmt_stats" and STMT_STATS_LAYOUT == "dedup":
+        upsert_stmt_dictionaries(conn, bucket, bucket + BUCKET)
+    if stream == "stmt_stats" and TABLE_REFS_ENABLED:
+        upsert_stmt_table_refs(conn, stream, f"{a}.aggregated_ts = %s", (bucket,))
+
+    select_list = ", ".join(f"{p} AS {c}" for p, c in zip(catalog.projections, catalog.columns))
+    key_tuple = "(" + ", ".join(f"{a}.{k}" for k in keys) + ")"
+    row_placeholder = "(" + ",".join(["%s"] * len(keys)) + ")"
+    src_rows = []
+    for batch in _chunk(list(changed.values()), INSERT_BATCH_SIZE):
         sql = f"""
-        INSERT INTO workload_test.cluster_transaction_statistics (
-            test_run,
-            aggregated_ts,
-            fingerprint_id,
-            app_name,
-            metadata,
-            statistics,
-            aggregation_interval
-        )
-        SELECT %s, x.*
-        FROM crdb_internal.cluster_transaction_statistics x
-        WHERE x.aggregated_ts >= %s
-          AND x.aggregated_ts < %s
-        ON CONFLICT ON CONSTRAINT uq_txn_stats DO UPDATE SET
-          metadata = EXCLUDED.metadata,
-          statistics = EXCLUDED.statistics;
+        SELECT {select_list}
+        FROM {SOURCE_SCHEMA}.{spec.source} {a}
+        WHERE {a}.aggregated_ts = %s
+          AND {key_tuple} IN ({",".join([row_placeholder] * len(batch))})
         """
-        return execute(conn, sql, (run.test_run, from_ts, to_ts))
+        params: List[Any] = [bucket]
+        for r in batch:
+            params.extend(r[k] for k in keys)
+        src_rows.extend(read_source(conn, stream, sql, params))
 
-    else:
-        raise ValueError(f"Unknown stream {stream}")
+    rows = insert_values(conn, catalog, run.test_run, src_rows)
+    _pending_bucket_counts.append((counts, {d: r["cnt"] for d, r in changed.items()}))
+    return rows, len(changed)
+
+def process_agg_buckets(run, stream, now_ts) -> int:
+    """
+    Re-sync every open bucket of an agg stream up to the read horizon and the run's
+    end.  A bucket is closed once AGG_BUCKET_CLOSE_SECONDS past its hour, or once the
+    horizon reaches end_time + agg_grace_interval, and a pass finds no change.
+    The watermark tracks the horizon and lands on end_time + agg_grace_interval
+    only when every bucket of the run is closed.  With COMMIT_CHUNK_SECONDS set,
+    each bucket commits on its own so a failure only repeats the buckets after it.
+    """
+    final_ts = run.end_time + run.agg_grace_interval
+    horizon = min(now_ts - timedelta(seconds=SAFETY_DELAY_SECONDS + READ_MODES[stream][1]), final_ts)
+
+    start = time.time()
+    with get_connection() as conn:
+        closed = {r["aggregated_ts"] for r in fetchall(conn, SQL_CLOSED_BUCKETS, (run.test_run, stream))}
+    # the run's last bucket is the hour holding end_time, later hours have none of its rows
+    buckets = [b for b in _hours(run.start_time, min(horizon, run.end_time)) if b not in closed]
+    # one transaction per bucket in chunked mode, the last one also moves the watermark
+    groups = [[b] for b in buckets] if COMMIT_CHUNK_SECONDS > 0 and buckets else [buckets]
+    rows = changed = 0
+    still_open = []
+
+    for i, group in enumerate(groups):
+        def work(tx, attempt):
+            n = c = 0
+            done_buckets = []
+            for bucket in group:
+                bn, bc = sync_bucket(tx, run, stream, bucket)
+                n, c = n + bn, c + bc
+                # past final_ts the grace interval has already waited out the last flush
+                done = bc == 0 and (horizon >= final_ts or
+                                    bucket + BUCKET + timedelta(seconds=AGG_BUCKET_CLOSE_SECONDS) <= horizon)
+                if done or bc:
+                    execute(tx, SQL_TOUCH_BUCKET, (run.test_run, stream, bucket, now_ts if done else None))
+                if done:
+                    done_buckets.append(bucket)
+            fence_lease(tx, run.test_run, stream)
+            if i == len(groups) - 1:
+                open_now = still_open + [b for b in group if b not in done_buckets]
+                watermark = final_ts if horizon >= final_ts and not open_now else min(
+                    horizon, final_ts - timedelta(microseconds=1))
+                set_watermark(tx, run.test_run, stream, watermark)
+            if n or (i == len(groups) - 1 and rows):
+                mark_rows_landed(tx, run.test_run, stream)
+            return n, c, done_buckets
+
+        (n, c, done_buckets), _ = commit_chunk(stream, work)
+        for bucket in group:
+            if bucket in done_buckets:
+                _bucket_counts.pop((run.test_run, stream, bucket), None)
+            else:
+                still_open.append(bucket)
+        rows, changed = rows + n, changed + c
+
+    INGEST_ROWS.labels(stream=stream).inc(rows)
+    AGG_ROWS_CHANGED.labels(stream=stream).inc(changed)
+    INGEST_DURATION.labels(stream=stream).observe(time.time() - start)
+    WATERMARK_LAG.labels(stream=stream, test_run=run.test_run).set((now_ts - horizon).total_seconds())
+    return rows
+
+def prune_bucket_counts(active_test_runs):
+    for key in [k for k in _bucket_counts if k[0] not in active_test_runs]:
+        del _bucket_counts[key]
+
+# ==========================================================
+# PLAN CHANGE DETECTION
+# ==========================================================
+
+@dataclass
+class PlanState:
+    plan_hash: bytes
+    aggregated_ts: datetime
+    svc_lat: Optional[float]     # mean service latency (s) of the plan in that bucket
+
+# (test_run, fingerprint_id, app_name) -> PlanState as of the last committed slice
+_plan_states: dict = {}
+_pending_plan_states: dict = {}
+_pending_plan_changes: dict = {}   # test_run -> changes recorded in the open transaction
+
+SQL_PLAN_CHANGE = """
+INSERT INTO workload_test.plan_changes
+  (test_run, fingerprint_id, app_name, aggregated_ts, old_plan_hash, new_plan_hash,
+   old_aggregated_ts, latency_before, latency_after, executions_after)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _svc_lat_sql(alias: str) -> str:
+    return f", ({alias}.statistics->'statistics'->'svcLat'->>'mean')::FLOAT8 AS svc_lat"
+
+def detect_plan_changes(conn, run, observations) -> int:
+    """
+    observations: (light stmt_stats row, aggregated_ts, executions since the last
+    pass).  Per fingerprint and bucket the plan with the most new executions is
+    the current plan; when it differs from the one we last saw, the switch is
+    written to workload_test.plan_changes in the slice's transaction.  State
+    lives in memory only, so after a restart the first bucket seen is the baseline.
+    """
+    # (fingerprint_id, app_name, aggregated_ts) -> {plan_hash: [executions, executions * svc_lat]}
+    plans: dict = {}
+    for r, bucket, executions in observations:
+        if executions <= 0:
+            continue
+        p = plans.setdefault((bytes(r["fingerprint_id"]), r["app_name"], bucket), {})
+        acc = p.setdefault(bytes(r["plan_hash"]), [0, 0.0])
+        acc[0] += executions
+        acc[1] += executions * (r["svc_lat"] or 0.0)
+
+    changes = 0
+    for (fingerprint_id, app_name, bucket), p in sorted(plans.items(), key=lambda kv: kv[0][2]):
+        plan_hash, (executions, weighted) = max(p.items(), key=lambda kv: kv[1][0])
+        svc_lat = weighted / executions
+        key = (run.test_run, fingerprint_id, app_name)
+        prev = _pending_plan_states.get(key) or _plan_states.get(key)
+
+        if prev and bucket < prev.aggregated_ts:
+            continue    # late flush into an older bucket
+        if prev and prev.plan_hash != plan_hash:
+            if executions < PLAN_CHANGE_MIN_EXECUTIONS:
+                continue
+            execute(conn, SQL_PLAN_CHANGE, (
+                run.test_run, fingerprint_id, app_name, bucket, prev.plan_hash, plan_hash,
+                prev.aggregated_ts, prev.svc_lat, svc_lat, executions,
+            ))
+            log.info("Plan change %s/%s: %s -> %s, svc_lat %.4fs -> %.4fs",
+                     run.test_run, fingerprint_id.hex(), prev.plan_hash.hex(), plan_hash.hex(),
+                     prev.svc_lat or 0.0, svc_lat)
+            changes += 1
+        _pending_plan_states[key] = PlanState(plan_hash, bucket, svc_lat)
+
+    if changes:
+        _pending_plan_changes[run.test_run] = _pending_plan_changes.get(run.test_run, 0) + changes
+    return changes
+
+def commit_plan_states():
+    _plan_states.update(_pending_plan_states)
+    for test_run, changes in _pending_plan_changes.items():
+        PLAN_CHANGES.labels(test_run=test_run).inc(changes)
+    discard_plan_states()
+
+def discard_plan_states():
+    _pending_plan_states.clear()
+    _pending_plan_changes.clear()
+
+def prune_plan_states(active_test_runs):
+    for key in [k for k in _plan_states if k[0] not in active_test_runs]:
+        del _plan_states[key]
 
 # ==========================================================
 # PLACEHOLDER BACKFILL
@@ -387,7 +1358,7 @@ def backfill_contention(conn, run) -> int:
       collection_ts,
       blocking_txn_fingerprint_id,
       waiting_txn_fingerprint_id
-    FROM crdb_internal.transaction_contention_events
+    FROM {SOURCE_SCHEMA}.transaction_contention_events
     WHERE collection_ts >= now() - interval '{window_hours} hours'
     """
 
@@ -483,6 +1454,10 @@ def backfill_contention(conn, run) -> int:
 
     return updated_total
 
+# NOTE: this definition shadows the SELECT-then-UPDATE backfill_contention above, so
+# it is the one run_backfill calls.  Its UPDATE ... FROM {SOURCE_SCHEMA} only works
+# when the source is an ordinary table (the benchmark stand-ins); against
+# crdb_internal the statement is rejected and the backfill fails every run.
 def backfill_contention(conn, run):
     window = f"{BACKFILL_WINDOW_HOURS} hours"
 
@@ -491,7 +1466,7 @@ def backfill_contention(conn, run):
     SET
       blocking_txn_fingerprint_id = src.blocking_txn_fingerprint_id,
       waiting_txn_fingerprint_id  = src.waiting_txn_fingerprint_id
-    FROM crdb_internal.transaction_contention_events src
+    FROM {SOURCE_SCHEMA}.transaction_contention_events src
     WHERE tgt.test_run = %s
       AND tgt.collection_ts >= now() - interval '{BACKFILL_WINDOW_HOURS} hours'
       AND tgt.collection_ts = src.collection_ts
@@ -506,14 +1481,588 @@ def backfill_contention(conn, run):
     """
     return execute(conn, sql, (run.test_run,))
 
+# ==========================================================
+# PROFILING
+# ==========================================================
+
+class LoopProfiler:
+    """
+    Capture cProfile and tracemalloc stats for the next N daemon loops and dump
+    them to PROFILE_DIR.  Requests come from the control thread through request(),
+    or from SIGUSR1, whose handler only raises `signalled` (no locks or logging in
+    signal context); the loop arms it, starts and stops.
+    """
+
+    def __init__(self):
+        self.requested = 0
+        self.remaining = 0
+        self.loops = 0
+        self.signalled = False
+        self.profile: Optional[cProfile.Profile] = None
+
+    def request(self, loops: int) -> bool:
+        if self.remaining or self.requested:
+            return False
+        self.requested = max(1, loops)
+        log.info("Profiling requested for the next %d loops", self.requested)
+        return True
+
+    def begin_loop(self):
+        if self.signalled:
+            self.signalled = False
+            if not self.request(PROFILE_LOOPS):
+                log.info("SIGUSR1 ignored, a profile capture is already pending or running")
+        if self.remaining or not self.requested:
+            return
+        self.loops = self.remaining = self.requested
+        self.requested = 0
+        self.profile = cProfile.Profile()
+        tracemalloc.start(10)
+        self.profile.enable()
+
+    def end_loop(self):
+        if not self.remaining:
+            return
+        self.remaining -= 1
+        if self.remaining:
+            return
+        self.profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        try:
+            self._dump(snapshot)
+        except OSError:
+            log.exception("Could not write profile to %s", PROFILE_DIR)
+        self.profile = None
+
+    def _dump(self, snapshot):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        base = os.path.join(PROFILE_DIR, f"copy_obs_data-{stamp}-{os.getpid()}")
+
+        self.profile.dump_stats(base + ".pstats")
+        with open(base + ".txt", "w") as f:
+            pstats.Stats(self.profile, stream=f).sort_stats("cumulative").print_stats(50)
+        with open(base + ".tracemalloc.txt", "w") as f:
+            for stat in snapshot.statistics("lineno")[:50]:
+                f.write(f"{stat}\n")
+        log.info("Profile of %d loops written to %s.{pstats,txt,tracemalloc.txt}", self.loops, base)
+
+class SlowTicks:
+    """Top-K slowest ticks with seconds spent per stream, kept in a min-heap."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap: List[Tuple[float, int, dict]] = []
+
+    def record(self, loop_count: int, seconds: float, breakdown: dict):
+        if self.k <= 0:
+            return
+        entry = (seconds, loop_count, breakdown)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif seconds > self.heap[0][0]:
+            heapq.heapreplace(self.heap, entry)
+        else:
+            return
+        if seconds >= SLOW_TICK_LOG_SECONDS:
+            parts = sorted(breakdown.items(), key=lambda kv: -kv[1])
+            log.warning("Slow tick #%d took %.2fs: %s", loop_count, seconds,
+                        ", ".join(f"{k}={v:.2f}s" for k, v in parts))
+
+    def slowest(self) -> List[dict]:
+        return [
+            {"loop": loop, "seconds": round(seconds, 3),
+             "streams": {k: round(v, 3) for k, v in breakdown.items()}}
+            for seconds, loop, breakdown in sorted(self.heap, reverse=True)
+        ]
+
+profiler = LoopProfiler()
+slow_ticks = SlowTicks(SLOW_TICK_TOP_K)
+
+def _handle_profile_signal(sig, frame):
+    profiler.signalled = True
+
+# ==========================================================
+# FLUSH ON DEMAND
+# ==========================================================
+
+@dataclass
+class FlushRequest:
+    test_run: str
+    done: threading.Event = field(default_factory=threading.Event)
+    result: dict = field(default_factory=dict)
+
+_flush_requests: "queue.Queue[FlushRequest]" = queue.Queue()
+
+SQL_GET_RUN = """
+SELECT test_run, database_name, start_time, end_time, agg_grace_interval,
+       NULL::TIMESTAMPTZ AS min_watermark
+FROM workload_test.test_run_configurations
+WHERE test_run = %s
+"""
+
+def request_flush(test_run: str) -> FlushRequest:
+    """Queue a drain of test_run's live streams and wake the daemon loop."""
+    req = FlushRequest(test_run)
+    _flush_requests.put(req)
+    wake_event.set()
+    return req
+
+def drain_run(test_run: str) -> dict:
+    """
+    Ingest every live stream of a run up to its end_time (or as close to now as
+    the safety delay allows) in FLUSH_SLICE_SECONDS slices.  Agg streams are left
+    to the loop: their buckets keep changing until the hour closes.
+    """
+    with get_connection() as conn:
+        row = fetchone(conn, SQL_GET_RUN, (test_run,))
+    if not row:
+        return {"test_run": test_run, "error": "unknown test run", "complete": False}
+    run = TestRun(**row)
+
+    streams = {}
+    for stream in LIVE_STREAMS:
+        if not owns_lease(test_run, stream):
+            streams[stream] = {"status": "leased by another replica"}
+            continue
+
+        rows = slices = 0
+        while not shutdown_requested:
+            n = process_stream(run, stream, datetime.now(timezone.utc), FLUSH_SLICE_SECONDS)
+            if n is None:
+                break
+            rows += n
+            slices += 1
+
+        with get_connection() as conn:
+            watermark = get_watermark(conn, test_run, stream)
+        streams[stream] = {
+            "status": "drained" if watermark and watermark >= run.end_time else "caught up",
+            "rows": rows,
+            "slices": slices,
+            "watermark": watermark.isoformat() if watermark else None,
+        }
+
+    return {
+        "test_run": test_run,
+        "streams": streams,
+        "complete": all(s["status"] == "drained" for s in streams.values()),
+    }
+
+def serve_flush_requests():
+    while not shutdown_requested:
+        try:
+            req = _flush_requests.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            req.result = drain_run(req.test_run)
+        except Exception as e:
+            log.exception("Flush of %s failed", req.test_run)
+            req.result = {"test_run": req.test_run, "error": str(e), "complete": False}
+        log.info("Flush of %s: %s", req.test_run, json.dumps(req.result))
+        req.done.set()
+
+def flush_cli(argv) -> int:
+    """
+    python 02_copy_obs_data.py flush <test_run> [--port N] [--timeout S]
+    Exits 0 when the drain completed, 1 when it didn't, 2 when the daemon didn't answer.
+    """
+    parser = argparse.ArgumentParser(prog="02_copy_obs_data.py flush",
+                                     description="Drain a test run's live streams now and wait for completion")
+    parser.add_argument("test_run")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=CONTROL_PORT)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for the drain")
+    args = parser.parse_args(argv)
+
+    url = (f"http://{args.host}:{args.port}/flush?"
+           f"test_run={urllib.parse.quote(args.test_run)}&wait={args.timeout:g}")
+    try:
+        with urllib.request.urlopen(url, timeout=args.timeout + 30) as resp:
+            result = json.load(resp)
+    except urllib.error.HTTPError as e:
+        result = json.load(e)
+    except (urllib.error.URLError, OSError) as e:
+        # daemon not running, wrong --host/--port, or no answer within the timeout
+        print(f"flush: no reply from {args.host}:{args.port}: {getattr(e, 'reason', e)}", file=sys.stderr)
+        return 2
+    print(json.dumps(result, indent=2))
+    return 0 if result.get("complete") else 1
+
+# ==========================================================
+# CONTROL ENDPOINTS
+# ==========================================================
+
+class ControlHandler(BaseHTTPRequestHandler):
+    """
+    GET /profile?loops=N  capture the next N loops (default PROFILE_LOOPS)
+    GET /slow_ticks       slowest ticks so far with their per-stream breakdown
+    GET /flush?test_run=X[&wait=S]
+                          drain the run's live streams now; with wait, block up to
+                          S seconds and return the per-stream result
+    """
+
+    def _reply(self, status: int, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == "/profile":
+                loops = int(query.get("loops", [PROFILE_LOOPS])[0])
+                if profiler.request(loops):
+                    self._reply(202, {"profiling_loops": loops, "profile_dir": PROFILE_DIR})
+                else:
+                    self._reply(409, {"error": "a profile capture is already pending or running"})
+            elif url.path == "/slow_ticks":
+                self._reply(200, slow_ticks.slowest())
+            elif url.path == "/flush":
+                if "test_run" not in query:
+                    raise ValueError("test_run is required")
+                req = request_flush(query["test_run"][0])
+                wait = float(query.get("wait", ["0"])[0])
+                if wait > 0 and req.done.wait(wait):
+                    self._reply(200, req.result)
+                else:
+                    self._reply(202, {"test_run": req.test_run, "status": "queued", "complete": False})
+            else:
+                self._reply(404, {"error": f"unknown path {url.path}"})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        log.debug("control %s - %s", self.address_string(), format % args)
+
+def start_control_server(port: int):
+    server = ThreadingHTTPServer(("", port), ControlHandler)
+    threading.Thread(target=server.serve_forever, name="control", daemon=True).start()
+    return server
+
+# ==========================================================
+# LOAD THROTTLE
+# ==========================================================
+
+# node_metrics is the gateway node's registry; admission queues are summed over work kinds
+SQL_NODE_LOAD = f"""
+SELECT
+  max(value) FILTER (WHERE name = 'sys.cpu.combined.percent-normalized') AS cpu,
+  sum(value) FILTER (WHERE name LIKE 'admission.wait_queue_length.%') AS admission_queue
+FROM {SOURCE_SCHEMA}.node_metrics
+WHERE name = 'sys.cpu.combined.percent-normalized'
+   OR name LIKE 'admission.wait_queue_length.%'
+"""
+
+class LoadThrottle:
+    """
+    Back off while the cluster under test is saturated.  Each tick samples node
+    CPU and admission queueing; while either is above its high mark the factor
+    doubles up to THROTTLE_MAX_FACTOR, and once both are below 3/4 of it the
+    factor halves back to 1.  The loop interval is multiplied and live slices
+    are divided by the factor.  The daemon's overhead is estimated as the EWMA
+    share of wall time it spends inside a tick, i.e. with work on the cluster.
+    """
+
+    def __init__(self):
+        self.factor = 1.0
+        self.busy = 0.0
+        self.period = 0.0
+
+    def sample(self) -> float:
+        if not THROTTLE_ENABLED:
+            return self.factor
+        try:
+            with get_connection() as conn:
+                row = fetchone(conn, SQL_NODE_LOAD)
+        except Exception as e:
+            log.warning("Load sample failed, keeping throttle at %.0fx: %s", self.factor, e)
+            return self.factor
+
+        cpu, queue = row["cpu"] or 0.0, row["admission_queue"] or 0.0
+        pressure = max(cpu / THROTTLE_CPU_HIGH, queue / THROTTLE_QUEUE_HIGH)
+        previous = self.factor
+        if pressure >= 1.0:
+            self.factor = min(THROTTLE_MAX_FACTOR, self.factor * 2)
+        elif pressure < 0.75:
+            self.factor = max(1.0, self.factor / 2)
+        if self.factor != previous:
+            log.info("Throttle %.0fx -> %.0fx (cpu %.2f, admission queue %.0f)",
+                     previous, self.factor, cpu, queue)
+
+        CLUSTER_CPU.set(cpu)
+        ADMISSION_QUEUE.set(queue)
+        THROTTLE_FACTOR.set(self.factor)
+        return self.factor
+
+    def interval(self) -> float:
+        return LOOP_INTERVAL_SECONDS * self.factor
+
+    def slice_seconds(self) -> int:
+        return max(1, int(SLICE_SECONDS / self.factor))
+
+    def record(self, busy_seconds: float, period_seconds: float, alpha: float = 0.2):
+        self.busy = alpha * busy_seconds + (1 - alpha) * self.busy
+        self.period = alpha * period_seconds + (1 - alpha) * self.period
+        if self.period > 0:
+            DAEMON_OVERHEAD.set(self.busy / self.period)
+
+throttle = LoadThrottle()
+
+# ==========================================================
+# CIRCUIT BREAKERS
+# ==========================================================
+
+BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN = 0, 1, 2
+
+def classify_error(exc: BaseException) -> str:
+    """retryable (class 40, e.g. 40001), connection (class 08 / lost), schema (class 42) or other."""
+    sqlstate = getattr(exc, "sqlstate", None) or ""
+    if sqlstate.startswith("40"):
+        return "retryable"
+    if sqlstate.startswith("08") or sqlstate in ("57P01", "57P02", "57P03") or (
+            not sqlstate and isinstance(exc, (psycopg.OperationalError, ConnectionError, OSError))):
+        return "connection"
+    if sqlstate.startswith("42"):
+        return "schema"
+    return "other"
+
+@dataclass
+class Breaker:
+    state: int = BREAKER_CLOSED
+    failures: int = 0            # consecutive failures
+    trips: int = 0               # consecutive openings, doubles the backoff
+    retry_at: float = 0.0        # monotonic time of the next half-open probe
+    error_class: str = ""
+
+class Breakers:
+    """
+    One breaker per (test_run, stream).  A stream is skipped while its breaker
+    is open; once the class backoff has passed a single half-open tick probes
+    it, and a success closes the breaker while a failure reopens it for twice as
+    long.  Schema errors also drop the stream's column catalog so the probe
+    rediscovers the columns.
+    """
+
+    def __init__(self):
+        self.breakers: dict = {}
+
+    def _set(self, key, b: Breaker, state: int):
+        b.state = state
+        BREAKER_STATE.labels(stream=key[1], test_run=key[0]).set(state)
+
+    def allow(self, test_run, stream) -> bool:
+        b = self.breakers.get((test_run, stream))
+        if not b or b.state != BREAKER_OPEN:
+            return True
+        if time.monotonic() < b.retry_at:
+            return False
+        self._set((test_run, stream), b, BREAKER_HALF_OPEN)
+        log.info("Breaker half-open for %s/%s, probing", test_run, stream)
+        return True
+
+    def success(self, test_run, stream):
+        b = self.breakers.get((test_run, stream))
+        if not b or (b.failures == 0 and b.state == BREAKER_CLOSED):
+            return
+        if b.state != BREAKER_CLOSED:
+            log.info("Breaker closed for %s/%s after %d trip(s)", test_run, stream, b.trips)
+        b.failures = b.trips = 0
+        self._set((test_run, stream), b, BREAKER_CLOSED)
+
+    def failure(self, test_run, stream, exc: BaseException) -> str:
+        key = (test_run, stream)
+        b = self.breakers.setdefault(key, Breaker())
+        error_class = classify_error(exc)
+        threshold, backoff, max_backoff = BREAKER_POLICIES[error_class]
+        INGEST_ERROR_CLASSES.labels(stream=stream, error_class=error_class).inc()
+        if error_class == "schema":
+            _catalogs.pop(stream, None)
+
+        b.failures += 1
+        b.error_class = error_class
+        if b.state == BREAKER_HALF_OPEN or b.failures >= threshold:
+            b.trips += 1
+            delay = min(max_backoff, backoff * 2 ** (b.trips - 1)) * random.uniform(0.9, 1.1)
+            b.retry_at = time.monotonic() + delay
+            self._set(key, b, BREAKER_OPEN)
+            log.error("Breaker open for %s/%s on %s error, next probe in %.0fs: %s",
+                      test_run, stream, error_class, delay, exc, exc_info=b.trips == 1)
+            return error_class
+
+        self._set(key, b, b.state)
+        if b.failures == 1:
+            log.exception("Stream failed: %s/%s (%s)", test_run, stream, error_class)
+        else:
+            log.warning("Stream failed again: %s/%s (%s, %d/%d): %s",
+                        test_run, stream, error_class, b.failures, threshold, exc)
+        return error_class
+
+    def prune(self, active_test_runs):
+        for key in [k for k in self.breakers if k[0] not in active_test_runs]:
+            BREAKER_STATE.remove(key[1], key[0])
+            del self.breakers[key]
+
+breakers = Breakers()
+
+# ==========================================================
+# CHUNKED COMMITS
+# ==========================================================
+
+MIN_CHUNK = timedelta(seconds=1)
+
+def commit_pending_state():
+    """Apply what the committed transaction persisted to the in-memory caches."""
+    commit_dedup_keys()
+    for counts, updates in _pending_bucket_counts:
+        counts.update(updates)
+    _pending_bucket_counts.clear()
+    commit_plan_states()
+
+def discard_pending_state():
+    discard_dedup_keys()
+    _pending_bucket_counts.clear()
+    discard_plan_states()
+
+def commit_chunk(stream, work) -> Tuple[Any, int]:
+    """
+    Run work(tx, attempt) in its own transaction and commit it.  Serialization
+    failures (40001 and the rest of class 40) are retried up to COMMIT_RETRIES
+    times with jittered exponential backoff; LeaseLost and other errors are raised
+    at once.  Returns (work's result, retries it took).
+    """
+    attempt = 0
+    while True:
+        try:
+            with get_connection() as tx:
+                result = work(tx, attempt)
+                tx.commit()
+        except Exception as e:
+            discard_pending_state()
+            if isinstance(e, LeaseLost) or attempt >= COMMIT_RETRIES or classify_error(e) != "retryable":
+                raise
+            attempt += 1
+            delay = COMMIT_RETRY_BACKOFF_MS / 1000 * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            COMMIT_RETRIES_TOTAL.labels(stream=stream).inc()
+            log.warning("Chunk of %s hit %s, retry %d/%d in %.2fs",
+                        stream, getattr(e, "sqlstate", None) or type(e).__name__, attempt, COMMIT_RETRIES, delay)
+            time.sleep(delay)
+            continue
+        commit_pending_state()
+        CHUNK_COMMITS.labels(stream=stream).inc()
+        return result, attempt
+
+def ingest_slice(run, stream, from_ts, to_ts) -> int:
+    """
+    Ingest [from_ts, to_ts) in chunks of COMMIT_CHUNK_SECONDS (the whole slice when
+    0), each committed with the watermark at its end, so work already committed
+    survives a failure later in the slice.  Every retry of a chunk halves its
+    width, and later chunks grow back by doubling, so a contended slice degrades
+    to smaller writes rather than failing whole.
+    """
+    full = timedelta(seconds=COMMIT_CHUNK_SECONDS) if COMMIT_CHUNK_SECONDS > 0 else to_ts - from_ts
+    width, cursor, rows = full, from_ts, 0
+    while cursor < to_ts:
+        def work(tx, attempt):
+            chunk_to = min(cursor + max(width / 2 ** attempt, MIN_CHUNK), to_ts)
+            n = ingest_stream(tx, stream, run, cursor, chunk_to)
+            fence_lease(tx, run.test_run, stream)
+            set_watermark(tx, run.test_run, stream, chunk_to)
+            if n:
+                mark_rows_landed(tx, run.test_run, stream)
+            return n, chunk_to
+
+        (n, chunk_to), retries = commit_chunk(stream, work)
+        INGEST_ROWS.labels(stream=stream).inc(n)
+        rows += n
+        width = max(width / 2 ** retries, MIN_CHUNK) if retries else min(full, width * 2)
+        cursor = chunk_to
+    return rows
+
 # ==========================================================
 # MAIN LOOP
 # ==========================================================
 
+def process_stream(run, stream, now_ts, slice_seconds=SLICE_SECONDS,
+                   safety_delay=SAFETY_DELAY_SECONDS) -> Optional[int]:
+    """Ingest the next slice of one stream for one run, returns rows or None when idle."""
+    if not owns_lease(run.test_run, stream):
+        return None
+
+    with get_connection() as conn:
+        watermark = get_watermark(conn, run.test_run, stream)
+
+    if stream in AGG_STREAMS and AGG_SYNC_MODE == "bucket":
+        if watermark and watermark >= run.end_time + run.agg_grace_interval:
+            return None
+        try:
+            return process_agg_buckets(run, stream, now_ts)
+        except LeaseLost:
+            log.warning("Lease on %s/%s lost, bucket sync rolled back", run.test_run, stream)
+            return None
+
+    read_lag = READ_MODES[stream][1]
+    if stream in LIVE_STREAMS:
+        from_ts, to_ts = compute_live_slice(watermark, run, now_ts, read_lag, slice_seconds, safety_delay)
+    else:
+        from_ts, to_ts = compute_agg_slice(watermark, run, now_ts, read_lag, slice_seconds, safety_delay)
+
+    if not from_ts:
+        return None
+
+    start = time.time()
+    try:
+        rows = ingest_slice(run, stream, from_ts, to_ts)
+    except LeaseLost:
+        log.warning("Lease on %s/%s lost, uncommitted chunk rolled back", run.test_run, stream)
+        return None
+
+    INGEST_DURATION.labels(stream=stream).observe(time.time() - start)
+    WATERMARK_LAG.labels(stream=stream, test_run=run.test_run).set(
+        (now_ts - to_ts).total_seconds()
+    )
+    return rows
+
+def run_backfill(run) -> int:
+    with get_connection() as tx:
+        updated = backfill_contention(tx, run)
+        if updated:
+            mark_rows_landed(tx, run.test_run, "contention")
+        tx.commit()
+    BACKFILL_UPDATED.labels(test_run=run.test_run).inc(updated)
+    return updated
+
+def get_active_runs() -> List[TestRun]:
+    with get_connection() as conn:
+        rows = fetchall(conn, SQL_GET_ACTIVE_RUNS)
+    ACTIVE_TEST_RUNS.set(len(rows))
+    prune_dedup_caches({r["test_run"] for r in rows})
+    prune_bucket_counts({r["test_run"] for r in rows})
+    prune_plan_states({r["test_run"] for r in rows})
+    breakers.prune({r["test_run"] for r in rows})
+    return [TestRun(**r) for r in rows]
+
 def daemon_loop():
 
     start_http_server(METRICS_PORT)
     log.info("Metrics exposed on :%s", METRICS_PORT)
+    if LEASES_ENABLED:
+        log.info("Replica %s, lease %ss", REPLICA_ID, LEASE_SECONDS)
+    if CONTROL_PORT:
+        start_control_server(CONTROL_PORT)
+        log.info("Control endpoints on :%s", CONTROL_PORT)
+
+    try:
+        with get_connection() as conn:
+            load_column_catalogs(conn)
+    except Exception:
+        log.exception("Column catalog discovery failed, will retry per stream")
 
     backoff = 5
     loop_count = 0
@@ -521,64 +2070,210 @@ def daemon_loop():
     while not shutdown_requested:
 
         loop_count += 1
+        wake_event.clear()
+        profiler.begin_loop()
+        serve_flush_requests()
         now_ts = datetime.now(timezone.utc)
+        tick_start = time.time()
+        tick_streams = {}
 
         try:
-            with get_connection() as conn:
-                rows = fetchall(conn, SQL_GET_ACTIVE_RUNS)
-                ACTIVE_TEST_RUNS.set(len(rows))
+            runs = get_active_runs()
+            sync_leases(runs)
+            throttle.sample()
+            slice_seconds = throttle.slice_seconds()
 
-            for r in rows:
-                run = TestRun(**r)
+            for run in runs:
 
                 for stream in ALL_STREAMS:
-
-                    with get_connection() as conn:
-                        watermark = get_watermark(conn, run.test_run, stream)
-
-                    if stream in LIVE_STREAMS:
-                        from_ts, to_ts = compute_live_slice(watermark, run, now_ts)
-                    else:
-                        from_ts, to_ts = compute_agg_slice(watermark, run, now_ts)
-
-                    if not from_ts:
+                    if not breakers.allow(run.test_run, stream):
                         continue
-
-                    start = time.time()
+                    started = time.time()
                     try:
-                        with get_connection() as tx:
-                            rows = ingest_stream(tx, stream, run, from_ts, to_ts)
-                            set_watermark(tx, run.test_run, stream, to_ts)
-                            tx.commit()
-
-                        INGEST_ROWS.labels(stream=stream).inc(rows)
-                        INGEST_DURATION.labels(stream=stream).observe(time.time() - start)
-                        WATERMARK_LAG.labels(stream=stream, test_run=run.test_run).set(
-                            (now_ts - to_ts).total_seconds()
-                        )
-
-                    except Exception:
+                        process_stream(run, stream, now_ts, slice_seconds)
+                        breakers.success(run.test_run, stream)
+                    except Exception as e:
                         INGEST_ERRORS.labels(stream=stream).inc()
-                        log.exception("Stream failed: %s", stream)
+                        breakers.failure(run.test_run, stream, e)
+                    tick_streams[stream] = tick_streams.get(stream, 0.0) + time.time() - started
 
-                if BACKFILL_ENABLED and loop_count % BACKFILL_EVERY_N_LOOPS == 0:
+                if (BACKFILL_ENABLED and loop_count % BACKFILL_EVERY_N_LOOPS == 0
+                        and owns_lease(run.test_run, "contention")
+                        and breakers.allow(run.test_run, "backfill")):
+                    started = time.time()
                     try:
-                        with get_connection() as tx:
-                            updated = backfill_contention(tx, run)
-                            tx.commit()
-                        BACKFILL_UPDATED.labels(test_run=run.test_run).inc(updated)
-                    except Exception:
-                        log.exception("Backfill failed")
+                        run_backfill(run)
+                        breakers.success(run.test_run, "backfill")
+                    except Exception as e:
+                        breakers.failure(run.test_run, "backfill", e)
+                    tick_streams["backfill"] = tick_streams.get("backfill", 0.0) + time.time() - started
 
             backoff = 5
-            time.sleep(LOOP_INTERVAL_SECONDS + random.uniform(0, JITTER_SECONDS))
+            delay = throttle.interval() + random.uniform(0, JITTER_SECONDS)
 
         except Exception:
             log.exception("Top-level failure")
-            time.sleep(backoff)
+            delay = backoff
             backoff = min(backoff * 2, 60)
 
+        busy = time.time() - tick_start
+        slow_ticks.record(loop_count, busy, tick_streams)
+        throttle.record(busy, busy + delay)
+        profiler.end_loop()
+        wake_event.wait(delay)
+
+    try:
+        release_all_leases()
+    except Exception:
+        log.exception("Could not release leases")
     log.info("Daemon exiting cleanly.")
 
+# ==========================================================
+# EMBEDDED COLLECTOR
+# ==========================================================
+
+# collectors own leases as COLLECTOR_PREFIX + host-pid, set by the workload before loading us
+COLLECTOR_PREFIX = "collector:"
+
+# take a lease over from a daemon replica (its next slice fails its fence), but only
+# when it is free, expired or ours if another collector holds it
+SQL_PIN_LEASE = """
+INSERT INTO workload_test.ingest_leases (test_run, stream, owner, epoch, expires_at)
+VALUES (%s, %s, %s, 1, now() + %s * INTERVAL '1 second')
+ON CONFLICT (test_run, stream) DO UPDATE
+SET owner = excluded.owner,
+    epoch = ingest_leases.epoch + 1,
+    expires_at = excluded.expires_at,
+    updated_at = now()
+WHERE ingest_leases.expires_at <= now()
+   OR ingest_leases.owner = excluded.owner
+   OR ingest_leases.owner NOT LIKE %s || '%%'
+RETURNING epoch
+"""
+
+def pin_leases(test_run, streams):
+    """
+    Renew the pinned leases we still hold and take over the rest from the daemon.
+    A lease another collector holds is left alone, so with several workload
+    processes one collector ingests each stream and the others stay idle.
+    """
+    if not LEASES_ENABLED:
+        return
+    with get_connection() as conn:
+        renewed = fetchall(conn, SQL_RENEW_LEASES, (LEASE_SECONDS, REPLICA_ID))
+        conn.commit()
+        _owned_leases.clear()
+        _owned_leases.update({(r["test_run"], r["stream"]): r["epoch"] for r in renewed})
+        for stream in streams:
+            if (test_run, stream) not in _owned_leases:
+                row = fetchone(conn, SQL_PIN_LEASE, (test_run, stream, REPLICA_ID, LEASE_SECONDS,
+                                                     COLLECTOR_PREFIX))
+                conn.commit()
+                if not row:
+                    continue
+                _owned_leases[(test_run, stream)] = row["epoch"]
+                LEASE_CHANGES.labels(change="pinned").inc()
+                log.info("Pinned lease on %s/%s (epoch %s)", test_run, stream, row["epoch"])
+
+class EmbeddedCollector(threading.Thread):
+    """
+    Ingest the live streams of one run from inside the workload process, every
+    `interval` seconds and `safety_delay` seconds behind now, so short runs don't
+    lose insights to eviction while waiting for the daemon's next tick.  The
+    run's live stream leases are pinned to this process unless another collector
+    holds them; the daemon leaves them alone until stop() releases them, then
+    resumes from the same watermarks.
+    CPU and wall time are accounted to the collector thread alone.
+    """
+
+    def __init__(self, test_run: str, interval: float = 0.5, safety_delay: float = 1.0):
+        super().__init__(name="obs-collector", daemon=True)
+        self.test_run = test_run
+        self.interval = interval
+        self.safety_delay = safety_delay
+        self.stop_event = threading.Event()
+        self.ticks = self.rows = self.errors = 0
+        self.cpu_seconds = self.busy_seconds = self.max_tick_seconds = 0.0
+        self.started_at = time.perf_counter()
+        self.process_cpu_at_start = time.process_time()
+        self.finished: Optional[Tuple[float, float]] = None   # (wall, process cpu) at exit
+
+    def run(self):
+        with get_connection() as conn:
+            row = fetchone(conn, SQL_GET_RUN, (self.test_run,))
+        if not row:
+            log.error("Collector: unknown test run %s", self.test_run)
+            return
+        run = TestRun(**row)
+        try:
+            self._collect(run)
+        finally:
+            self.finished = (time.perf_counter(), time.process_time())
+            try:
+                release_all_leases()
+            except Exception:
+                log.exception("Collector could not release leases")
+
+    def _collect(self, run):
+        renew_at = 0.0
+        while not self.stop_event.is_set():
+            started, cpu = time.perf_counter(), time.thread_time()
+            now_ts = datetime.now(timezone.utc)
+            idle = True
+            try:
+                if started >= renew_at:
+                    pin_leases(run.test_run, LIVE_STREAMS)
+                    renew_at = started + LEASE_SECONDS / 3
+                for stream in LIVE_STREAMS:
+                    # catch up in whole slices, then follow now - safety_delay
+                    while True:
+                        n = process_stream(run, stream, now_ts, safety_delay=self.safety_delay)
+                        if n is None:
+                            break
+                        self.rows += n
+                        idle = False
+            except Exception:
+                self.errors += 1
+                log.exception("Collector tick failed")
+
+            elapsed = time.perf_counter() - started
+            self.ticks += 1
+            self.busy_seconds += elapsed
+            self.cpu_seconds += time.thread_time() - cpu
+            self.max_tick_seconds = max(self.max_tick_seconds, elapsed)
+            if idle and now_ts - timedelta(seconds=self.safety_delay) >= run.end_time:
+                log.info("Collector: %s ended, live streams drained", run.test_run)
+                break
+            self.stop_event.wait(max(0.0, self.interval - elapsed))
+
+    def stop(self, timeout: float = 30.0) -> dict:
+        self.stop_event.set()
+        self.join(timeout)
+        return self.report()
+
+    def report(self) -> dict:
+        wall, cpu = self.finished or (time.perf_counter(), time.process_time())
+        process_cpu = cpu - self.process_cpu_at_start
+        return {
+            "test_run": self.test_run,
+            "ticks": self.ticks,
+            "rows": self.rows,
+            "errors": self.errors,
+            "wall_seconds": round(wall - self.started_at, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "process_cpu_seconds": round(process_cpu, 3),
+            "cpu_share": round(self.cpu_seconds / process_cpu, 4) if process_cpu > 0 else 0.0,
+            "mean_tick_ms": round(1000 * self.busy_seconds / self.ticks, 2) if self.ticks else 0.0,
+            "max_tick_ms": round(1000 * self.max_tick_seconds, 2),
+        }
+
 if __name__ == "__main__":
+    # only as the daemon: the benchmarks and the embedded collector import this
+    # module into processes (and threads) that own their signals
+    signal.signal(signal.SIGINT, _handle_signal)
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGUSR1, _handle_profile_signal)
+    if len(sys.argv) > 1 and sys.argv[1] == "flush":
+        sys.exit(flush_cli(sys.argv[2:]))
     daemon_loop()
@@ -1,6 +1,43 @@
 USE schedules;
 
 
+-- the retry error signature of a workload exception (EXACT patterns from v24), shared by
+-- the inspection function and its cached wrapper
+CREATE OR REPLACE FUNCTION workload_test.parse_retry_error(exception_str STRING)
+RETURNS TABLE (
+  retry_error_type  STRING,
+  contention_key    STRING,
+  conflict_ts       TIMESTAMPTZ,
+  txn_id_prefix     STRING
+)
+LANGUAGE SQL
+AS $$
+SELECT
+  substring(exception_str
+    FROM 'TransactionRetryWithProtoRefreshError:[[:space:]]*([A-Za-z_()]+):'
+  ),
+
+  regexp_replace(
+    substring(exception_str
+      FROM 'conflicting txn: meta=\{[^}]*key=([^ ]+)'
+    ),
+    E'\\\\(["\\\\])',   -- match \" or \\
+    E'\\1',             -- keep just " or \
+    'g'
+  ),
+
+  to_timestamp(
+    substring(exception_str
+      FROM 'conflicting txn: meta=\{[^}]*ts=([0-9]+\.[0-9]+)'
+    )::FLOAT8
+  ),
+
+  substring(exception_str
+    FROM '(?:"|\\")sql txn(?:"|\\") meta=\{id=([0-9A-Fa-f]+)'
+  )
+$$;
+
+
 CREATE OR REPLACE FUNCTION workload_test.inspect_contention_from_exception(
   exception_str     STRING,
   in_test_run       STRING,
@@ -42,31 +79,10 @@ DECLARE
   txn_id_prefix     STRING;
 BEGIN
 
-  -- Extract values from exception_str into variables (EXACT patterns from v24)
-  SELECT
-    substring(exception_str
-      FROM 'TransactionRetryWithProtoRefreshError:[[:space:]]*([A-Za-z_()]+):'
-    ),
-
-    regexp_replace(
-      substring(exception_str
-        FROM 'conflicting txn: meta=\{[^}]*key=([^ ]+)'
-      ),
-      E'\\\\(["\\\\])',   -- match \" or \\
-      E'\\1',             -- keep just " or \
-      'g'
-    ),
-
-    to_timestamp(
-      substring(exception_str
-        FROM 'conflicting txn: meta=\{[^}]*ts=([0-9]+\.[0-9]+)'
-      )::FLOAT8
-    ),
-
-    substring(exception_str
-      FROM '(?:"|\\")sql txn(?:"|\\") meta=\{id=([0-9A-Fa-f]+)'
-    )
-  INTO retry_error_type, contention_key, conflict_ts, txn_id_prefix;
+  -- Extract values from exception_str into variables
+  SELECT p.retry_error_type, p.contention_key, p.conflict_ts, p.txn_id_prefix
+  INTO retry_error_type, contention_key, conflict_ts, txn_id_prefix
+  FROM workload_test.parse_retry_error(exception_str) AS p;
 
   -- RAISE NOTICE 'DEBUG extracted: retry_error_type=%, key=%, ts=%, txn_id_prefix=%',
   --   retry_error_type, contention_key, conflict_ts, txn_id_prefix;
@@ -267,8 +283,21 @@ BEGIN
       THEN f.contention_type
     END                                       AS contention_type,
 
+    -- the statement touches the contended table, per the refs parsed at ingest;
+    -- fingerprints ingested before stmt_table_refs existed fall back to the summary
     CASE
-      WHEN f.table_name IS NOT NULL
+      WHEN f.table_name IS NULL THEN false
+      WHEN EXISTS (
+        SELECT 1 FROM workload_test.stmt_table_refs AS r
+        WHERE r.fingerprint_id = st.fingerprint_id
+          AND r.table_name = f.table_name
+          AND (f.schema_name IS NULL OR r.schema_name = f.schema_name)
+          AND (f.database_name IS NULL OR r.database_name = f.database_name)
+      ) THEN true
+      WHEN NOT EXISTS (
+        SELECT 1 FROM workload_test.stmt_table_refs AS r
+        WHERE r.fingerprint_id = st.fingerprint_id
+      )
        AND st.metadata ? 'querySummary'
        AND st.metadata->>'querySummary' LIKE '%'||f.table_name||'%'
       THEN true
@@ -357,3 +386,133 @@ BEGIN
 
 END;
 $$;
+
+
+-- same arguments and rows as inspect_contention_from_exception, served from the cache
+-- when the run has had no new ingest since the same signature was last inspected
+CREATE OR REPLACE FUNCTION workload_test.inspect_contention_cached(
+  exception_str     STRING,
+  in_test_run       STRING,
+  in_app_name       STRING DEFAULT NULL,
+  in_schema_name    STRING DEFAULT NULL,
+  in_option         STRING DEFAULT 'same_app'
+)
+RETURNS TABLE (
+  test_run                 STRING,
+  ord                      INT,
+  role                     STRING,
+  status                   STRING,
+  collection_ts            TIMESTAMPTZ,
+  aggregated_ts            TIMESTAMPTZ,
+  app_name                 STRING,
+  database_name            STRING,
+  schema_name              STRING,
+  table_name               STRING,
+  index_name               STRING,
+  txn_metadata             JSONB,
+  txn_statistics           JSONB,
+  contention_type          STRING,
+  contention               BOOL,
+  fingerprint_id           BYTES,
+  transaction_fingerprint_id BYTES,
+  plan_hash                BYTES,
+  stmt_metadata            JSONB,
+  stmt_statistics          JSONB,
+  sampled_plan             JSONB,
+  aggregation_interval     INTERVAL,
+  index_recommendations    STRING[]
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_retry_error_type  STRING;
+  v_contention_key    STRING;
+  v_conflict_ts       TIMESTAMPTZ;
+  v_txn_id_prefix     STRING;
+  v_signature         STRING;
+  v_ingested_at       TIMESTAMPTZ;
+  v_cached_at         TIMESTAMPTZ;
+  v_valid_as_of       TIMESTAMPTZ;
+BEGIN
+
+  SELECT p.retry_error_type, p.contention_key, p.conflict_ts, p.txn_id_prefix
+  INTO v_retry_error_type, v_contention_key, v_conflict_ts, v_txn_id_prefix
+  FROM workload_test.parse_retry_error(exception_str) AS p;
+
+  v_signature := md5(concat_ws(chr(31),
+    COALESCE(v_retry_error_type, ''), COALESCE(v_contention_key, ''),
+    COALESCE(v_conflict_ts::STRING, ''), COALESCE(v_txn_id_prefix, ''),
+    COALESCE(in_app_name, ''), COALESCE(in_schema_name, ''), COALESCE(in_option, '')));
+
+  SELECT max(s.last_rows_at) INTO v_ingested_at
+  FROM workload_test.ingest_state AS s
+  WHERE s.test_run = in_test_run;
+
+  SELECT e.computed_at, e.valid_as_of
+  INTO v_cached_at, v_valid_as_of
+  FROM workload_test.inspection_cache_entries AS e
+  WHERE e.test_run = in_test_run AND e.signature = v_signature;
+
+  IF v_cached_at IS NOT NULL AND v_valid_as_of IS NOT DISTINCT FROM v_ingested_at THEN
+    UPDATE workload_test.inspection_cache_entries AS e
+    SET hits = e.hits + 1, last_hit_at = now()
+    WHERE e.test_run = in_test_run AND e.signature = v_signature;
+  ELSE
+    DELETE FROM workload_test.inspection_cache_results AS r
+    WHERE r.test_run = in_test_run AND r.signature = v_signature;
+
+    -- keep the function's row order, it sorts by transaction fingerprint then ord
+    INSERT INTO workload_test.inspection_cache_results
+    SELECT
+      in_test_run, v_signature,
+      row_number() OVER (ORDER BY f.transaction_fingerprint_id, f.ord),
+      f.ord, f.role, f.status, f.collection_ts, f.aggregated_ts, f.app_name,
+      f.database_name, f.schema_name, f.table_name, f.index_name,
+      f.txn_metadata, f.txn_statistics, f.contention_type, f.contention,
+      f.fingerprint_id, f.transaction_fingerprint_id, f.plan_hash,
+      f.stmt_metadata, f.stmt_statistics, f.sampled_plan,
+      f.aggregation_interval, f.index_recommendations, now()
+    FROM workload_test.inspect_contention_from_exception(
+      exception_str, in_test_run, in_app_name, in_schema_name, in_option) AS f;
+
+    -- a recompute keeps the entry's hit history
+    INSERT INTO workload_test.inspection_cache_entries AS e
+      (test_run, signature, retry_error_type, contention_key, txn_id_prefix,
+       conflict_ts, app_name, schema_name, option, valid_as_of, computed_at, misses)
+    VALUES (
+      in_test_run, v_signature, v_retry_error_type, v_contention_key, v_txn_id_prefix,
+      v_conflict_ts, in_app_name, in_schema_name, in_option, v_ingested_at, now(), 1
+    )
+    ON CONFLICT (test_run, signature) DO UPDATE
+    SET valid_as_of = excluded.valid_as_of,
+        computed_at = excluded.computed_at,
+        misses = e.misses + 1;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    r.test_run, r.ord, r.role, r.status, r.collection_ts, r.aggregated_ts, r.app_name,
+    r.database_name, r.schema_name, r.table_name, r.index_name,
+    r.txn_metadata, r.txn_statistics, r.contention_type, r.contention,
+    r.fingerprint_id, r.transaction_fingerprint_id, r.plan_hash,
+    r.stmt_metadata, r.stmt_statistics, r.sampled_plan,
+    r.aggregation_interval, r.index_recommendations
+  FROM workload_test.inspection_cache_results AS r
+  WHERE r.test_run = in_test_run AND r.signature = v_signature
+  ORDER BY r.row_no;
+
+END;
+$$;
+
+
+-- hit rate of the inspection cache per run
+CREATE OR REPLACE VIEW workload_test.inspection_cache_stats AS
+SELECT
+  test_run,
+  count(*)                                              AS signatures,
+  sum(hits)                                             AS hits,
+  sum(misses)                                           AS misses,
+  round(sum(hits)::FLOAT8 / NULLIF(sum(hits) + sum(misses), 0), 4) AS hit_ratio,
+  max(last_hit_at)                                      AS last_hit_at
+FROM workload_test.inspection_cache_entries
+GROUP BY test_run;
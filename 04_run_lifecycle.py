@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+
+"""
+Run lifecycle: archive, purge and re-import finished test runs.
+
+  export  <test_run> <dir>   write the run to <dir>/<test_run>/<table>/hour=.../part-0.csv.gz
+                             (or .parquet with --format parquet, requires pyarrow)
+  purge   <test_run>         delete the run in throttled, index-ordered batches
+  archive <test_run> <dir>   export, then purge
+  import  <dir>/<test_run>   load an exported run back for later comparison
+
+Deleting a test_run_configurations row cascades to every observability table in a
+single huge delete that competes with live ingest.  purge removes the child rows
+first in small batches that walk the run's index, so the final cascade is empty.
+"""
+
+import os
+import io
+import sys
+import csv
+import gzip
+import json
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+
+import psycopg
+from psycopg.rows import dict_row
+
+from prometheus_client import start_http_server, Counter, Gauge
+
+# ==========================================================
+# CONFIG
+# ==========================================================
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+NULL_MARKER = "\\N"
+
+log = logging.getLogger("run-lifecycle")
+log.setLevel(LOG_LEVEL)
+
+console = logging.StreamHandler()
+console.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(process)d] %(message)s"))
+log.addHandler(console)
+
+# ==========================================================
+# PROMETHEUS METRICS
+# ==========================================================
+
+LIFECYCLE_ROWS = Counter("obs_lifecycle_rows_total", "Rows exported/deleted/imported", ["phase", "table"])
+LIFECYCLE_REMAINING = Gauge("obs_lifecycle_remaining_rows", "Rows left to delete", ["table"])
+
+# ==========================================================
+# RUN TABLES
+# ==========================================================
+
+# table -> (time column used for hour partitions, column that orders the batched
+# deletes along an index leading with test_run)
+RUN_TABLES = {
+    "transaction_contention_events": ("collection_ts", "id"),
+    "cluster_execution_insights":    ("start_time", "txn_fingerprint_id"),
+    "txn_id_map":                    (None, "id"),
+    "cluster_transaction_statistics": ("aggregated_ts", "aggregated_ts"),
+    "cluster_statement_statistics":  ("aggregated_ts", "aggregated_ts"),
+    "client_latency":                ("second", "op"),
+}
+
+# streams the daemon keeps an ingest_state watermark for
+INGEST_STREAMS = ("contention", "insights", "stmt_stats", "txn_stats")
+
+# STMT_STATS_LAYOUT=dedup stores the hourly rows in their own table; the shared
+# dictionaries are exported for the run's fingerprints but never purged
+DEDUP_STMT_TABLE = "cluster_statement_statistics_dedup"
+DICTIONARY_TABLES = {
+    "stmt_fingerprint_dictionary": ("fingerprint_id",),
+    "plan_dictionary":             ("fingerprint_id", "plan_hash"),
+}
+
+# ==========================================================
+# DB HELPERS
+# ==========================================================
+
+def get_connection():
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL not set")
+    return psycopg.connect(DATABASE_URL, autocommit=True)
+
+def fetchall(conn, sql, params=None):
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+def fetchone(conn, sql, params=None):
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(sql, params)
+        return cur.fetchone()
+
+def table_columns(conn, table):
+    rows = fetchall(conn, """
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_schema = 'workload_test' AND table_name = %s
+          AND column_name <> 'id'
+          AND is_hidden = 'NO'
+        ORDER BY ordinal_position
+    """, (table,))
+    return [r["column_name"] for r in rows]
+
+def stmt_stats_layout(conn):
+    row = fetchone(conn, """
+        SELECT count(*) AS n FROM information_schema.tables
+        WHERE table_schema = 'workload_test' AND table_name = %s
+    """, (DEDUP_STMT_TABLE,))
+    return "dedup" if row["n"] else "full"
+
+def run_tables(layout):
+    tables = dict(RUN_TABLES)
+    if layout == "dedup":
+        tables[DEDUP_STMT_TABLE] = tables.pop("cluster_statement_statistics")
+    return tables
+
+def get_run(conn, test_run):
+    return fetchone(conn, """
+        SELECT test_run, database_name, start_time, end_time, agg_grace_interval,
+               now() >= end_time + agg_grace_interval AS finished
+        FROM workload_test.test_run_configurations
+        WHERE test_run = %s
+    """, (test_run,))
+
+# ==========================================================
+# EXPORT
+# ==========================================================
+
+def _write_partition(path, fmt, csv_bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if fmt == "parquet":
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+        header = next(csv.reader(io.StringIO(csv_bytes.split(b"\n", 1)[0].decode())))
+        table = pacsv.read_csv(
+            io.BytesIO(csv_bytes),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: "string" for c in header},
+                null_values=[NULL_MARKER],
+                strings_can_be_null=True,
+            ),
+        )
+        pq.write_table(table, path, compression="zstd")
+    else:
+        with gzip.open(path, "wb") as f:
+            f.write(csv_bytes)
+
+def _copy_out(conn, columns, table, where, params):
+    cols = ", ".join(columns)
+    with psycopg.ClientCursor(conn) as cur:
+        query = cur.mogrify(f"SELECT {cols} FROM workload_test.{table} WHERE {where}", params)
+        buf = io.BytesIO()
+        with cur.copy(f"COPY ({query}) TO STDOUT WITH CSV HEADER NULL '{NULL_MARKER}'") as cp:
+            for data in cp:
+                buf.write(data)
+    return buf.getvalue()
+
+def _count_rows(csv_bytes):
+    return max(0, sum(1 for _ in csv.reader(io.StringIO(csv_bytes.decode()))) - 1)
+
+def export_run(conn, test_run, out_dir, fmt):
+    run = get_run(conn, test_run)
+    if not run:
+        raise SystemExit(f"Unknown test run {test_run}")
+
+    layout = stmt_stats_layout(conn)
+    run_dir = os.path.join(out_dir, test_run)
+    ext = "parquet" if fmt == "parquet" else "csv.gz"
+    manifest = {
+        "test_run": test_run,
+        "format": fmt,
+        "layout": layout,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "configuration": {k: str(v) for k, v in run.items() if k != "finished"},
+        "tables": {},
+    }
+
+    for table, (ts_col, _) in run_tables(layout).items():
+        columns = table_columns(conn, table)
+        if ts_col:
+            hours = [r["hour"] for r in fetchall(conn, f"""
+                SELECT DISTINCT date_trunc('hour', {ts_col}) AS hour
+                FROM workload_test.{table} WHERE test_run = %s ORDER BY 1
+            """, (test_run,))]
+        else:
+            hours = [None]
+
+        parts = []
+        for hour in hours:
+            if hour is None:
+                where, params, label = "test_run = %s", (test_run,), "all"
+            else:
+                where = f"test_run = %s AND {ts_col} >= %s AND {ts_col} < %s + INTERVAL '1 hour'"
+                params, label = (test_run, hour, hour), hour.strftime("%Y-%m-%dT%H")
+            data = _copy_out(conn, columns, table, where, params)
+            rows = _count_rows(data)
+            if not rows:
+                continue
+            rel = os.path.join(table, f"hour={label}", f"part-0.{ext}")
+            _write_partition(os.path.join(run_dir, rel), fmt, data)
+            parts.append({"path": rel, "rows": rows})
+            LIFECYCLE_ROWS.labels(phase="export", table=table).inc(rows)
+
+        manifest["tables"][table] = {"columns": columns, "partitions": parts}
+        log.info("Exported %s: %d rows in %d partitions", table, sum(p["rows"] for p in parts), len(parts))
+
+    if layout == "dedup":
+        for table, key in DICTIONARY_TABLES.items():
+            columns = table_columns(conn, table)
+            match = " AND ".join(f"s.{k} = d.{k}" for k in key)
+            where = f"""EXISTS (
+                SELECT 1 FROM workload_test.{DEDUP_STMT_TABLE} s
+                WHERE s.test_run = %s AND {match})"""
+            cols = [f"d.{c}" for c in columns]
+            data = _copy_out(conn, cols, f"{table} d", where, (test_run,))
+            rel = os.path.join(table, "hour=all", f"part-0.{ext}")
+            _write_partition(os.path.join(run_dir, rel), fmt, data)
+            manifest["tables"][table] = {"columns": columns, "partitions": [{"path": rel, "rows": _count_rows(data)}]}
+
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    log.info("Export of %s complete: %s", test_run, run_dir)
+    return run_dir
+
+# ==========================================================
+# PURGE
+# ==========================================================
+
+def purge_run(conn, test_run, batch_size, sleep_ms, force=False):
+    run = get_run(conn, test_run)
+    if not run:
+        raise SystemExit(f"Unknown test run {test_run}")
+    if not run["finished"] and not force:
+        raise SystemExit(f"Test run {test_run} is still within end_time + agg_grace_interval, use --force")
+
+    for table, (_, order_col) in run_tables(stmt_stats_layout(conn)).items():
+        total = fetchone(conn, f"SELECT count(*) AS n FROM workload_test.{table} WHERE test_run = %s",
+                         (test_run,))["n"]
+        LIFECYCLE_REMAINING.labels(table=table).set(total)
+        if not total:
+            continue
+
+        deleted = 0
+        last_key = None
+        started = time.time()
+        while True:
+            # walk the index from the last deleted key, so each batch starts past
+            # the MVCC tombstones left by the previous one
+            if last_key is None:
+                where, params = "test_run = %s", (test_run, batch_size)
+            else:
+                where, params = f"test_run = %s AND {order_col} >= %s", (test_run, last_key, batch_size)
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    DELETE FROM workload_test.{table}
+                    WHERE {where}
+                    ORDER BY {order_col}
+                    LIMIT %s
+                    RETURNING {order_col}
+                """, params)
+                keys = [r[0] for r in cur.fetchall()]
+            if not keys:
+                break
+
+            last_key = keys[-1]
+            deleted += len(keys)
+            LIFECYCLE_ROWS.labels(phase="purge", table=table).inc(len(keys))
+            LIFECYCLE_REMAINING.labels(table=table).set(max(0, total - deleted))
+
+            elapsed = time.time() - started
+            rate = deleted / elapsed if elapsed > 0 else 0.0
+            eta = (total - deleted) / rate if rate > 0 else 0.0
+            log.info("Purge %s: %d/%d rows (%.1f%%) %.0f rows/s eta %.0fs",
+                     table, deleted, total, 100.0 * deleted / total, rate, eta)
+            time.sleep(sleep_ms / 1000)
+
+    conn.execute("DELETE FROM workload_test.ingest_state WHERE test_run = %s", (test_run,))
+    conn.execute("DELETE FROM workload_test.ingest_leases WHERE test_run = %s", (test_run,))
+    conn.execute("DELETE FROM workload_test.agg_bucket_state WHERE test_run = %s", (test_run,))
+    conn.execute("DELETE FROM workload_test.contention_graphs WHERE test_run = %s", (test_run,))
+    conn.execute("DELETE FROM workload_test.plan_changes WHERE test_run = %s", (test_run,))
+    conn.execute("DELETE FROM workload_test.test_run_configurations WHERE test_run = %s", (test_run,))
+    log.info("Purge of %s complete", test_run)
+
+# ==========================================================
+# IMPORT
+# ==========================================================
+
+def _read_partition(path, fmt):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        columns = table.column_names
+        for row in table.to_pylist():
+            yield [row[c] for c in columns]
+    else:
+        with gzip.open(path, "rt", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                yield [None if v == NULL_MARKER else v for v in row]
+
+def import_run(conn, run_dir, as_run=None):
+    with open(os.path.join(run_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    layout = stmt_stats_layout(conn)
+    if manifest["layout"] != layout:
+        raise SystemExit(f"Archive uses the {manifest['layout']} layout but the cluster uses {layout}")
+
+    test_run = as_run or manifest["test_run"]
+    if get_run(conn, test_run):
+        raise SystemExit(f"Test run {test_run} already exists, use --as-run to import under a new name")
+
+    cfg = manifest["configuration"]
+    # the watermarks go in with the configuration, otherwise the daemon sees a run
+    # without any and starts copying live data into it
+    with conn.transaction():
+        conn.execute("""
+            INSERT INTO workload_test.test_run_configurations
+              (test_run, database_name, start_time, end_time, agg_grace_interval)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (test_run, cfg["database_name"], cfg["start_time"], cfg["end_time"], cfg["agg_grace_interval"]))
+        conn.execute("""
+            INSERT INTO workload_test.ingest_state (test_run, stream, watermark_ts)
+            SELECT t.test_run, s.stream, t.end_time + t.agg_grace_interval
+            FROM workload_test.test_run_configurations t, unnest(%s::STRING[]) AS s (stream)
+            WHERE t.test_run = %s
+        """, (list(INGEST_STREAMS), test_run))
+
+    fmt = manifest["format"]
+    for table, spec in manifest["tables"].items():
+        columns = spec["columns"]
+        paths = [os.path.join(run_dir, p["path"]) for p in spec["partitions"]]
+
+        if table in DICTIONARY_TABLES:
+            placeholders = ", ".join(["%s"] * len(columns))
+            sql = f"""
+                INSERT INTO workload_test.{table} ({', '.join(columns)}) VALUES ({placeholders})
+                ON CONFLICT ({', '.join(DICTIONARY_TABLES[table])}) DO NOTHING
+            """
+            with conn.cursor() as cur:
+                for path in paths:
+                    cur.executemany(sql, list(_read_partition(path, fmt)))
+            continue
+
+        run_idx = columns.index("test_run")
+        rows = 0
+        with conn.cursor() as cur:
+            for path in paths:
+                with conn.transaction():
+                    with cur.copy(f"COPY workload_test.{table} ({', '.join(columns)}) FROM STDIN") as cp:
+                        for row in _read_partition(path, fmt):
+                            row[run_idx] = test_run
+                            cp.write_row(row)
+                            rows += 1
+        LIFECYCLE_ROWS.labels(phase="import", table=table).inc(rows)
+        log.info("Imported %s: %d rows", table, rows)
+
+    log.info("Import of %s complete", test_run)
+
+# ==========================================================
+# MAIN
+# ==========================================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--metrics-port", type=int, default=None, help="expose progress metrics for prometheus")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def _purge_args(p):
+        p.add_argument("--batch-size", type=int, default=int(os.getenv("PURGE_BATCH_SIZE", "1000")))
+        p.add_argument("--sleep-ms", type=int, default=int(os.getenv("PURGE_SLEEP_MS", "200")),
+                       help="pause between delete batches so live ingest keeps priority")
+        p.add_argument("--force", action="store_true", help="purge a run that is not finished yet")
+
+    p = sub.add_parser("export")
+    p.add_argument("test_run")
+    p.add_argument("out_dir")
+    p.add_argument("--format", choices=("csv", "parquet"), default="csv")
+
+    p = sub.add_parser("purge")
+    p.add_argument("test_run")
+    _purge_args(p)
+
+    p = sub.add_parser("archive")
+    p.add_argument("test_run")
+    p.add_argument("out_dir")
+    p.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    _purge_args(p)
+
+    p = sub.add_parser("import")
+    p.add_argument("run_dir")
+    p.add_argument("--as-run", default=None, help="import under a different test_run name")
+
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+        log.info("Metrics exposed on :%s", args.metrics_port)
+
+    with get_connection() as conn:
+        if args.command == "export":
+            export_run(conn, args.test_run, args.out_dir, args.format)
+        elif args.command == "purge":
+            purge_run(conn, args.test_run, args.batch_size, args.sleep_ms, args.force)
+        elif args.command == "archive":
+            export_run(conn, args.test_run, args.out_dir, args.format)
+            purge_run(conn, args.test_run, args.batch_size, args.sleep_ms, args.force)
+        elif args.command == "import":
+            import_run(conn, args.run_dir, args.as_run)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(130)
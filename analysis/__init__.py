@@ -0,0 +1,38 @@
+"""
+Offline analysis of persisted test runs.
+
+    from analysis import load_run, top_fingerprints, run_deltas
+
+    run = load_run("load_test_2026_02_19")          # fetched once, then Parquet cache
+    top_fingerprints(run["stmt_stats"], n=10)
+    run_deltas(load_run("load_test_2026_02_18")["stmt_stats"], run["stmt_stats"])
+
+Requires pandas and pyarrow (pip install pandas pyarrow).
+"""
+
+from analysis.loader import TABLES, CACHE_DIR, load_run, load_frame, fetch_table
+from analysis.stats import (
+    weighted_latency,
+    top_fingerprints,
+    run_deltas,
+    contention_by_table,
+    retries_by_fingerprint,
+)
+from analysis.contention_graph import ContentionGraph, build_graph, load_graph, analyze as analyze_contention
+
+__all__ = [
+    "TABLES",
+    "CACHE_DIR",
+    "load_run",
+    "load_frame",
+    "fetch_table",
+    "weighted_latency",
+    "top_fingerprints",
+    "run_deltas",
+    "contention_by_table",
+    "retries_by_fingerprint",
+    "ContentionGraph",
+    "build_graph",
+    "load_graph",
+    "analyze_contention",
+]
@@ -0,0 +1,45 @@
+"""
+python -m analysis <test_run> [--compare <base_run>] [--top N] [--metric svc_lat] [--refresh]
+"""
+
+import sys
+import logging
+import argparse
+
+import pandas as pd
+
+from analysis import load_run, top_fingerprints, run_deltas, contention_by_table, retries_by_fingerprint
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m analysis", description="Summarize a persisted test run")
+    parser.add_argument("test_run")
+    parser.add_argument("--compare", metavar="BASE_RUN", help="show per-fingerprint deltas from this run")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--metric", default="svc_lat", help="svc_lat, run_lat, plan_lat, idle_lat, rows_read, ...")
+    parser.add_argument("--refresh", action="store_true", help="re-fetch from the cluster instead of the cache")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_colwidth", 80)
+
+    run = load_run(args.test_run, refresh=args.refresh)
+
+    print(f"\n== Top {args.top} statement fingerprints by total {args.metric} ==")
+    print(top_fingerprints(run["stmt_stats"], args.top, args.metric).to_string(index=False))
+
+    print("\n== Contention by table ==")
+    print(contention_by_table(run["contention"]).head(args.top).to_string(index=False))
+
+    print("\n== Failures and retries ==")
+    print(retries_by_fingerprint(run["insights"]).head(args.top).to_string(index=False))
+
+    if args.compare:
+        base = load_run(args.compare, tables=("stmt_stats",), refresh=args.refresh)
+        print(f"\n== {args.metric} deltas {args.compare} -> {args.test_run} ==")
+        print(run_deltas(base["stmt_stats"], run["stmt_stats"], args.metric).head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
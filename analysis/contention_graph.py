@@ -0,0 +1,303 @@
+"""
+Contention dependency graph of a persisted test run.
+
+Nodes are transaction fingerprints, and an edge blocking -> waiting carries the
+contention seconds and event count between the pair in a time window.  Events
+are aggregated per pair on the cluster and streamed in, so memory is bounded by
+the number of distinct pairs rather than events.  The graph is held as integer
+indexed CSR arrays, on which we compute:
+
+  - strongly connected components (iterative Tarjan), i.e. blocking cycles
+  - blame per node: the seconds it blocked others directly, plus a damped share
+    of the blame of its victims, proportional to how much of their waiting it caused
+  - the heaviest blocking chains over the component DAG
+
+  python -m analysis.contention_graph <test_run> [--from TS] [--to TS] [--json out.json] [--store]
+"""
+
+import os
+import sys
+import json
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+import psycopg
+from psycopg.types.json import Jsonb
+
+ZERO_FP = bytes(8)
+
+SQL_EDGES = """
+SELECT
+  blocking_txn_fingerprint_id AS blocking,
+  waiting_txn_fingerprint_id  AS waiting,
+  count(*)                    AS events,
+  EXTRACT(epoch FROM sum(contention_duration))::FLOAT8 AS seconds
+FROM workload_test.transaction_contention_events
+WHERE test_run = %s
+  AND collection_ts >= %s
+  AND collection_ts < %s
+  AND blocking_txn_fingerprint_id <> %s
+  AND waiting_txn_fingerprint_id <> %s
+GROUP BY 1, 2
+"""
+
+SQL_STORE = """
+UPSERT INTO workload_test.contention_graphs
+  (test_run, window_start, window_end, computed_at, nodes, edges, result)
+VALUES (%s, %s, %s, now(), %s, %s, %s)
+"""
+
+@dataclass
+class ContentionGraph:
+    labels: List[str]            # node index -> txn fingerprint (hex)
+    indptr: np.ndarray           # CSR row pointers, out edges of node i are indptr[i]:indptr[i+1]
+    indices: np.ndarray          # waiting node per edge
+    seconds: np.ndarray          # contention seconds per edge
+    events: np.ndarray           # contention events per edge
+
+    @property
+    def n(self) -> int:
+        return len(self.labels)
+
+    def sources(self) -> np.ndarray:
+        """blocking node per edge"""
+        return np.repeat(np.arange(self.n), np.diff(self.indptr))
+
+    def out_seconds(self) -> np.ndarray:
+        return np.bincount(self.sources(), weights=self.seconds, minlength=self.n)
+
+    def in_seconds(self) -> np.ndarray:
+        return np.bincount(self.indices, weights=self.seconds, minlength=self.n)
+
+def build_graph(pairs) -> ContentionGraph:
+    """pairs: iterable of (blocking, waiting, events, seconds) with bytes/str fingerprints."""
+    ids: dict = {}
+    src, dst, secs, cnts = [], [], [], []
+    for blocking, waiting, events, seconds in pairs:
+        src.append(ids.setdefault(bytes(blocking), len(ids)))
+        dst.append(ids.setdefault(bytes(waiting), len(ids)))
+        cnts.append(events)
+        secs.append(seconds or 0.0)
+
+    n = len(ids)
+    src_a = np.asarray(src, dtype=np.int32)
+    order = np.argsort(src_a, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src_a, minlength=n), out=indptr[1:])
+    labels = [fp.hex() for fp in ids]
+    return ContentionGraph(
+        labels=labels,
+        indptr=indptr,
+        indices=np.asarray(dst, dtype=np.int32)[order],
+        seconds=np.asarray(secs, dtype=np.float64)[order],
+        events=np.asarray(cnts, dtype=np.int64)[order],
+    )
+
+def load_graph(conn, test_run: str, window_start: datetime, window_end: datetime) -> ContentionGraph:
+    """Aggregate the run's events per (blocking, waiting) pair and stream them into a graph."""
+    with conn.transaction():
+        with conn.cursor(name="contention_edges") as cur:
+            cur.itersize = 10000
+            cur.execute(SQL_EDGES, (test_run, window_start, window_end, ZERO_FP, ZERO_FP))
+            return build_graph(cur)
+
+def strongly_connected_components(g: ContentionGraph) -> np.ndarray:
+    """Component id per node (iterative Tarjan, so deep chains don't hit the recursion limit)."""
+    n = g.n
+    index = np.full(n, -1, dtype=np.int64)
+    low = np.zeros(n, dtype=np.int64)
+    on_stack = np.zeros(n, dtype=bool)
+    comp = np.full(n, -1, dtype=np.int64)
+    stack: List[int] = []
+    counter = ncomp = 0
+
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        work = [(root, g.indptr[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            v, edge = work[-1]
+            if edge < g.indptr[v + 1]:
+                work[-1] = (v, edge + 1)
+                w = g.indices[edge]
+                if index[w] < 0:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, g.indptr[w]))
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[v])
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = ncomp
+                    if w == v:
+                        break
+                ncomp += 1
+    return comp
+
+def blame_scores(g: ContentionGraph, damping: float = 0.5, iterations: int = 50, tol: float = 1e-9):
+    """
+    (direct, total) blame seconds per node.  total = direct + damping * sum over
+    victims j != i of total[j] * seconds(i->j) / in_seconds(j); converges since
+    every victim hands out at most `damping` of its blame.  A fingerprint blocking
+    itself keeps that time as direct blame only, it isn't fed back into its total.
+    """
+    direct = g.out_seconds()
+    in_sec = g.in_seconds()
+    src = g.sources()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = np.where((in_sec[g.indices] > 0) & (src != g.indices), g.seconds / in_sec[g.indices], 0.0)
+
+    total = direct.copy()
+    for _ in range(iterations):
+        nxt = direct + damping * np.bincount(src, weights=share * total[g.indices], minlength=g.n)
+        if np.max(np.abs(nxt - total), initial=0.0) < tol:
+            total = nxt
+            break
+        total = nxt
+    return direct, total
+
+def top_chains(g: ContentionGraph, comp: np.ndarray, k: int = 10) -> List[dict]:
+    """
+    Heaviest blocking chains: longest paths by contention seconds over the DAG of
+    components (a cycle counts once, as one component).
+    """
+    ncomp = int(comp.max()) + 1 if g.n else 0
+    src = g.sources()
+    cs, cd = comp[src], comp[g.indices]
+    between = cs != cd
+    # collapse parallel edges between components
+    key = cs[between] * ncomp + cd[between]
+    uniq, inv = np.unique(key, return_inverse=True)
+    w = np.bincount(inv, weights=g.seconds[between]) if len(uniq) else np.zeros(0)
+    e_src, e_dst = uniq // max(ncomp, 1), uniq % max(ncomp, 1)
+
+    # Tarjan numbers components in reverse topological order: every edge goes
+    # from a higher to a lower component id, so ascending ids are already sinks first
+    best = np.zeros(ncomp)
+    nxt = np.full(ncomp, -1, dtype=np.int64)
+    order = np.argsort(e_src, kind="stable")
+    e_src, e_dst, w = e_src[order], e_dst[order], w[order]
+    starts = np.searchsorted(e_src, np.arange(ncomp + 1))
+    for c in range(ncomp):
+        lo, hi = starts[c], starts[c + 1]
+        if lo == hi:
+            continue
+        cand = w[lo:hi] + best[e_dst[lo:hi]]
+        i = int(np.argmax(cand))
+        best[c], nxt[c] = cand[i], e_dst[lo + i]
+
+    members: List[List[str]] = [[] for _ in range(ncomp)]
+    for node, c in enumerate(comp):
+        members[c].append(g.labels[node])
+
+    # skip components that only appear as the tail of a heavier chain
+    has_pred = np.zeros(ncomp, dtype=bool)
+    has_pred[e_dst] = True
+    chains = []
+    for c in np.argsort(-best):
+        if best[c] <= 0 or len(chains) >= k:
+            break
+        if has_pred[c]:
+            continue
+        path, cur = [], int(c)
+        while cur >= 0:
+            path.append(members[cur])
+            cur = int(nxt[cur])
+        chains.append({"seconds": round(float(best[c]), 6), "chain": path})
+    return chains
+
+def analyze(g: ContentionGraph, top: int = 10, damping: float = 0.5) -> dict:
+    comp = strongly_connected_components(g)
+    direct, total = blame_scores(g, damping)
+
+    sizes = np.bincount(comp, minlength=int(comp.max()) + 1) if g.n else np.zeros(0, dtype=np.int64)
+    # a fingerprint blocking itself is a cycle of one
+    src = g.sources()
+    looped = np.zeros(len(sizes), dtype=bool)
+    looped[comp[src[src == g.indices]]] = True
+    cycles = []
+    for c in np.flatnonzero((sizes > 1) | looped):
+        nodes = np.flatnonzero(comp == c)
+        inside = np.isin(g.indices, nodes) & np.isin(src, nodes)
+        cycles.append({"fingerprints": [g.labels[i] for i in nodes],
+                       "seconds": round(float(g.seconds[inside].sum()), 6)})
+    cycles.sort(key=lambda c: -c["seconds"])
+
+    ranked = np.argsort(-total)[:top]
+    return {
+        "nodes": g.n,
+        "edges": int(len(g.indices)),
+        "contention_seconds": round(float(g.seconds.sum()), 6),
+        "blame": [
+            {"fingerprint": g.labels[i], "blame_seconds": round(float(total[i]), 6),
+             "direct_seconds": round(float(direct[i]), 6), "component": int(comp[i])}
+            for i in ranked
+        ],
+        "cycles": cycles[:top],
+        "chains": top_chains(g, comp, top),
+    }
+
+def _ts(value: Optional[str], default: datetime) -> datetime:
+    return datetime.fromisoformat(value) if value else default
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m analysis.contention_graph",
+                                     description="Blocking chains, cycles and blame for a test run")
+    parser.add_argument("test_run")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--from", dest="window_start", help="ISO timestamp (default: run start)")
+    parser.add_argument("--to", dest="window_end", help="ISO timestamp (default: run end)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--damping", type=float, default=0.5, help="share of a victim's blame passed upstream")
+    parser.add_argument("--json", dest="json_path", help="write the result to this file ('-' for stdout)")
+    parser.add_argument("--store", action="store_true", help="upsert the result into workload_test.contention_graphs")
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("DATABASE_URL not set")
+
+    with psycopg.connect(args.url) as conn:
+        run = conn.execute(
+            "SELECT start_time, end_time FROM workload_test.test_run_configurations WHERE test_run = %s",
+            (args.test_run,),
+        ).fetchone()
+        if not run:
+            parser.error(f"Unknown test run {args.test_run}")
+        window_start = _ts(args.window_start, run[0])
+        window_end = _ts(args.window_end, run[1] or datetime.now(timezone.utc))
+
+        g = load_graph(conn, args.test_run, window_start, window_end)
+        result = {"test_run": args.test_run, "window_start": window_start.isoformat(),
+                  "window_end": window_end.isoformat(), **analyze(g, args.top, args.damping)}
+
+        if args.store:
+            conn.execute(SQL_STORE, (args.test_run, window_start, window_end,
+                                     result["nodes"], result["edges"], Jsonb(result)))
+            conn.commit()
+
+    if args.json_path == "-" or not (args.json_path or args.store):
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    elif args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Fetch a test run's workload_test.* rows once and cache them as Parquet.
+
+The statistics JSONB is flattened server side into typed columns while the rows
+stream through a server-side cursor, so a run never has to fit in memory as
+JSON.  Each table lands in <cache_dir>/<test_run>/<name>.parquet and is read
+back memory-mapped.
+"""
+
+import os
+import logging
+from datetime import datetime, timezone
+
+import psycopg
+from psycopg.rows import dict_row
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+log = logging.getLogger("query-analysis")
+
+CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.expanduser("~/.cache/query-analysis"))
+FETCH_BATCH_SIZE = int(os.getenv("ANALYSIS_FETCH_BATCH_SIZE", "5000"))
+
+# latency / row count stats flattened to <name>_mean and <name>_sqdiff
+STMT_LATENCIES = {
+    "svc_lat": "svcLat",
+    "run_lat": "runLat",
+    "plan_lat": "planLat",
+    "parse_lat": "parseLat",
+    "idle_lat": "idleLat",
+    "rows_read": "rowsRead",
+    "rows_written": "rowsWritten",
+}
+TXN_LATENCIES = {
+    "svc_lat": "svcLat",
+    "retry_lat": "retryLat",
+    "commit_lat": "commitLat",
+    "idle_lat": "idleLat",
+}
+
+def _stat_columns(stats: dict) -> list:
+    cols = []
+    for name, key in stats.items():
+        for part in ("mean", "sqDiff"):
+            cols.append((f"{name}_{part.lower()}",
+                         f"(statistics->'statistics'->'{key}'->>'{part}')::FLOAT8", pa.float64()))
+    return cols
+
+# name -> (source table, [(column, select expression, arrow type)])
+TABLES = {
+    "stmt_stats": ("cluster_statement_statistics", [
+        ("aggregated_ts", "aggregated_ts", pa.timestamp("us", tz="UTC")),
+        ("fingerprint_id", "encode(fingerprint_id, 'hex')", pa.string()),
+        ("transaction_fingerprint_id", "encode(transaction_fingerprint_id, 'hex')", pa.string()),
+        ("plan_hash", "encode(plan_hash, 'hex')", pa.string()),
+        ("app_name", "app_name", pa.string()),
+        ("query", "metadata->>'query'", pa.string()),
+        ("full_scan", "(metadata->>'fullScan')::BOOL", pa.bool_()),
+        ("cnt", "(statistics->'statistics'->>'cnt')::INT8", pa.int64()),
+        ("first_attempt_cnt", "(statistics->'statistics'->>'firstAttemptCnt')::INT8", pa.int64()),
+        ("failure_cnt", "(statistics->'statistics'->>'failureCount')::INT8", pa.int64()),
+        ("max_retries", "(statistics->'statistics'->>'maxRetries')::INT8", pa.int64()),
+        ("contention_mean", "(statistics->'execution_statistics'->'contentionTime'->>'mean')::FLOAT8", pa.float64()),
+        ("exec_cnt", "(statistics->'execution_statistics'->>'cnt')::INT8", pa.int64()),
+    ] + _stat_columns(STMT_LATENCIES)),
+    "txn_stats": ("cluster_transaction_statistics", [
+        ("aggregated_ts", "aggregated_ts", pa.timestamp("us", tz="UTC")),
+        ("fingerprint_id", "encode(fingerprint_id, 'hex')", pa.string()),
+        ("app_name", "app_name", pa.string()),
+        ("cnt", "(statistics->'statistics'->>'cnt')::INT8", pa.int64()),
+        ("max_retries", "(statistics->'statistics'->>'maxRetries')::INT8", pa.int64()),
+    ] + _stat_columns(TXN_LATENCIES)),
+    "contention": ("transaction_contention_events", [
+        ("collection_ts", "collection_ts", pa.timestamp("us", tz="UTC")),
+        ("blocking_txn_fingerprint_id", "encode(blocking_txn_fingerprint_id, 'hex')", pa.string()),
+        ("waiting_txn_fingerprint_id", "encode(waiting_txn_fingerprint_id, 'hex')", pa.string()),
+        ("waiting_stmt_fingerprint_id", "encode(waiting_stmt_fingerprint_id, 'hex')", pa.string()),
+        ("contention_seconds", "EXTRACT(epoch FROM contention_duration)::FLOAT8", pa.float64()),
+        ("database_name", "database_name", pa.string()),
+        ("schema_name", "schema_name", pa.string()),
+        ("table_name", "table_name", pa.string()),
+        ("index_name", "index_name", pa.string()),
+        ("contention_type", "contention_type", pa.string()),
+    ]),
+    "insights": ("cluster_execution_insights", [
+        ("start_time", "start_time::TIMESTAMPTZ", pa.timestamp("us", tz="UTC")),
+        ("txn_fingerprint_id", "encode(txn_fingerprint_id, 'hex')", pa.string()),
+        ("stmt_fingerprint_id", "encode(stmt_fingerprint_id, 'hex')", pa.string()),
+        ("problem", "problem", pa.string()),
+        ("status", "status", pa.string()),
+        ("query", "query", pa.string()),
+        ("retries", "retries", pa.int64()),
+        ("error_code", "error_code", pa.string()),
+        ("contention_seconds", "EXTRACT(epoch FROM contention)::FLOAT8", pa.float64()),
+        ("cpu_sql_nanos", "cpu_sql_nanos", pa.int64()),
+    ]),
+}
+
+def cache_path(test_run: str, name: str, cache_dir: str = None) -> str:
+    return os.path.join(cache_dir or CACHE_DIR, test_run, f"{name}.parquet")
+
+def fetch_table(conn, test_run: str, name: str, path: str) -> int:
+    """Stream one table of a run into a Parquet file, batch by batch."""
+    table, columns = TABLES[name]
+    schema = pa.schema([(c, t) for c, _, t in columns])
+    select_list = ",\n  ".join(f"{expr} AS {c}" for c, expr, _ in columns)
+    sql = f"SELECT\n  {select_list}\nFROM workload_test.{table}\nWHERE test_run = %s"
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    rows = 0
+    with conn.transaction():
+        with conn.cursor(name=f"analysis_{name}", row_factory=dict_row) as cur:
+            cur.itersize = FETCH_BATCH_SIZE
+            cur.execute(sql, (test_run,))
+            with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+                while True:
+                    batch = cur.fetchmany(FETCH_BATCH_SIZE)
+                    if not batch:
+                        break
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    rows += len(batch)
+    os.replace(tmp, path)
+    return rows
+
+def load_run(test_run: str, url: str = None, tables=tuple(TABLES), refresh: bool = False,
+             cache_dir: str = None) -> dict:
+    """
+    {name: DataFrame} for a test run, fetched from the cluster on first use (or
+    with refresh=True, e.g. while the run is still being ingested) and from the
+    local Parquet cache afterwards.
+    """
+    missing = [n for n in tables if refresh or not os.path.exists(cache_path(test_run, n, cache_dir))]
+    if missing:
+        url = url or os.getenv("DATABASE_URL")
+        if not url:
+            raise RuntimeError("DATABASE_URL not set and no cached data for " + test_run)
+        with psycopg.connect(url) as conn:
+            for name in missing:
+                started = datetime.now(timezone.utc)
+                rows = fetch_table(conn, test_run, name, cache_path(test_run, name, cache_dir))
+                log.info("Cached %s/%s: %d rows in %.1fs", test_run, name, rows,
+                         (datetime.now(timezone.utc) - started).total_seconds())
+
+    return {
+        name: pq.read_table(cache_path(test_run, name, cache_dir), memory_map=True).to_pandas()
+        for name in tables
+    }
+
+def load_frame(test_run: str, name: str, **kwargs) -> pd.DataFrame:
+    return load_run(test_run, tables=(name,), **kwargs)[name]
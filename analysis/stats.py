@@ -0,0 +1,83 @@
+"""
+Vectorized analyses over the frames returned by analysis.loader.load_run.
+
+Latency stats in crdb_internal are per bucket (cnt, mean, sqDiff).  Buckets are
+pooled with the parallel variance formula instead of averaging the means:
+
+  N    = sum(n_i)
+  mean = sum(n_i * mean_i) / N
+  M2   = sum(sqDiff_i) + sum(n_i * mean_i^2) - N * mean^2
+  std  = sqrt(M2 / (N - 1))
+"""
+
+import numpy as np
+import pandas as pd
+
+STMT_KEYS = ("fingerprint_id",)
+
+def weighted_latency(stats: pd.DataFrame, metric: str = "svc_lat", by=STMT_KEYS) -> pd.DataFrame:
+    """
+    Pool `metric` across buckets per `by` group: cnt, mean, std and total
+    (cnt * mean, the time the group consumed).  Works on stmt_stats and txn_stats.
+    """
+    by = list(by)
+    n = stats["cnt"].fillna(0).to_numpy(dtype=np.float64)
+    mean = stats[f"{metric}_mean"].fillna(0).to_numpy(dtype=np.float64)
+    sqdiff = stats[f"{metric}_sqdiff"].fillna(0).to_numpy(dtype=np.float64)
+
+    parts = stats[by].copy()
+    parts["cnt"] = n
+    parts["sum"] = n * mean
+    parts["sum_sq"] = n * mean * mean
+    parts["sqdiff"] = sqdiff
+    g = parts.groupby(by, sort=False, dropna=False)[["cnt", "sum", "sum_sq", "sqdiff"]].sum()
+
+    N = g["cnt"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pooled_mean = np.where(N > 0, g["sum"].to_numpy() / N, np.nan)
+        m2 = g["sqdiff"].to_numpy() + g["sum_sq"].to_numpy() - N * np.nan_to_num(pooled_mean) ** 2
+        std = np.where(N > 1, np.sqrt(np.clip(m2, 0, None) / (N - 1)), np.nan)
+
+    return pd.DataFrame(
+        {"cnt": N.astype(np.int64), "mean": pooled_mean, "std": std, "total": g["sum"].to_numpy()},
+        index=g.index,
+    ).reset_index()
+
+def top_fingerprints(stmt_stats: pd.DataFrame, n: int = 10, metric: str = "svc_lat",
+                     order_by: str = "total") -> pd.DataFrame:
+    """Top-N statement fingerprints by pooled `order_by` (total, mean or cnt), with their query."""
+    pooled = weighted_latency(stmt_stats, metric)
+    queries = stmt_stats.drop_duplicates("fingerprint_id")[["fingerprint_id", "query", "full_scan"]]
+    return pooled.nlargest(n, order_by).merge(queries, on="fingerprint_id", how="left")
+
+def run_deltas(base: pd.DataFrame, other: pd.DataFrame, metric: str = "svc_lat",
+               by=STMT_KEYS) -> pd.DataFrame:
+    """
+    Per-fingerprint change of the pooled `metric` from run `base` to run `other`.
+    Fingerprints present in only one run keep NaN on the other side.
+    """
+    a = weighted_latency(base, metric, by)
+    b = weighted_latency(other, metric, by)
+    out = a.merge(b, on=list(by), how="outer", suffixes=("_base", "_other"))
+    out["mean_delta"] = out["mean_other"] - out["mean_base"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["mean_pct"] = 100.0 * out["mean_delta"] / out["mean_base"]
+    out["total_delta"] = out["total_other"].fillna(0) - out["total_base"].fillna(0)
+    return out.sort_values("total_delta", ascending=False, key=np.abs, ignore_index=True)
+
+def contention_by_table(contention: pd.DataFrame) -> pd.DataFrame:
+    """Contention events and seconds waited per table/index, most contended first."""
+    return (contention
+            .groupby(["table_name", "index_name"], dropna=False)["contention_seconds"]
+            .agg(events="size", seconds="sum", p99=lambda s: s.quantile(0.99))
+            .sort_values("seconds", ascending=False)
+            .reset_index())
+
+def retries_by_fingerprint(insights: pd.DataFrame) -> pd.DataFrame:
+    """Failed executions and retries per statement fingerprint from the insights."""
+    failed = insights["status"].eq("Failed")
+    return (insights.assign(failed=failed)
+            .groupby(["stmt_fingerprint_id", "query"], dropna=False)
+            .agg(executions=("failed", "size"), failures=("failed", "sum"), retries=("retries", "sum"))
+            .sort_values(["failures", "retries"], ascending=False)
+            .reset_index())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""
+Ingest throughput per index layout (range vs hash-sharded).
+
+For each layout the persisted tables are rebuilt from 01-query-analysis-tables.sql
+(plus 01a-hash-sharded-indexes.sql for the hash layout) in a scratch database, then
+several writers insert synthetic contention events and upsert statement/transaction
+statistics at RATE_MULTIPLIER x the base event rate, the same way the daemon writes
+its slices.  The report shows achieved rows/s and per-batch latency percentiles.
+
+Usage:
+  export DATABASE_URL="postgresql://root@localhost:26257/defaultdb?sslmode=disable"
+  python benchmarks/index_layout_bench.py --layouts range,hash --multiplier 10
+
+The scratch database (obs_bench by default) is dropped and recreated per layout.
+Never point --database at the database holding real test runs.
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+import psycopg
+
+from synthetic import (
+    FingerprintPool,
+    CONTENTION_COLUMNS,
+    STMT_STATS_COLUMNS,
+    TXN_STATS_COLUMNS,
+    contention_row,
+    stmt_stats_row,
+    txn_stats_row,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAYOUT_FILES = {
+    "range": ("01-query-analysis-tables.sql",),
+    "hash": ("01-query-analysis-tables.sql", "01a-hash-sharded-indexes.sql"),
+}
+
+# assumed base events/s per stream, not measurements: they are round defaults of the
+# order a small dbworkload run produces, so a multiplier only compares layouts with
+# each other.  Set BENCH_BASE_*_RATE to rates measured on your own workload (e.g. the
+# rows per second a run adds to workload_test) to compare against it.  Stats streams
+# are expressed as fingerprint upserts per second.
+BASE_RATES = {
+    "contention": float(os.getenv("BENCH_BASE_CONTENTION_RATE", "25")),
+    "stmt_stats": float(os.getenv("BENCH_BASE_STMT_RATE", "10")),
+    "txn_stats": float(os.getenv("BENCH_BASE_TXN_RATE", "4")),
+}
+
+
+def _insert_sql(table, columns, conflict=None):
+    placeholders = ",".join(["%s"] * len(columns))
+    sql = f"INSERT INTO workload_test.{table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if conflict:
+        sql += f" ON CONFLICT ON CONSTRAINT {conflict} DO UPDATE SET statistics = EXCLUDED.statistics"
+    return sql
+
+
+SQL_CONTENTION = _insert_sql("transaction_contention_events", CONTENTION_COLUMNS)
+SQL_STMT_STATS = _insert_sql("cluster_statement_statistics", STMT_STATS_COLUMNS, "uq_stmt_stats")
+SQL_TXN_STATS = _insert_sql("cluster_transaction_statistics", TXN_STATS_COLUMNS, "uq_txn_stats")
+
+
+def setup_layout(url, database, layout, extra_files=()):
+    with psycopg.connect(url, autocommit=True) as conn:
+        conn.execute(f"DROP DATABASE IF EXISTS {database} CASCADE")
+        for name in LAYOUT_FILES[layout] + tuple(extra_files):
+            with open(os.path.join(ROOT, name)) as f:
+                ddl = f.read().replace("schedules", database)
+            conn.execute(ddl)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class Writer(threading.Thread):
+
+    def __init__(self, url, database, test_run, pool, rates, tick_seconds, deadline):
+        super().__init__(daemon=True)
+        self.url = url
+        self.database = database
+        self.test_run = test_run
+        self.pool = pool
+        self.rates = rates
+        self.tick_seconds = tick_seconds
+        self.deadline = deadline
+        self.rows = {s: 0 for s in rates}
+        self.latencies = {s: [] for s in rates}
+        self.errors = 0
+
+    def _batch(self, cur, stream, sql, rows):
+        start = time.time()
+        cur.executemany(sql, rows)
+        cur.connection.commit()
+        self.latencies[stream].append(time.time() - start)
+        self.rows[stream] += len(rows)
+
+    def run(self):
+        carry = {s: 0.0 for s in self.rates}
+        with psycopg.connect(self.url, dbname=self.database, autocommit=False) as conn:
+            with conn.cursor() as cur:
+                while time.time() < self.deadline:
+                    tick_start = time.time()
+                    now = datetime.now(timezone.utc)
+                    bucket = now.replace(minute=0, second=0, microsecond=0)
+                    counts = {}
+                    for s, rate in self.rates.items():
+                        carry[s] += rate * self.tick_seconds
+                        counts[s] = int(carry[s])
+                        carry[s] -= counts[s]
+                    try:
+                        if counts["contention"]:
+                            self._batch(cur, "contention", SQL_CONTENTION, [
+                                contention_row(self.pool, self.test_run, now - timedelta(microseconds=i))
+                                for i in range(counts["contention"])
+                            ])
+                        if counts["stmt_stats"]:
+                            self._batch(cur, "stmt_stats", SQL_STMT_STATS, [
+                                stmt_stats_row(self.pool, self.test_run, bucket, cnt=i + 1)
+                                for i in range(counts["stmt_stats"])
+                            ])
+                        if counts["txn_stats"]:
+                            self._batch(cur, "txn_stats", SQL_TXN_STATS, [
+                                txn_stats_row(self.pool, self.test_run, bucket, cnt=i + 1)
+                                for i in range(counts["txn_stats"])
+                            ])
+                    except psycopg.Error as e:
+                        conn.rollback()
+                        self.errors += 1
+                        print(f"[{self.test_run}] batch failed: {e}", file=sys.stderr)
+                    remaining = self.tick_seconds - (time.time() - tick_start)
+                    if remaining > 0:
+                        time.sleep(remaining)
+
+
+def run_layout(args, layout):
+    setup_layout(args.url, args.database, layout)
+
+    runs = [f"bench_{layout}_{w}" for w in range(args.writers)]
+    with psycopg.connect(args.url, dbname=args.database, autocommit=True) as conn:
+        for test_run in runs:
+            conn.execute(
+                """
+                INSERT INTO workload_test.test_run_configurations (test_run, database_name, start_time, end_time)
+                VALUES (%s, %s, now(), now() + INTERVAL '1 hour')
+                """,
+                (test_run, args.database),
+            )
+
+    rates = {s: r * args.multiplier / args.writers for s, r in BASE_RATES.items()}
+    deadline = time.time() + args.duration
+    writers = [
+        Writer(args.url, args.database, test_run, FingerprintPool(args.fingerprints, seed=w),
+               rates, args.tick_seconds, deadline)
+        for w, test_run in enumerate(runs)
+    ]
+    started = time.time()
+    for w in writers:
+        w.start()
+    for w in writers:
+        w.join()
+    elapsed = time.time() - started
+
+    results = []
+    for stream in BASE_RATES:
+        rows = sum(w.rows[stream] for w in writers)
+        lat = [l for w in writers for l in w.latencies[stream]]
+        results.append({
+            "layout": layout,
+            "stream": stream,
+            "target_rows_s": BASE_RATES[stream] * args.multiplier,
+            "rows_s": rows / elapsed,
+            "p50_ms": percentile(lat, 50) * 1000,
+            "p95_ms": percentile(lat, 95) * 1000,
+            "p99_ms": percentile(lat, 99) * 1000,
+            "errors": sum(w.errors for w in writers),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"), help="cluster connection string (default: $DATABASE_URL)")
+    parser.add_argument("--database", default="obs_bench", help="scratch database, dropped per layout")
+    parser.add_argument("--layouts", default="range,hash", help="comma separated: range,hash")
+    parser.add_argument("--multiplier", type=float, default=10,
+                        help="multiple of the assumed base event rates (BENCH_BASE_*_RATE)")
+    parser.add_argument("--duration", type=int, default=120, help="seconds of ingest per layout")
+    parser.add_argument("--writers", type=int, default=4, help="concurrent writers (one test run each)")
+    parser.add_argument("--fingerprints", type=int, default=500, help="txn fingerprint cardinality")
+    parser.add_argument("--tick-seconds", type=float, default=1.0, help="seconds between writer batches")
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("DATABASE_URL not set")
+
+    results = []
+    for layout in args.layouts.split(","):
+        layout = layout.strip()
+        if layout not in LAYOUT_FILES:
+            parser.error(f"Unknown layout {layout}")
+        print(f"Running {layout} layout for {args.duration}s at {args.multiplier}x of base rates {BASE_RATES} ...")
+        results.extend(run_layout(args, layout))
+
+    header = f"{'layout':<8}{'stream':<12}{'target/s':>10}{'rows/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['layout']:<8}{r['stream']:<12}{r['target_rows_s']:>10.1f}{r['rows_s']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
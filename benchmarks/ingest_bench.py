@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+
+"""
+End-to-end ingest benchmark for 02_copy_obs_data.py.
+
+A scratch database gets the persisted tables (01-query-analysis-tables.sql, plus the
+optional layouts) and a bench_source schema with stand-ins for the crdb_internal
+sources the daemon reads.  A generator process fills the stand-ins at a configurable
+rate and fingerprint cardinality, while this process drives the daemon's own
+process_stream functions (loaded with SOURCE_SCHEMA=bench_source) on a fixed tick.
+run_backfill is only driven with --backfill-every, since the stand-ins accept the
+UPDATE ... FROM that crdb_internal rejects.  The report shows, per stream, rows/s, slice latency percentiles, round
+trips per tick and peak RSS of the collector, so ingest changes can be compared
+run over run without a live workload.
+
+Usage:
+  export DATABASE_URL="postgresql://root@localhost:26257/defaultdb?sslmode=disable"
+  python benchmarks/ingest_bench.py --duration 300 --fingerprints 2000 --multiplier 10
+
+Daemon settings (SLICE_SECONDS, INSERT_BATCH_SIZE, DROP_COLUMNS, ...) are read from
+the environment as usual; --read-timestamp is a shortcut for READ_TIMESTAMP.  With
+--probe-rate a probe process runs a small contended read/write transaction at normal
+priority and reports its latency percentiles, to show what the collector costs the
+workload under test in each read timestamp mode.  --load-profile replays node CPU and
+admission queue readings through a node_metrics stand-in, one step per --load-period
+seconds, to exercise the daemon's load throttle.  The scratch database (obs_ingest_bench by default) is
+dropped and recreated; never point --database at real test runs.
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import multiprocessing
+from datetime import datetime, timedelta, timezone
+
+import psycopg
+
+from synthetic import (
+    DATABASE_NAME,
+    FingerprintPool,
+    CONTENTION_COLUMNS,
+    INSIGHTS_COLUMNS,
+    STMT_STATS_COLUMNS,
+    TXN_STATS_COLUMNS,
+    contention_row,
+    insight_row,
+    stmt_stats_row,
+    txn_stats_row,
+)
+from index_layout_bench import ROOT, LAYOUT_FILES, setup_layout, percentile
+
+SOURCE_SCHEMA = "bench_source"
+TEST_RUN = "ingest_bench"
+
+# stand-ins for the crdb_internal virtual tables, same column names and types;
+# the stats tables are keyed like the in-memory sql stats so the generator can
+# bump cnt on an open bucket the way the cluster does
+SOURCE_DDL = f"""
+CREATE SCHEMA {SOURCE_SCHEMA};
+
+CREATE TABLE {SOURCE_SCHEMA}.transaction_contention_events (
+    collection_ts TIMESTAMPTZ NOT NULL,
+    blocking_txn_id UUID NOT NULL,
+    blocking_txn_fingerprint_id BYTES NOT NULL,
+    waiting_txn_id UUID NOT NULL,
+    waiting_txn_fingerprint_id BYTES NOT NULL,
+    contention_duration INTERVAL NOT NULL,
+    contending_key BYTES NOT NULL,
+    contending_pretty_key STRING NOT NULL,
+    waiting_stmt_id STRING NOT NULL,
+    waiting_stmt_fingerprint_id BYTES NOT NULL,
+    database_name STRING NOT NULL,
+    schema_name STRING NOT NULL,
+    table_name STRING NOT NULL,
+    index_name STRING NULL,
+    contention_type STRING NOT NULL,
+    INDEX (collection_ts)
+);
+
+CREATE TABLE {SOURCE_SCHEMA}.cluster_execution_insights (
+    session_id STRING NOT NULL,
+    txn_id UUID NOT NULL,
+    txn_fingerprint_id BYTES NOT NULL,
+    stmt_id STRING NOT NULL,
+    stmt_fingerprint_id BYTES NOT NULL,
+    problem STRING NOT NULL,
+    causes STRING[] NOT NULL,
+    query STRING NOT NULL,
+    status STRING NOT NULL,
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP NOT NULL,
+    full_scan BOOL NOT NULL,
+    user_name STRING NOT NULL,
+    app_name STRING NOT NULL,
+    database_name STRING NOT NULL,
+    plan_gist STRING NOT NULL,
+    rows_read INT8 NOT NULL,
+    rows_written INT8 NOT NULL,
+    priority STRING NOT NULL,
+    retries INT8 NOT NULL,
+    last_retry_reason STRING NULL,
+    exec_node_ids INT8[] NOT NULL,
+    kv_node_ids INT8[] NOT NULL,
+    contention INTERVAL NULL,
+    index_recommendations STRING[] NOT NULL,
+    implicit_txn BOOL NOT NULL,
+    cpu_sql_nanos INT8 NULL,
+    error_code STRING NULL,
+    last_error_redactable STRING NULL,
+    query_tags JSONB NULL,
+    INDEX (start_time)
+);
+
+CREATE TABLE {SOURCE_SCHEMA}.cluster_statement_statistics (
+    aggregated_ts TIMESTAMPTZ NOT NULL,
+    fingerprint_id BYTES NOT NULL,
+    transaction_fingerprint_id BYTES NOT NULL,
+    plan_hash BYTES NOT NULL,
+    app_name STRING NOT NULL,
+    metadata JSONB NOT NULL,
+    statistics JSONB NOT NULL,
+    sampled_plan JSONB NOT NULL,
+    aggregation_interval INTERVAL NOT NULL,
+    index_recommendations STRING[] NOT NULL,
+    PRIMARY KEY (aggregated_ts, fingerprint_id, transaction_fingerprint_id, plan_hash, app_name)
+);
+
+CREATE TABLE {SOURCE_SCHEMA}.cluster_transaction_statistics (
+    aggregated_ts TIMESTAMPTZ NOT NULL,
+    fingerprint_id BYTES NOT NULL,
+    app_name STRING NOT NULL,
+    metadata JSONB NOT NULL,
+    statistics JSONB NOT NULL,
+    aggregation_interval INTERVAL NOT NULL,
+    PRIMARY KEY (aggregated_ts, fingerprint_id, app_name)
+);
+
+CREATE TABLE {SOURCE_SCHEMA}.node_metrics (
+    store_id INT8 NULL,
+    name STRING NOT NULL PRIMARY KEY,
+    value FLOAT8 NOT NULL
+);
+"""
+
+# a few hot rows the probe transactions read and update, standing in for the workload
+PROBE_DDL = """
+CREATE TABLE public.bench_probe (id INT8 PRIMARY KEY, balance INT8 NOT NULL);
+INSERT INTO public.bench_probe SELECT i, 0 FROM generate_series(1, 100) AS g(i);
+"""
+
+# assumed events/s per stream at multiplier 1 (defaults, not measurements, shared with
+# index_layout_bench.py); stats streams are fingerprint upserts per second
+BASE_RATES = {
+    "contention": float(os.getenv("BENCH_BASE_CONTENTION_RATE", "25")),
+    "insights": float(os.getenv("BENCH_BASE_INSIGHTS_RATE", "5")),
+    "stmt_stats": float(os.getenv("BENCH_BASE_STMT_RATE", "10")),
+    "txn_stats": float(os.getenv("BENCH_BASE_TXN_RATE", "4")),
+}
+
+
+def _upsert_sql(table, columns):
+    placeholders = ",".join(["%s"] * len(columns))
+    return f"UPSERT INTO {SOURCE_SCHEMA}.{table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+SQL_SOURCE = {
+    "contention": _upsert_sql("transaction_contention_events", CONTENTION_COLUMNS[1:]),
+    "insights": _upsert_sql("cluster_execution_insights", INSIGHTS_COLUMNS[1:]),
+    "stmt_stats": _upsert_sql("cluster_statement_statistics", STMT_STATS_COLUMNS[1:]),
+    "txn_stats": _upsert_sql("cluster_transaction_statistics", TXN_STATS_COLUMNS[1:]),
+}
+
+# (key columns, statistics column) positions without test_run, to keep a running cnt per stats row
+STATS_KEYS = {"stmt_stats": (slice(0, 5), 6), "txn_stats": (slice(0, 3), 4)}
+
+
+def parse_load_profile(value):
+    """ "0.3,0.95:25,0.3" -> [(cpu, admission queue), ...] """
+    steps = []
+    for item in filter(None, (v.strip() for v in value.split(","))):
+        cpu, _, queue = item.partition(":")
+        steps.append((float(cpu), float(queue or 0)))
+    return steps
+
+
+def generate(url, database, rates, fingerprints, retention_seconds, tick_seconds, deadline,
+             load_profile=(), load_period=60.0):
+    """Generator process: write synthetic source rows (and node load readings) until the deadline."""
+    pool = FingerprintPool(fingerprints, seed=7)
+    counts = {s: {} for s in STATS_KEYS}
+    carry = {s: 0.0 for s in rates}
+    rows = {
+        "contention": lambda ts: contention_row(pool, TEST_RUN, ts),
+        "insights": lambda ts: insight_row(pool, TEST_RUN, ts),
+        "stmt_stats": lambda ts: stmt_stats_row(pool, TEST_RUN, ts.replace(minute=0, second=0, microsecond=0)),
+        "txn_stats": lambda ts: txn_stats_row(pool, TEST_RUN, ts.replace(minute=0, second=0, microsecond=0)),
+    }
+
+    started = time.time()
+    with psycopg.connect(url, dbname=database, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            while time.time() < deadline:
+                tick_start = time.time()
+                now = datetime.now(timezone.utc)
+                if load_profile:
+                    cpu, queue = load_profile[int((tick_start - started) / load_period) % len(load_profile)]
+                    cur.executemany(f"UPSERT INTO {SOURCE_SCHEMA}.node_metrics (name, value) VALUES (%s, %s)", [
+                        ("sys.cpu.combined.percent-normalized", cpu),
+                        ("admission.wait_queue_length.kv", queue),
+                    ])
+                for stream, rate in rates.items():
+                    carry[stream] += rate * tick_seconds
+                    n, carry[stream] = int(carry[stream]), carry[stream] - int(carry[stream])
+                    batch = []
+                    for i in range(n):
+                        row = rows[stream](now - timedelta(microseconds=i))[1:]
+                        if stream in STATS_KEYS:
+                            keys, stats = STATS_KEYS[stream]
+                            key = row[keys]
+                            counts[stream][key] = counts[stream].get(key, 0) + 1
+                            row[stats].obj["statistics"]["cnt"] = counts[stream][key]
+                        batch.append(row)
+                    if batch:
+                        cur.executemany(SQL_SOURCE[stream], batch)
+
+                # the virtual tables are in-memory ring buffers; emulate their capacity
+                cutoff = now - timedelta(seconds=retention_seconds)
+                cur.execute(f"DELETE FROM {SOURCE_SCHEMA}.transaction_contention_events WHERE collection_ts < %s", (cutoff,))
+                cur.execute(f"DELETE FROM {SOURCE_SCHEMA}.cluster_execution_insights WHERE start_time < %s",
+                            (cutoff.replace(tzinfo=None),))
+
+                remaining = tick_seconds - (time.time() - tick_start)
+                if remaining > 0:
+                    time.sleep(remaining)
+
+
+def probe(url, database, rate, deadline, results):
+    """Probe process: run workload-like transactions at a fixed rate, return latency percentiles."""
+    latencies = []
+    with psycopg.connect(url, dbname=database, autocommit=False) as conn:
+        while time.time() < deadline:
+            started = time.time()
+            a, b = (int(v) for v in os.urandom(2))
+            with conn.cursor() as cur:
+                cur.execute("SELECT balance FROM public.bench_probe WHERE id = %s", (a % 100 + 1,))
+                cur.execute("UPDATE public.bench_probe SET balance = balance + 1 WHERE id = %s", (b % 100 + 1,))
+            try:
+                conn.commit()
+                latencies.append(time.time() - started)
+            except psycopg.Error:
+                conn.rollback()
+            remaining = 1.0 / rate - (time.time() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+    results.put({p: percentile(latencies, p) for p in (50, 95, 99)} | {"count": len(latencies)})
+
+
+def load_daemon(url, database):
+    """Import 02_copy_obs_data.py against the scratch database and the stand-ins."""
+    os.environ["DATABASE_URL"] = psycopg.conninfo.make_conninfo(url, dbname=database)
+    os.environ["SOURCE_SCHEMA"] = SOURCE_SCHEMA
+    os.environ.setdefault("LOG_FILE", os.path.join("/tmp", "ingest_bench.log"))
+    spec = importlib.util.spec_from_file_location("copy_obs_data", os.path.join(ROOT, "02_copy_obs_data.py"))
+    daemon = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(daemon)
+    return daemon
+
+
+class RoundTrips:
+    """Count connections and statements issued through the daemon's DB helpers."""
+
+    def __init__(self, daemon):
+        self.count = 0
+        for name in ("get_connection", "fetchall", "fetchone", "execute"):
+            setattr(daemon, name, self._wrap(getattr(daemon, name)))
+
+    def _wrap(self, fn):
+        def counted(*args, **kwargs):
+            self.count += 1
+            return fn(*args, **kwargs)
+        return counted
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"), help="cluster connection string (default: $DATABASE_URL)")
+    parser.add_argument("--database", default="obs_ingest_bench", help="scratch database, dropped on start")
+    parser.add_argument("--layout", default="range", help="index layout: range,hash")
+    parser.add_argument("--multiplier", type=float, default=10, help="multiple of the base event rate")
+    parser.add_argument("--duration", type=int, default=300, help="seconds to run the generator and the collector")
+    parser.add_argument("--fingerprints", type=int, default=500, help="txn fingerprint cardinality")
+    parser.add_argument("--retention-seconds", type=int, default=600, help="source ring buffer capacity in seconds")
+    parser.add_argument("--generator-tick", type=float, default=1.0, help="seconds between generator batches")
+    parser.add_argument("--tick-seconds", type=float, default=5.0, help="seconds between collector ticks")
+    # off by default: the active backfill_contention is an UPDATE ... FROM the source schema,
+    # which works on the stand-in tables but is rejected on crdb_internal, so its timings
+    # describe a path production can't run
+    parser.add_argument("--backfill-every", type=int, default=0,
+                        help="run the backfill every N ticks (0 = never); stand-in tables only, "
+                             "production can't run this backfill path")
+    parser.add_argument("--read-timestamp", help="daemon READ_TIMESTAMP: current, follower or staleness:N")
+    parser.add_argument("--probe-rate", type=float, default=0, help="workload probe transactions/s (0 = no probe)")
+    parser.add_argument("--load-profile", default="", help="node load steps as cpu[:admission queue], e.g. 0.3,0.95:25,0.3")
+    parser.add_argument("--load-period", type=float, default=60, help="seconds per load profile step")
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("DATABASE_URL not set")
+    if args.layout not in LAYOUT_FILES:
+        parser.error(f"Unknown layout {args.layout}")
+
+    extra = ("01b-dedup-stmt-stats.sql",) if os.getenv("STMT_STATS_LAYOUT", "full").lower() == "dedup" else ()
+    setup_layout(args.url, args.database, args.layout, extra)
+    with psycopg.connect(args.url, dbname=args.database, autocommit=True) as conn:
+        conn.execute(SOURCE_DDL)
+        conn.execute(PROBE_DDL)
+        conn.execute(
+            """
+            INSERT INTO workload_test.test_run_configurations (test_run, database_name, start_time, end_time)
+            VALUES (%s, %s, date_trunc('hour', now()), now() + %s * INTERVAL '1 second')
+            """,
+            (TEST_RUN, DATABASE_NAME, args.duration + 60),
+        )
+
+    if args.read_timestamp:
+        os.environ["READ_TIMESTAMP"] = args.read_timestamp
+    daemon = load_daemon(args.url, args.database)
+    trips = RoundTrips(daemon)
+
+    rates = {s: r * args.multiplier for s, r in BASE_RATES.items()}
+    deadline = time.time() + args.duration
+    generator = multiprocessing.Process(
+        target=generate,
+        args=(args.url, args.database, rates, args.fingerprints, args.retention_seconds,
+              args.generator_tick, deadline, parse_load_profile(args.load_profile), args.load_period),
+        daemon=True,
+    )
+    generator.start()
+    probe_results = multiprocessing.Queue()
+    if args.probe_rate > 0:
+        multiprocessing.Process(
+            target=probe, args=(args.url, args.database, args.probe_rate, deadline, probe_results), daemon=True,
+        ).start()
+    print(f"Generating at {args.multiplier}x for {args.duration}s, collector tick {args.tick_seconds}s ...")
+
+    rows = {s: 0 for s in daemon.ALL_STREAMS}
+    latencies = {s: [] for s in daemon.ALL_STREAMS}
+    peak_rss = {s: 0 for s in daemon.ALL_STREAMS}
+    tick_trips, backfill_latencies, factors, errors = [], [], [], 0
+
+    with daemon.get_connection() as conn:
+        daemon.load_column_catalogs(conn)
+
+    started = time.time()
+    tick = 0
+    while time.time() < deadline:
+        tick += 1
+        tick_start = time.time()
+        before = trips.count
+        now_ts = datetime.now(timezone.utc)
+        runs = daemon.get_active_runs()
+        daemon.sync_leases(runs)
+        factors.append(daemon.throttle.sample())
+        slice_seconds = daemon.throttle.slice_seconds()
+        for run in runs:
+            for stream in daemon.ALL_STREAMS:
+                t0 = time.time()
+                try:
+                    n = daemon.process_stream(run, stream, now_ts, slice_seconds)
+                except Exception as e:
+                    errors += 1
+                    print(f"[{stream}] slice failed: {e}", file=sys.stderr)
+                    continue
+                if n is not None:
+                    latencies[stream].append(time.time() - t0)
+                    rows[stream] += n
+                peak_rss[stream] = max(peak_rss[stream], rss_bytes())
+            if args.backfill_every and tick % args.backfill_every == 0:
+                t0 = time.time()
+                daemon.run_backfill(run)
+                backfill_latencies.append(time.time() - t0)
+        tick_trips.append(trips.count - before)
+        busy = time.time() - tick_start
+        period = max(busy, args.tick_seconds * daemon.throttle.factor)
+        daemon.throttle.record(busy, period)
+        if period > busy:
+            time.sleep(period - busy)
+    elapsed = time.time() - started
+    generator.join()
+
+    header = f"{'stream':<12}{'target/s':>10}{'rows/s':>10}{'slices':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for stream in daemon.ALL_STREAMS:
+        lat = latencies[stream]
+        print(f"{stream:<12}{rates[stream]:>10.1f}{rows[stream] / elapsed:>10.1f}{len(lat):>8}"
+              f"{percentile(lat, 50) * 1000:>10.1f}{percentile(lat, 95) * 1000:>10.1f}"
+              f"{percentile(lat, 99) * 1000:>10.1f}{peak_rss[stream] / 2**20:>10.1f}")
+    if backfill_latencies:
+        print("backfill timings use UPDATE ... FROM the stand-in tables, which crdb_internal rejects")
+        print(f"backfill p50 {percentile(backfill_latencies, 50) * 1000:.1f} ms over {len(backfill_latencies)} runs")
+    if args.probe_rate > 0:
+        p = probe_results.get()
+        print(f"workload probe ({os.getenv('READ_TIMESTAMP', 'current')} reads): {p['count']} txns,"
+              f" p50 {p[50] * 1000:.1f} ms, p95 {p[95] * 1000:.1f} ms, p99 {p[99] * 1000:.1f} ms")
+    throttled = sum(1 for f in factors if f > 1)
+    print(f"throttle: {throttled}/{len(factors)} ticks throttled, max {max(factors, default=1):.0f}x;"
+          f" daemon overhead {daemon.throttle.busy / max(daemon.throttle.period, 1e-9):.1%} of wall time")
+    print(f"round trips/tick: avg {sum(tick_trips) / max(1, len(tick_trips)):.1f}, max {max(tick_trips, default=0)}"
+          f" over {len(tick_trips)} ticks; errors {errors}")
+
+
+if __name__ == "__main__":
+    main()
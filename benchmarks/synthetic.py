@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic observability rows shaped like the crdb_internal sources we persist.
+
+Rows are plain tuples in the column order of the workload_test.* tables (minus
+the generated id), so they can be written straight into the persisted tables.
+"""
+
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from psycopg.types.json import Jsonb
+
+CONTENTION_COLUMNS = (
+    "test_run",
+    "collection_ts",
+    "blocking_txn_id",
+    "blocking_txn_fingerprint_id",
+    "waiting_txn_id",
+    "waiting_txn_fingerprint_id",
+    "contention_duration",
+    "contending_key",
+    "contending_pretty_key",
+    "waiting_stmt_id",
+    "waiting_stmt_fingerprint_id",
+    "database_name",
+    "schema_name",
+    "table_name",
+    "index_name",
+    "contention_type",
+)
+
+INSIGHTS_COLUMNS = (
+    "test_run",
+    "session_id",
+    "txn_id",
+    "txn_fingerprint_id",
+    "stmt_id",
+    "stmt_fingerprint_id",
+    "problem",
+    "causes",
+    "query",
+    "status",
+    "start_time",
+    "end_time",
+    "full_scan",
+    "user_name",
+    "app_name",
+    "database_name",
+    "plan_gist",
+    "rows_read",
+    "rows_written",
+    "priority",
+    "retries",
+    "last_retry_reason",
+    "exec_node_ids",
+    "kv_node_ids",
+    "contention",
+    "index_recommendations",
+    "implicit_txn",
+    "cpu_sql_nanos",
+    "error_code",
+    "last_error_redactable",
+    "query_tags",
+)
+
+STMT_STATS_COLUMNS = (
+    "test_run",
+    "aggregated_ts",
+    "fingerprint_id",
+    "transaction_fingerprint_id",
+    "plan_hash",
+    "app_name",
+    "metadata",
+    "statistics",
+    "sampled_plan",
+    "aggregation_interval",
+    "index_recommendations",
+)
+
+TXN_STATS_COLUMNS = (
+    "test_run",
+    "aggregated_ts",
+    "fingerprint_id",
+    "app_name",
+    "metadata",
+    "statistics",
+    "aggregation_interval",
+)
+
+TABLES = ("flights", "flight_status", "seat_inventory", "flight_prices", "airports")
+APP_NAME = "Transactions"
+DATABASE_NAME = os.getenv("BENCH_SOURCE_DATABASE", "schedules")
+
+
+def _fp(rnd: random.Random) -> bytes:
+    return rnd.getrandbits(64).to_bytes(8, "big")
+
+
+def _stat(rnd: random.Random, mean: float) -> dict:
+    return {"mean": rnd.uniform(0.5, 1.5) * mean, "sqDiff": rnd.uniform(0, mean)}
+
+
+class FingerprintPool:
+    """
+    A fixed set of transaction fingerprints, each with 1-4 statement fingerprints
+    and a plan hash, so generated rows repeat keys the way a real workload does.
+    """
+
+    def __init__(self, cardinality: int, seed: int = 42):
+        self.rnd = random.Random(seed)
+        self.txns = []
+        for _ in range(max(1, cardinality)):
+            table = self.rnd.choice(TABLES)
+            stmts = []
+            for _ in range(self.rnd.randint(1, 4)):
+                verb = self.rnd.choice(("SELECT * FROM {t} WHERE flight_id = _",
+                                        "UPDATE {t} SET updated_at = now() WHERE flight_id IN (_, __more__)",
+                                        "INSERT INTO {t} VALUES (_, __more__)"))
+                stmts.append({
+                    "fingerprint_id": _fp(self.rnd),
+                    "plan_hash": _fp(self.rnd),
+                    "query": verb.format(t=table),
+                    "table": table,
+                })
+            self.txns.append({"fingerprint_id": _fp(self.rnd), "table": table, "stmts": stmts})
+
+    def txn(self):
+        return self.rnd.choice(self.txns)
+
+
+def contention_row(pool: FingerprintPool, test_run: str, ts: datetime) -> tuple:
+    rnd = pool.rnd
+    blocking, waiting = pool.txn(), pool.txn()
+    stmt = rnd.choice(waiting["stmts"])
+    key = rnd.getrandbits(128).to_bytes(16, "big")
+    return (
+        test_run,
+        ts,
+        uuid.uuid4(),
+        blocking["fingerprint_id"],
+        uuid.uuid4(),
+        waiting["fingerprint_id"],
+        timedelta(microseconds=rnd.randint(100, 500_000)),
+        key,
+        f'/Table/107/1/"{key.hex()}"/0',
+        uuid.uuid4().hex,
+        stmt["fingerprint_id"],
+        DATABASE_NAME,
+        "public",
+        waiting["table"],
+        f'{waiting["table"]}_pkey',
+        "LOCK_WAIT",
+    )
+
+
+def insight_row(pool: FingerprintPool, test_run: str, ts: datetime, failed_fraction: float = 0.3) -> tuple:
+    rnd = pool.rnd
+    txn = pool.txn()
+    stmt = rnd.choice(txn["stmts"])
+    failed = rnd.random() < failed_fraction
+    return (
+        test_run,
+        uuid.uuid4().hex,
+        uuid.uuid4(),
+        txn["fingerprint_id"],
+        uuid.uuid4().hex,
+        stmt["fingerprint_id"],
+        "FailedExecution" if failed else "SlowExecution",
+        ["HighContention"] if failed else ["PlanRegression"],
+        stmt["query"],
+        "Failed" if failed else "Completed",
+        ts.replace(tzinfo=None),
+        (ts + timedelta(milliseconds=rnd.randint(1, 500))).replace(tzinfo=None),
+        stmt["query"].startswith("SELECT"),
+        "root",
+        APP_NAME,
+        DATABASE_NAME,
+        "AgHYAQIA",
+        rnd.randint(0, 1000),
+        rnd.randint(0, 16),
+        "normal",
+        rnd.randint(0, 3),
+        "WriteTooOldError" if failed else None,
+        [1],
+        [1],
+        timedelta(milliseconds=rnd.randint(0, 200)),
+        [],
+        len(txn["stmts"]) == 1,
+        rnd.randint(10_000, 1_000_000),
+        "40001" if failed else None,
+        "restart transaction: TransactionRetryWithProtoRefreshError: WriteTooOldError" if failed else None,
+        Jsonb({}),
+    )
+
+
+def _stmt_statistics(rnd: random.Random, cnt: int) -> dict:
+    return {
+        "execution_statistics": {"cnt": rnd.randint(0, cnt)},
+        "statistics": {
+            "cnt": cnt,
+            "firstAttemptCnt": cnt,
+            "maxRetries": rnd.randint(0, 3),
+            "numRows": _stat(rnd, 16),
+            "rowsRead": _stat(rnd, 1000),
+            "rowsWritten": _stat(rnd, 16),
+            "runLat": _stat(rnd, 0.05),
+            "svcLat": _stat(rnd, 0.06),
+            "planLat": _stat(rnd, 0.001),
+            "parseLat": _stat(rnd, 0.0001),
+            "idleLat": _stat(rnd, 0.001),
+            "lastExecAt": datetime.now(timezone.utc).isoformat(),
+        },
+    }
+
+
+def stmt_stats_row(pool: FingerprintPool, test_run: str, aggregated_ts: datetime, cnt: int = 1) -> tuple:
+    rnd = pool.rnd
+    txn = pool.txn()
+    stmt = rnd.choice(txn["stmts"])
+    metadata = {
+        "db": DATABASE_NAME,
+        "query": stmt["query"],
+        "querySummary": stmt["query"][:64],
+        "stmtType": "TypeDML",
+        "implicitTxn": len(txn["stmts"]) == 1,
+        "distsql": False,
+        "fullScan": stmt["query"].startswith("SELECT"),
+        "vec": True,
+    }
+    sampled_plan = {"Name": "scan", "Children": [], "Attrs": [{"Key": "table", "Value": stmt["table"]}]}
+    return (
+        test_run,
+        aggregated_ts,
+        stmt["fingerprint_id"],
+        txn["fingerprint_id"],
+        stmt["plan_hash"],
+        APP_NAME,
+        Jsonb(metadata),
+        Jsonb(_stmt_statistics(rnd, cnt)),
+        Jsonb(sampled_plan),
+        timedelta(hours=1),
+        [],
+    )
+
+
+def txn_stats_row(pool: FingerprintPool, test_run: str, aggregated_ts: datetime, cnt: int = 1) -> tuple:
+    rnd = pool.rnd
+    txn = pool.txn()
+    metadata = {"stmtFingerprintIDs": [s["fingerprint_id"].hex() for s in txn["stmts"]]}
+    statistics = {
+        "execution_statistics": {"cnt": rnd.randint(0, cnt)},
+        "statistics": {
+            "cnt": cnt,
+            "maxRetries": rnd.randint(0, 3),
+            "numRows": _stat(rnd, 16),
+            "svcLat": _stat(rnd, 0.1),
+            "retryLat": _stat(rnd, 0.0),
+            "commitLat": _stat(rnd, 0.002),
+        },
+    }
+    return (
+        test_run,
+        aggregated_ts,
+        txn["fingerprint_id"],
+        APP_NAME,
+        Jsonb(metadata),
+        Jsonb(statistics),
+        timedelta(hours=1),
+    )
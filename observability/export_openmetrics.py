@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+
+"""
+OpenMetrics export of persisted test runs, for backfilling Prometheus.
+
+  python observability/export_openmetrics.py <test_run> [<test_run> ...] --out runs.om
+      [--top 20] [--top-tables 10] [--step 60] [--include-internal] [--blocks DIR]
+
+Statement and transaction statistics are written per hourly bucket, at the bucket's
+aggregated_ts, and contention events are aggregated per --step seconds of
+collection_ts.  Every series carries the run and app.  Only the --top fingerprints
+of each run by total service time (and the --top-tables most contended tables) keep
+their own label, the rest are folded into "other", so a run adds a bounded number of
+series however many fingerprints it executed.
+
+Rows are streamed from the cluster and each metric family is spooled to its own
+temporary file, since OpenMetrics wants a family's samples together.  With --blocks
+the file is turned into TSDB blocks with promtool tsdb create-blocks-from openmetrics.
+"""
+
+import os
+import sys
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+import psycopg
+from psycopg.rows import dict_row
+
+# ==========================================================
+# CONFIG
+# ==========================================================
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# query text on the crdb_run_stmt_query series is cut to keep label values readable
+QUERY_LABEL_CHARS = 200
+
+log = logging.getLogger("export-openmetrics")
+log.setLevel(LOG_LEVEL)
+
+console = logging.StreamHandler()
+console.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(process)d] %(message)s"))
+log.addHandler(console)
+
+# ==========================================================
+# METRIC FAMILIES
+# ==========================================================
+
+# name -> help; every family is a gauge sampled at the bucket / step start
+FAMILIES = {
+    "crdb_run_stmt_executions": "Statement executions in the hourly bucket",
+    "crdb_run_stmt_service_latency_seconds": "Mean statement service latency in the hourly bucket",
+    "crdb_run_stmt_retries": "Statement executions beyond the first attempt in the hourly bucket",
+    "crdb_run_stmt_failures": "Failed statement executions in the hourly bucket",
+    "crdb_run_stmt_query": "1 per exported statement fingerprint, with its query text",
+    "crdb_run_txn_executions": "Transaction executions in the hourly bucket",
+    "crdb_run_txn_service_latency_seconds": "Mean transaction service latency in the hourly bucket",
+    "crdb_run_txn_max_retries": "Most retries of one transaction execution in the hourly bucket",
+    "crdb_run_contention_events": "Contention events in the step",
+    "crdb_run_contention_seconds": "Contention time in the step",
+}
+
+# ==========================================================
+# SQL
+# ==========================================================
+
+# JSON paths shared by the statement and transaction queries
+CNT = "(t.statistics->'statistics'->>'cnt')::INT8"
+SVC = "(t.statistics->'statistics'->'svcLat'->>'mean')::FLOAT8"
+INTERNAL_APPS = "AND t.app_name NOT LIKE '$ internal%%'"
+
+SQL_TOP_STMTS = f"""
+SELECT t.fingerprint_id, min(t.metadata->>'query') AS query
+FROM workload_test.cluster_statement_statistics t
+WHERE t.test_run = %s {{apps}}
+GROUP BY t.fingerprint_id
+ORDER BY sum({CNT} * {SVC}) DESC
+LIMIT %s
+"""
+
+SQL_STMTS = f"""
+SELECT
+  t.aggregated_ts,
+  t.app_name,
+  CASE WHEN t.fingerprint_id = ANY(%s::BYTES[]) THEN encode(t.fingerprint_id, 'hex') ELSE 'other' END AS fingerprint,
+  sum({CNT}) AS executions,
+  sum({CNT} * {SVC}) / NULLIF(sum({CNT}), 0) AS latency,
+  sum({CNT} - COALESCE((t.statistics->'statistics'->>'firstAttemptCnt')::INT8, {CNT})) AS retries,
+  sum(COALESCE((t.statistics->'statistics'->>'failureCount')::INT8, 0)) AS failures
+FROM workload_test.cluster_statement_statistics t
+WHERE t.test_run = %s {{apps}}
+GROUP BY 1, 2, 3
+ORDER BY 2, 3, 1
+"""
+
+SQL_TOP_TXNS = f"""
+SELECT t.fingerprint_id
+FROM workload_test.cluster_transaction_statistics t
+WHERE t.test_run = %s {{apps}}
+GROUP BY t.fingerprint_id
+ORDER BY sum({CNT} * {SVC}) DESC
+LIMIT %s
+"""
+
+SQL_TXNS = f"""
+SELECT
+  t.aggregated_ts,
+  t.app_name,
+  CASE WHEN t.fingerprint_id = ANY(%s::BYTES[]) THEN encode(t.fingerprint_id, 'hex') ELSE 'other' END AS fingerprint,
+  sum({CNT}) AS executions,
+  sum({CNT} * {SVC}) / NULLIF(sum({CNT}), 0) AS latency,
+  max((t.statistics->'statistics'->>'maxRetries')::INT8) AS max_retries
+FROM workload_test.cluster_transaction_statistics t
+WHERE t.test_run = %s {{apps}}
+GROUP BY 1, 2, 3
+ORDER BY 2, 3, 1
+"""
+
+SQL_TOP_TABLES = """
+SELECT database_name || '.' || schema_name || '.' || table_name AS tbl
+FROM workload_test.transaction_contention_events
+WHERE test_run = %s
+GROUP BY 1
+ORDER BY sum(contention_duration) DESC
+LIMIT %s
+"""
+
+SQL_CONTENTION = """
+SELECT
+  to_timestamp(floor(extract(epoch FROM collection_ts) / %s) * %s) AS ts,
+  CASE WHEN database_name || '.' || schema_name || '.' || table_name = ANY(%s::STRING[])
+       THEN database_name || '.' || schema_name || '.' || table_name ELSE 'other' END AS tbl,
+  count(*) AS events,
+  extract(epoch FROM sum(contention_duration))::FLOAT8 AS seconds
+FROM workload_test.transaction_contention_events
+WHERE test_run = %s
+GROUP BY 1, 2
+ORDER BY 2, 1
+"""
+
+# ==========================================================
+# OPENMETRICS WRITER
+# ==========================================================
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _ts(value: datetime) -> str:
+    return f"{value.replace(tzinfo=value.tzinfo or timezone.utc).timestamp():.3f}"
+
+class OpenMetricsWriter:
+    """Spools the samples of each family to a temporary file and joins them on close."""
+
+    def __init__(self, spool_dir: str):
+        self.spools = {name: open(os.path.join(spool_dir, name), "w") for name in FAMILIES}
+        self.samples = 0
+
+    def sample(self, name: str, labels: dict, value, ts: datetime):
+        if value is None:
+            return
+        label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+        self.spools[name].write(f"{name}{{{label_str}}} {float(value)!r} {_ts(ts)}\n")
+        self.samples += 1
+
+    def close(self, out):
+        for name, spool in self.spools.items():
+            spool.close()
+            out.write(f"# HELP {name} {FAMILIES[name]}\n# TYPE {name} gauge\n")
+            with open(spool.name) as f:
+                shutil.copyfileobj(f, out)
+        out.write("# EOF\n")
+
+# ==========================================================
+# EXPORT
+# ==========================================================
+
+def stream(conn, sql, params):
+    """Iterate a query through a server side cursor, so a run is never held in memory."""
+    with conn.cursor(name="export_openmetrics", row_factory=dict_row) as cur:
+        cur.itersize = 5000
+        cur.execute(sql, params)
+        yield from cur
+
+def export_run(conn, writer, test_run, top, top_tables, step, include_internal):
+    apps = "" if include_internal else INTERNAL_APPS
+
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(SQL_TOP_STMTS.format(apps=apps), (test_run, top))
+        top_stmts = cur.fetchall()
+        cur.execute(SQL_TOP_TXNS.format(apps=apps), (test_run, top))
+        top_txns = [r["fingerprint_id"] for r in cur.fetchall()]
+        cur.execute(SQL_TOP_TABLES, (test_run, top_tables))
+        tables = [r["tbl"] for r in cur.fetchall()]
+
+    queries = {bytes(r["fingerprint_id"]).hex(): (r["query"] or "")[:QUERY_LABEL_CHARS] for r in top_stmts}
+    first_seen = {}
+    samples = writer.samples
+
+    for r in stream(conn, SQL_STMTS.format(apps=apps), ([r["fingerprint_id"] for r in top_stmts], test_run)):
+        labels = {"test_run": test_run, "app": r["app_name"], "fingerprint": r["fingerprint"]}
+        ts = r["aggregated_ts"]
+        writer.sample("crdb_run_stmt_executions", labels, r["executions"], ts)
+        writer.sample("crdb_run_stmt_service_latency_seconds", labels, r["latency"], ts)
+        writer.sample("crdb_run_stmt_retries", labels, r["retries"], ts)
+        writer.sample("crdb_run_stmt_failures", labels, r["failures"], ts)
+        if r["fingerprint"] in queries:
+            first_seen.setdefault((r["app_name"], r["fingerprint"]), ts)
+    conn.commit()
+
+    for (app, fingerprint), ts in first_seen.items():
+        writer.sample("crdb_run_stmt_query", {"test_run": test_run, "app": app, "fingerprint": fingerprint,
+                                             "query": queries[fingerprint]}, 1, ts)
+
+    for r in stream(conn, SQL_TXNS.format(apps=apps), (top_txns, test_run)):
+        labels = {"test_run": test_run, "app": r["app_name"], "fingerprint": r["fingerprint"]}
+        ts = r["aggregated_ts"]
+        writer.sample("crdb_run_txn_executions", labels, r["executions"], ts)
+        writer.sample("crdb_run_txn_service_latency_seconds", labels, r["latency"], ts)
+        writer.sample("crdb_run_txn_max_retries", labels, r["max_retries"], ts)
+    conn.commit()
+
+    for r in stream(conn, SQL_CONTENTION, (step, step, tables, test_run)):
+        labels = {"test_run": test_run, "table": r["tbl"]}
+        writer.sample("crdb_run_contention_events", labels, r["events"], r["ts"])
+        writer.sample("crdb_run_contention_seconds", labels, r["seconds"], r["ts"])
+    conn.commit()
+
+    log.info("Exported %s: %d samples, %d statement and %d transaction fingerprints, %d tables (+ other)",
+             test_run, writer.samples - samples, len(top_stmts), len(top_txns), len(tables))
+
+def create_blocks(path, blocks_dir):
+    promtool = shutil.which("promtool")
+    if not promtool:
+        raise SystemExit("promtool not found on PATH, load the file with "
+                         f"'promtool tsdb create-blocks-from openmetrics {path} {blocks_dir}'")
+    subprocess.run([promtool, "tsdb", "create-blocks-from", "openmetrics", path, blocks_dir], check=True)
+    log.info("TSDB blocks written to %s", blocks_dir)
+
+# ==========================================================
+# MAIN
+# ==========================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export persisted test runs as OpenMetrics for a Prometheus backfill")
+    parser.add_argument("test_runs", nargs="+")
+    parser.add_argument("--out", default="runs.om", help="OpenMetrics file to write")
+    parser.add_argument("--top", type=int, default=20,
+                        help="fingerprints per run kept by name, by total service time (the rest are 'other')")
+    parser.add_argument("--top-tables", type=int, default=10,
+                        help="contended tables per run kept by name, by contention time (the rest are 'other')")
+    parser.add_argument("--step", type=int, default=60, help="contention aggregation step in seconds")
+    parser.add_argument("--include-internal", action="store_true", help="keep '$ internal' apps")
+    parser.add_argument("--blocks", help="also create TSDB blocks in this directory with promtool")
+    args = parser.parse_args(argv)
+
+    if not DATABASE_URL:
+        raise SystemExit("DATABASE_URL is not set")
+
+    with tempfile.TemporaryDirectory(prefix="openmetrics-") as spool_dir, \
+            psycopg.connect(DATABASE_URL) as conn:
+        writer = OpenMetricsWriter(spool_dir)
+        for test_run in args.test_runs:
+            export_run(conn, writer, test_run, args.top, args.top_tables, args.step, args.include_internal)
+        with open(args.out, "w") as out:
+            writer.close(out)
+    log.info("Wrote %d samples to %s", writer.samples, args.out)
+
+    if args.blocks:
+        create_blocks(args.out, args.blocks)
+
+if __name__ == "__main__":
+    sys.exit(main())
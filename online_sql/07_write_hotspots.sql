@@ -31,4 +31,23 @@ WHERE fq_name IS NOT NULL
   AND fq_name NOT LIKE 'system.%'
   AND fq_name NOT LIKE 'crdb_internal.%'
 GROUP BY 1,2
-ORDER BY approx_rows_written DESC;
\ No newline at end of file
+ORDER BY approx_rows_written DESC;
+
+
+-- Persisted variant: the same rollup over a test run the daemon has copied, joined to the
+-- tables it parsed from each fingerprint at ingest (workload_test.stmt_table_refs), so the
+-- query text isn't scanned again and a table is never matched on part of its name
+SELECT
+  r.database_name || '.' || r.schema_name || '.' || r.table_name      AS table_identifier,
+  r.table_name                                                        AS table_name,
+  sum((s.statistics->'statistics'->>'cnt')::float
+      * coalesce((s.statistics->'statistics'->'rowsWritten'->>'mean')::float, 0))::bigint
+                                                                      AS approx_rows_written
+FROM workload_test.cluster_statement_statistics AS s
+JOIN workload_test.stmt_table_refs AS r
+  ON r.fingerprint_id = s.fingerprint_id
+ AND r.access_kind = 'write'
+WHERE s.test_run = 'load_test_2026_02_19'
+  AND coalesce((s.statistics->'statistics'->'rowsWritten'->>'mean')::float, 0) > 0
+GROUP BY 1,2
+ORDER BY approx_rows_written DESC;
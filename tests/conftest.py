@@ -0,0 +1,48 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load(name, filename):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def daemon(tmp_path_factory):
+    """02_copy_obs_data.py loaded once per session (its prometheus metrics are global)."""
+    pytest.importorskip("psycopg")
+    pytest.importorskip("prometheus_client")
+    os.environ.setdefault("LOG_FILE", str(tmp_path_factory.mktemp("logs") / "copy_obs_data.log"))
+    return _load("copy_obs_data", "02_copy_obs_data.py")
+
+
+@pytest.fixture(scope="session")
+def transactions():
+    """transactions.py, the dbworkload class and its helpers."""
+    pytest.importorskip("psycopg")
+    return _load("transactions", "transactions.py")
+
+
+class FakeConn:
+    """Stands in for a daemon connection whose statements are all monkeypatched away."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def no_db(daemon, monkeypatch):
+    monkeypatch.setattr(daemon, "get_connection", FakeConn)
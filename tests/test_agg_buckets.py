@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture
+def bucket_db(daemon, no_db, monkeypatch):
+    """agg_bucket_state and ingest_state in memory; each bucket changes once, on its first pass."""
+    state = {"closed": set(), "synced": set(), "watermark": None}
+
+    def fetchall(conn, sql, params=None):
+        assert sql is daemon.SQL_CLOSED_BUCKETS
+        return [{"aggregated_ts": b} for b in state["closed"]]
+
+    def execute(conn, sql, params=None):
+        assert sql is daemon.SQL_TOUCH_BUCKET
+        if params[3] is not None:
+            state["closed"].add(params[2])
+        return 1
+
+    def sync_bucket(conn, run, stream, bucket):
+        if bucket in state["synced"]:
+            return 0, 0
+        state["synced"].add(bucket)
+        return 1, 1
+
+    def set_watermark(conn, test_run, stream, ts):
+        state["watermark"] = ts
+
+    monkeypatch.setattr(daemon, "fetchall", fetchall)
+    monkeypatch.setattr(daemon, "execute", execute)
+    monkeypatch.setattr(daemon, "sync_bucket", sync_bucket)
+    monkeypatch.setattr(daemon, "set_watermark", set_watermark)
+    monkeypatch.setattr(daemon, "fence_lease", lambda *a: None)
+    monkeypatch.setattr(daemon, "mark_rows_landed", lambda *a: None)
+    monkeypatch.setattr(daemon, "COMMIT_CHUNK_SECONDS", 0)
+    return state
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_last_bucket_closes_and_watermark_reaches_final_ts(daemon, bucket_db, monkeypatch, chunked):
+    if chunked:
+        monkeypatch.setattr(daemon, "COMMIT_CHUNK_SECONDS", 60)
+    start = datetime(2026, 2, 19, 8, 0, tzinfo=timezone.utc)
+    run = daemon.TestRun("r", "schedules", start, start.replace(hour=10, minute=30),
+                         timedelta(minutes=70), None)
+    final_ts = run.end_time + run.agg_grace_interval
+
+    now = start
+    while now < start + timedelta(hours=10):
+        daemon.process_agg_buckets(run, "stmt_stats", now)
+        now += timedelta(minutes=15)
+
+    assert bucket_db["watermark"] == final_ts
+    assert bucket_db["closed"] == {start, start.replace(hour=9), start.replace(hour=10)}
+
+
+def test_open_bucket_holds_watermark_before_final_ts(daemon, bucket_db):
+    start = datetime(2026, 2, 19, 8, 0, tzinfo=timezone.utc)
+    run = daemon.TestRun("r", "schedules", start, start.replace(hour=10, minute=30),
+                         timedelta(minutes=70), None)
+
+    daemon.process_agg_buckets(run, "stmt_stats", start.replace(hour=9, minute=10))
+    daemon.process_agg_buckets(run, "stmt_stats", start.replace(hour=9, minute=20))
+
+    # 08:00 closes 15 minutes after its hour, 09:00 is still filling
+    assert bucket_db["closed"] == {start}
+    assert bucket_db["watermark"] < run.end_time
@@ -0,0 +1,83 @@
+import pytest
+
+
+class SqlError(Exception):
+    def __init__(self, sqlstate):
+        super().__init__(sqlstate)
+        self.sqlstate = sqlstate
+
+
+@pytest.mark.parametrize("exc,expected", [
+    (SqlError("40001"), "retryable"),
+    (SqlError("40P01"), "retryable"),
+    (SqlError("08006"), "connection"),
+    (SqlError("57P01"), "connection"),
+    (ConnectionRefusedError(), "connection"),
+    (SqlError("42703"), "schema"),
+    (SqlError("22P02"), "other"),
+    (ValueError("boom"), "other"),
+])
+def test_classify_error(daemon, exc, expected):
+    assert daemon.classify_error(exc) == expected
+
+
+@pytest.fixture
+def clock(daemon, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(daemon.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(daemon.random, "uniform", lambda a, b: 1.0)
+    monkeypatch.setattr(daemon, "BREAKER_POLICIES", {
+        "retryable": (3, 5, 60), "connection": (2, 10, 120), "schema": (1, 300, 3600), "other": (3, 30, 600),
+    })
+    return now
+
+
+def test_opens_after_threshold_and_probes_after_backoff(daemon, clock):
+    breakers = daemon.Breakers()
+    for _ in range(2):
+        breakers.failure("r", "contention", SqlError("40001"))
+        assert breakers.allow("r", "contention")
+    breakers.failure("r", "contention", SqlError("40001"))
+    b = breakers.breakers[("r", "contention")]
+    assert b.state == daemon.BREAKER_OPEN and b.retry_at == 1005.0
+    assert not breakers.allow("r", "contention")
+    # other streams are unaffected
+    assert breakers.allow("r", "insights")
+
+    clock[0] = 1005.0
+    assert breakers.allow("r", "contention")
+    assert b.state == daemon.BREAKER_HALF_OPEN
+
+    breakers.success("r", "contention")
+    assert b.state == daemon.BREAKER_CLOSED and b.failures == 0 and b.trips == 0
+
+
+def test_failed_probe_reopens_for_twice_as_long_up_to_the_cap(daemon, clock):
+    breakers = daemon.Breakers()
+    for _ in range(2):
+        breakers.failure("r", "insights", ConnectionRefusedError())
+    b = breakers.breakers[("r", "insights")]
+    delays = []
+    for _ in range(6):
+        delays.append(b.retry_at - clock[0])
+        clock[0] = b.retry_at
+        assert breakers.allow("r", "insights")
+        breakers.failure("r", "insights", ConnectionRefusedError())
+        assert b.state == daemon.BREAKER_OPEN
+    assert delays == [10, 20, 40, 80, 120, 120]
+
+
+def test_schema_error_opens_at_once_and_drops_the_catalog(daemon, clock, monkeypatch):
+    monkeypatch.setitem(daemon._catalogs, "stmt_stats", object())
+    breakers = daemon.Breakers()
+    breakers.failure("r", "stmt_stats", SqlError("42703"))
+    assert breakers.breakers[("r", "stmt_stats")].state == daemon.BREAKER_OPEN
+    assert "stmt_stats" not in daemon._catalogs
+
+
+def test_prune_forgets_finished_runs(daemon, clock):
+    breakers = daemon.Breakers()
+    breakers.failure("old", "contention", ValueError())
+    breakers.failure("new", "contention", ValueError())
+    breakers.prune({"new"})
+    assert list(breakers.breakers) == [("new", "contention")]
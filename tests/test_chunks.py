@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+T0 = datetime(2026, 2, 19, 8, 0, tzinfo=timezone.utc)
+
+
+class Serialization(Exception):
+    sqlstate = "40001"
+
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def slice_db(daemon, no_db, monkeypatch):
+    """Records the chunks ingest_stream is asked for and the watermarks that commit."""
+    state = {"calls": [], "watermarks": [], "fail": set()}
+
+    def ingest_stream(tx, stream, run, from_ts, to_ts):
+        state["calls"].append((from_ts, to_ts))
+        if len(state["calls"]) in state["fail"]:
+            raise Serialization()
+        return 1
+
+    def set_watermark(tx, test_run, stream, ts):
+        tx.watermark = ts
+
+    class Conn(type(daemon.get_connection())):
+        watermark = None
+
+        def commit(self):
+            state["watermarks"].append(self.watermark)
+
+    monkeypatch.setattr(daemon, "get_connection", Conn)
+    monkeypatch.setattr(daemon, "ingest_stream", ingest_stream)
+    monkeypatch.setattr(daemon, "set_watermark", set_watermark)
+    monkeypatch.setattr(daemon, "fence_lease", lambda *a: None)
+    monkeypatch.setattr(daemon, "mark_rows_landed", lambda *a: None)
+    monkeypatch.setattr(daemon.time, "sleep", lambda s: None)
+    monkeypatch.setattr(daemon, "COMMIT_CHUNK_SECONDS", 10)
+    monkeypatch.setattr(daemon, "COMMIT_RETRIES", 3)
+    return state
+
+
+def _run(daemon):
+    return daemon.TestRun("r", "schedules", T0, at(3600), timedelta(minutes=70), None)
+
+
+def test_slice_commits_in_chunks_with_a_watermark_each(daemon, slice_db):
+    assert daemon.ingest_slice(_run(daemon), "contention", at(0), at(25)) == 3
+    assert slice_db["watermarks"] == [at(10), at(20), at(25)]
+
+
+def test_retry_halves_the_chunk_and_later_chunks_grow_back(daemon, slice_db):
+    slice_db["fail"] = {2}          # the first attempt of the second chunk
+    daemon.ingest_slice(_run(daemon), "contention", at(0), at(40))
+    assert slice_db["calls"] == [
+        (at(0), at(10)),
+        (at(10), at(20)), (at(10), at(15)),     # retried at half width
+        (at(15), at(20)),                       # next chunk starts at half width
+        (at(20), at(30)), (at(30), at(40)),     # then doubles back to full
+    ]
+    assert slice_db["watermarks"] == [at(10), at(15), at(20), at(30), at(40)]
+
+
+def test_chunks_never_shrink_below_min_chunk(daemon, slice_db, monkeypatch):
+    monkeypatch.setattr(daemon, "COMMIT_CHUNK_SECONDS", 2)
+    slice_db["fail"] = {1, 2, 3}
+    daemon.ingest_slice(_run(daemon), "contention", at(0), at(2))
+    widths = [(to - frm).total_seconds() for frm, to in slice_db["calls"]]
+    assert widths == [2, 1, 1, 1, 1]      # three retries at the floor, then the rest at the floor
+
+
+def test_exhausted_retries_keep_earlier_chunks(daemon, slice_db):
+    slice_db["fail"] = {2, 3, 4, 5}
+    with pytest.raises(Serialization):
+        daemon.ingest_slice(_run(daemon), "contention", at(0), at(30))
+    assert slice_db["watermarks"] == [at(10)]
+
+
+def test_lease_lost_is_not_retried(daemon, slice_db, monkeypatch):
+    def fence_lease(tx, test_run, stream):
+        raise daemon.LeaseLost(f"{test_run}/{stream}")
+
+    monkeypatch.setattr(daemon, "fence_lease", fence_lease)
+    with pytest.raises(daemon.LeaseLost):
+        daemon.ingest_slice(_run(daemon), "contention", at(0), at(30))
+    assert len(slice_db["calls"]) == 1 and slice_db["watermarks"] == []
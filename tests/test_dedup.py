@@ -0,0 +1,33 @@
+def test_dedup_key_separates_none_empty_and_text(daemon):
+    keys = {daemon._dedup_key(v) for v in (None, "", "None", "x", b"x")}
+    # str and bytes of the same value are the same key, the source hands back either
+    assert len(keys) == 4
+    assert daemon._dedup_key("x") == daemon._dedup_key("x")
+
+
+def test_dedup_key_parts_do_not_run_together(daemon):
+    assert daemon._dedup_key("ab", "c") != daemon._dedup_key("a", "bc")
+    assert daemon._dedup_key("a", None) != daemon._dedup_key("a")
+
+
+def _insight(error):
+    return {"txn_fingerprint_id": b"\x01", "stmt_fingerprint_id": b"\x02", "status": "Failed",
+            "app_name": "app", "last_error_redactable": error}
+
+
+def test_insight_key_mirrors_unique_constraint(daemon):
+    # COALESCE(last_error_redactable, '<<NULL>>'): NULL and '' are distinct rows,
+    # NULL and the literal sentinel are the same row
+    assert daemon.insight_key(_insight(None)) != daemon.insight_key(_insight(""))
+    assert daemon.insight_key(_insight(None)) == daemon.insight_key(_insight("<<NULL>>"))
+    assert daemon.insight_key(_insight("boom")) != daemon.insight_key(_insight(""))
+
+
+def test_dedup_cache_evicts_least_recently_seen(daemon):
+    cache = daemon.DedupCache(2)
+    cache.add(b"a")
+    cache.add(b"b")
+    assert cache.seen(b"a")
+    cache.add(b"c")
+    assert cache.seen(b"a") and cache.seen(b"c")
+    assert not cache.seen(b"b")
@@ -0,0 +1,14 @@
+import socket
+
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_flush_without_a_daemon_reports_and_fails(daemon, capsys):
+    rc = daemon.flush_cli(["r", "--host", "127.0.0.1", "--port", str(_closed_port()), "--timeout", "1"])
+    assert rc == 2
+    err = capsys.readouterr().err
+    assert err.startswith("flush: no reply from 127.0.0.1:") and "\n" == err[-1] and err.count("\n") == 1
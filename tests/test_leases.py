@@ -0,0 +1,44 @@
+import pytest
+
+
+def _keys(runs, streams=("contention", "insights", "stmt_stats", "txn_stats")):
+    return [(r, s) for r in runs for s in streams]
+
+
+def test_fair_share_is_rounded_up(daemon):
+    keys = _keys(["a", "b"])          # 8 keys
+    release, deficit = daemon.plan_leases(keys, {}, 3)
+    assert release == [] and deficit == 3
+
+
+def test_inactive_leases_are_released_first(daemon):
+    keys = _keys(["a"])               # 4 keys, share 2 of 2 replicas
+    owned = {("gone", "contention"): 1, ("a", "contention"): 1, ("a", "insights"): 1, ("a", "stmt_stats"): 1}
+    release, deficit = daemon.plan_leases(keys, owned, 2)
+    assert release == [("gone", "contention"), ("a", "stmt_stats")]
+    assert deficit == 0
+
+
+def test_a_single_replica_takes_everything(daemon):
+    keys = _keys(["a", "b"])
+    release, deficit = daemon.plan_leases(keys, {keys[0]: 1}, 1)
+    assert release == [] and deficit == len(keys) - 1
+
+
+@pytest.mark.parametrize("replicas,runs", [(2, 3), (3, 2), (5, 1)])
+def test_replicas_converge_to_disjoint_balanced_shares(daemon, replicas, runs):
+    keys = _keys([f"run{i}" for i in range(runs)])
+    # replica 0 starts out holding every lease, the others join empty
+    owned = [dict.fromkeys(keys, 1)] + [{} for _ in range(replicas - 1)]
+    for _ in range(replicas + 1):
+        for mine in owned:
+            release, deficit = daemon.plan_leases(keys, mine, replicas)
+            for key in release:
+                del mine[key]
+            held = {k for other in owned for k in other}
+            for key in [k for k in keys if k not in held][:max(deficit, 0)]:
+                mine[key] = 1
+    held = [k for mine in owned for k in mine]
+    assert sorted(held) == sorted(keys)
+    share = -(-len(keys) // replicas)
+    assert all(len(mine) <= share for mine in owned)
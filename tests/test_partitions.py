@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.mark.parametrize("key_lo,key_hi", [(0, 2 ** 128), (1, 100001), (5000, 5007)])
+def test_partitions_cover_the_key_range_once(transactions, key_lo, key_hi):
+    total = 4
+    covered = []
+    for id in range(total):
+        for lo, hi in transactions.partition_bounds(id, total, 0, key_lo, key_hi):
+            assert key_lo <= lo < hi <= key_hi
+            covered.append((lo, hi))
+    covered.sort()
+    assert covered[0][0] == key_lo and covered[-1][1] == key_hi
+    assert all(a[1] == b[0] for a, b in zip(covered, covered[1:]))
+
+
+def test_overlap_reaches_into_the_next_share_and_wraps(transactions):
+    (lo, hi), = transactions.partition_bounds(0, 4, 50, 0, 400)
+    assert (lo, hi) == (0, 150)
+    assert transactions.partition_bounds(3, 4, 50, 0, 400) == [(300, 400), (0, 50)]
+
+
+def test_too_many_threads_for_the_key_range(transactions):
+    with pytest.raises(ValueError):
+        transactions.partition_bounds(0, 8, 0, 10, 14)
+
+
+def test_key_int_accepts_uuid_and_int(transactions):
+    import uuid
+    assert transactions.key_int(uuid.UUID(int=42)) == 42
+    assert transactions.key_int(42) == 42
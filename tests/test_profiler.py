@@ -0,0 +1,20 @@
+
+def test_profile_signal_only_raises_a_flag(daemon, monkeypatch, tmp_path):
+    profiler = daemon.LoopProfiler()
+    monkeypatch.setattr(daemon, "profiler", profiler)
+    monkeypatch.setattr(daemon, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(daemon, "PROFILE_LOOPS", 2)
+
+    calls = []
+    monkeypatch.setattr(daemon.log, "handle", lambda record: calls.append(record.getMessage()))
+    daemon._handle_profile_signal(None, None)
+    assert profiler.signalled and not profiler.requested and not calls
+
+    # the loop arms the capture, logs, and runs it for PROFILE_LOOPS loops
+    for _ in range(2):
+        profiler.begin_loop()
+        assert profiler.profile is not None
+        profiler.end_loop()
+    assert not profiler.signalled and profiler.profile is None
+    assert any("Profiling requested" in c for c in calls)
+    assert len(list(tmp_path.glob("*.pstats"))) == 1
@@ -0,0 +1,49 @@
+import pytest
+
+CASES = [
+    (
+        "SELECT id FROM flights AS f JOIN movr.bookings b ON b.flight_id = f.id WHERE f.id = $1",
+        {("movr", "public", "flights", "read"), ("movr", "public", "bookings", "read")},
+    ),
+    (
+        "SELECT * FROM a, sched.b, other.public.c",
+        {("movr", "public", "a", "read"), ("movr", "sched", "b", "read"), ("other", "public", "c", "read")},
+    ),
+    (
+        "INSERT INTO bookings(id, flight_id) SELECT $1, id FROM flights",
+        {("movr", "public", "bookings", "write"), ("movr", "public", "flights", "read")},
+    ),
+    ("UPSERT INTO seats VALUES ($1, $2)", {("movr", "public", "seats", "write")}),
+    ("UPDATE seats SET taken = true WHERE id = $1", {("movr", "public", "seats", "write")}),
+    ("DELETE FROM seats WHERE id = $1", {("movr", "public", "seats", "write")}),
+    (
+        "SELECT id FROM flights WHERE id = $1 FOR UPDATE",
+        {("movr", "public", "flights", "read")},
+    ),
+    (
+        'SELECT "Id" FROM "Mixed""Case" AS OF SYSTEM TIME follower_read_timestamp()',
+        {("movr", "public", 'Mixed"Case', "read")},
+    ),
+    (
+        "WITH recent AS (SELECT id FROM flights) SELECT * FROM recent JOIN seats s ON true",
+        {("movr", "public", "flights", "read"), ("movr", "public", "seats", "read")},
+    ),
+    (
+        "SELECT extract(hour FROM ts), substring(s FROM 2) FROM events",
+        {("movr", "public", "events", "read")},
+    ),
+    (
+        "SELECT * FROM (SELECT id FROM flights) AS sub",
+        {("movr", "public", "flights", "read")},
+    ),
+    ("SELECT * FROM crdb_internal.node_runtime_info", set()),
+    ("SELECT * FROM system.jobs", set()),
+    ("SELECT * FROM generate_series(1, 10)", set()),
+    ("SELECT 1", set()),
+    (None, set()),
+]
+
+
+@pytest.mark.parametrize("query, refs", CASES)
+def test_parse_table_refs(daemon, query, refs):
+    assert daemon.parse_table_refs(query, "movr") == refs
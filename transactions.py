@@ -1,6 +1,197 @@
 import psycopg
+import atexit
+import importlib.util
+import json
+import os
 import random
+import socket
+import threading
 import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+# one embedded collector per workload process, started by the thread with id 0
+_collector = None
+_collector_lock = threading.Lock()
+
+def start_collector(url: str, test_run: str, interval_ms: int, delay_ms: int):
+    """
+    Load 02_copy_obs_data.py into this process and start its EmbeddedCollector for
+    test_run.  Its overhead is printed separately when the process exits.
+    """
+    global _collector
+    with _collector_lock:
+        if _collector is not None:
+            return _collector
+        os.environ.setdefault("LOG_FILE", "copy_obs_data_collector.log")
+        # pinned leases are only taken from daemon replicas, never from another collector
+        os.environ["REPLICA_ID"] = f"collector:{socket.gethostname()}-{os.getpid()}"
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "02_copy_obs_data.py")
+        spec = importlib.util.spec_from_file_location("copy_obs_data", path)
+        daemon = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(daemon)
+        daemon.DATABASE_URL = url
+
+        _collector = daemon.EmbeddedCollector(test_run, interval_ms / 1000, delay_ms / 1000)
+        _collector.start()
+        atexit.register(_stop_collector)
+        return _collector
+
+def _stop_collector():
+    print(f"Collector overhead: {json.dumps(_collector.stop())}")
+
+
+def key_int(key) -> int:
+    """flight_id as an integer, a UUID by its 128 bits or an INT as is."""
+    return key.int if isinstance(key, uuid.UUID) else int(key)
+
+def partition_bounds(id: int, total: int, overlap_pct: float, key_lo: int, key_hi: int):
+    """
+    Key ranges [lo, hi) owned by thread id out of total: an equal share of the key
+    range [key_lo, key_hi), widened by overlap_pct of its width into the next
+    thread's share (wrapping around after the last).  Shares hold equal numbers of
+    flights only when flight_id is spread evenly over its range, as random UUIDs
+    and dense sequences are.
+    """
+    space = key_hi - key_lo
+    width = space // total
+    if width == 0:
+        raise ValueError(f"{total} threads can't split a key range of {space} flight_ids")
+    lo = id * width
+    hi = (space if id == total - 1 else lo + width) + int(width * overlap_pct / 100)
+    hi = min(hi, lo + space)
+    if hi <= space:
+        return [(key_lo + lo, key_lo + hi)]
+    return [(key_lo + lo, key_hi), (key_lo, key_lo + hi - space)]
+
+# client latency histograms: 32 linear sub-buckets per power of two microseconds
+SUB_BUCKET_BITS = 5
+
+def latency_bucket(us: int) -> int:
+    """Lower bound of the HDR-style bucket holding us, within 1/32 of the value."""
+    shift = max(0, us.bit_length() - 1 - SUB_BUCKET_BITS)
+    return (us >> shift) << shift
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = self.max_us = 0
+
+    def record(self, us: int):
+        bucket = latency_bucket(us)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.min_us = min(self.min_us, us) if self.count else us
+        self.max_us = max(self.max_us, us)
+        self.count += 1
+        self.total_us += us
+
+    def percentile(self, p: float) -> float:
+        """Midpoint of the bucket holding the p-th percentile, in ms."""
+        rank, seen = p / 100 * self.count, 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                width = 1 << max(0, bucket.bit_length() - 1 - SUB_BUCKET_BITS)
+                return min((bucket + width / 2), self.max_us) / 1000
+        return self.max_us / 1000
+
+class LatencyRecorder:
+    """
+    Per-second latency histograms of each op, shared by the threads of a workload
+    process.  A background thread writes every completed second to
+    workload_test.client_latency in one batch per flush_ms, keyed by this process's
+    client_id, so the writes stay off the threads being measured.
+    """
+
+    def __init__(self, url: str, test_run: str, flush_ms: int):
+        self.url = url
+        self.test_run = test_run
+        self.flush_seconds = flush_ms / 1000
+        self.client_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.lock = threading.Lock()
+        self.seconds = {}       # (op, epoch second) -> LatencyHistogram
+        self.stop_event = threading.Event()
+        self.rows = self.errors = 0
+        self.thread = threading.Thread(target=self._run, name="latency-flush", daemon=True)
+
+    def record(self, op: str, seconds: float):
+        now = time.time()
+        with self.lock:
+            hist = self.seconds.get((op, int(now)))
+            if hist is None:
+                hist = self.seconds[(op, int(now))] = LatencyHistogram()
+            hist.record(max(1, int(seconds * 1_000_000)))
+
+    def _take(self, everything: bool = False):
+        current = int(time.time())
+        with self.lock:
+            done = [k for k in self.seconds if everything or k[1] < current]
+            return [(k, self.seconds.pop(k)) for k in done]
+
+    def _run(self):
+        conn = None
+        while not self.stop_event.wait(self.flush_seconds):
+            conn = self._flush(conn, self._take())
+        conn = self._flush(conn, self._take(everything=True))
+        if conn is not None:
+            conn.close()
+
+    def _flush(self, conn, batch):
+        if not batch:
+            return conn
+        rows = [
+            (self.test_run, op, datetime.fromtimestamp(second, timezone.utc), self.client_id,
+             h.count, h.total_us / h.count / 1000, h.min_us / 1000,
+             h.percentile(50), h.percentile(90), h.percentile(99), h.max_us / 1000,
+             json.dumps({str(b): n for b, n in sorted(h.counts.items())}))
+            for (op, second), h in batch
+        ]
+        try:
+            if conn is None or conn.closed:
+                conn = psycopg.connect(self.url, autocommit=True)
+            with conn.cursor() as cur:
+                cur.executemany("""
+UPSERT INTO workload_test.client_latency
+  (test_run, op, second, client_id, count, mean_ms, min_ms, p50_ms, p90_ms, p99_ms, max_ms, histogram)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+""", rows)
+            self.rows += len(rows)
+        except Exception as e:
+            # the workload goes on, a lost second only leaves a gap in the timeline
+            self.errors += 1
+            print(f"Client latency flush of {len(rows)} rows failed: {e}")
+            conn = None
+        return conn
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, timeout: float = 30.0) -> dict:
+        self.stop_event.set()
+        self.thread.join(timeout)
+        return {"test_run": self.test_run, "client_id": self.client_id,
+                "rows": self.rows, "errors": self.errors}
+
+# one latency recorder per workload process, shared by all its threads
+_recorder = None
+_recorder_lock = threading.Lock()
+
+def start_recorder(url: str, test_run: str, flush_ms: int):
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = LatencyRecorder(url, test_run, flush_ms)
+            _recorder.start()
+            atexit.register(_stop_recorder)
+        return _recorder
+
+def _stop_recorder():
+    print(f"Client latency: {json.dumps(_recorder.stop())}")
 
 class Transactions:
 
@@ -15,6 +206,29 @@ class Transactions:
         self.batch_size: int = int(args.get("batch_size", 16))
         self.delay: int = int(args.get("delay", 100))
 
+        # optionally ingest this run's contention events and insights from inside the workload
+        self.test_run: str = args.get("test_run", "")
+        self.collector: bool = str(args.get("collector", "false")).lower() in ("1", "true", "yes")
+        self.collector_interval_ms: int = int(args.get("collector_interval_ms", 500))
+        self.collector_delay_ms: int = int(args.get("collector_delay_ms", 1000))
+        self.collector_url: str = args.get("collector_url") or os.getenv("DATABASE_URL", "")
+
+        # optionally keep per-second client latency histograms of each op in workload_test.client_latency
+        self.latency: bool = str(args.get("latency", "false")).lower() in ("1", "true", "yes")
+        self.latency_flush_ms: int = int(args.get("latency_flush_ms", 1000))
+        self.recorder = None
+
+        # partition mode: each thread samples flights from its own key range, so contention only
+        # comes from overlap_pct (% of a range shared with the next thread) and hot_key_fraction
+        # (share of each batch drawn from hot_keys flights that every thread updates)
+        self.partition: bool = str(args.get("partition", "false")).lower() in ("1", "true", "yes")
+        self.overlap_pct: float = float(args.get("overlap_pct", 0))
+        self.hot_key_fraction: float = float(args.get("hot_key_fraction", 0))
+        self.hot_keys: int = int(args.get("hot_keys", 16))
+        # seeds each thread's choices (seed + thread id) so runs are repeatable
+        self.seed = args.get("seed")
+        self.rng = random.Random()
+
         # you can arbitrarely add any variables you want
         self.counter: int = 0
 
@@ -25,12 +239,72 @@ class Transactions:
     # Also, the function is a vector to receive the excuting threads's unique id and the total thread count
     def setup(self, conn: psycopg.Connection, id: int, total_thread_count: int):
         self.id = id
+        self.total_thread_count = total_thread_count
+        if self.seed is not None:
+            self.rng.seed(int(self.seed) + id)
         with conn.cursor() as cur:
             print(
                 f"My thread ID is {id}. The total count of threads is {total_thread_count}"
             )
             print(cur.execute(f"select version()").fetchone()[0])
 
+            if self.partition:
+                # split the keys that exist rather than assume a type or a distribution
+                lo_key, hi_key = cur.execute("""
+SELECT min(flight_id), max(flight_id)
+FROM flights
+AS OF SYSTEM TIME follower_read_timestamp();
+""").fetchone()
+                if lo_key is None:
+                    raise ValueError("partition requires a populated flights table")
+                self.to_key = (lambda k: uuid.UUID(int=k)) if isinstance(lo_key, uuid.UUID) else int
+                self.key_hi = key_int(hi_key) + 1
+                self.ranges = partition_bounds(id, total_thread_count, self.overlap_pct,
+                                               key_int(lo_key), self.key_hi)
+                self.hot = []
+                if self.hot_key_fraction > 0:
+                    # the first flight at or after evenly spaced points of the key range,
+                    # so the hot keys fall in every thread's partition alike
+                    space = self.key_hi - key_int(lo_key)
+                    for k in range(self.hot_keys):
+                        row = cur.execute("""
+SELECT flight_id
+FROM flights
+AS OF SYSTEM TIME follower_read_timestamp()
+WHERE flight_id >= %s
+ORDER BY flight_id
+LIMIT 1;
+""", (self.to_key(key_int(lo_key) + space * k // self.hot_keys),)).fetchone()
+                        if row and row[0] not in self.hot:
+                            self.hot.append(row[0])
+                ranges = ", ".join(f"[{self.to_key(lo)}, {self.to_key(hi - 1)}]" for lo, hi in self.ranges)
+                print(f"Thread {id} owns flight_id {ranges}, {len(self.hot)} hot keys at {self.hot_key_fraction:.0%}")
+
+        if self.collector and id == 0:
+            if not self.test_run:
+                raise ValueError("collector requires a test_run")
+            # the workload connection's dsn carries no password, pass collector_url if you need one
+            start_collector(self.collector_url or conn.info.dsn, self.test_run,
+                            self.collector_interval_ms, self.collector_delay_ms)
+
+        if self.latency:
+            if not self.test_run:
+                raise ValueError("latency requires a test_run")
+            self.recorder = start_recorder(self.collector_url or conn.info.dsn, self.test_run,
+                                           self.latency_flush_ms)
+
+
+
+    # time the database work of an op, without its think time
+    @contextmanager
+    def timed(self, op: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.recorder:
+                self.recorder.record(op, time.perf_counter() - start)
+
 
 
     # the run() function returns a list of functions
@@ -45,6 +319,8 @@ class Transactions:
     # conn is an instance of a psycopg connection object
     # conn is set by default with autocommit=True, so no need to send a commit message
     def flights(self, conn: psycopg.Connection):
+        if self.partition:
+            return self.partition_flights(conn)
         query = f"""
 SELECT flight_id
 FROM flights
@@ -58,14 +334,44 @@ LIMIT {self.batch_size};
 
 
 
+    # a batch from this thread's key ranges: hot keys first, then consecutive
+    # flights from a random point in a range, wrapping around to its start
+    def partition_flights(self, conn: psycopg.Connection):
+        hot = sum(self.rng.random() < self.hot_key_fraction for _ in range(self.batch_size)) if self.hot else 0
+        flight_ids = self.rng.sample(self.hot, min(hot, len(self.hot)))
+
+        lo, hi = self.rng.choices(self.ranges, weights=[h - l for l, h in self.ranges])[0]
+        start = self.rng.randrange(lo, hi)
+        with conn.cursor() as cur:
+            for begin, end in ((start, hi), (lo, start)):
+                need = self.batch_size - len(flight_ids)
+                if need <= 0 or begin >= end:
+                    continue
+                bound = "AND flight_id < %s" if end < self.key_hi else ""
+                query = f"""
+SELECT flight_id
+FROM flights
+AS OF SYSTEM TIME follower_read_timestamp()
+WHERE flight_id >= %s {bound}
+ORDER BY flight_id
+LIMIT %s;
+"""
+                params = [self.to_key(begin)] + ([self.to_key(end)] if bound else []) + [need]
+                cur.execute(query, params)
+                flight_ids.extend(row[0] for row in cur if row[0] not in flight_ids)
+        return flight_ids
+
+
+
 
     # conn is an instance of a psycopg connection object
     # conn is set by default with autocommit=True, so no need to send a commit message
     def schedule(self, conn: psycopg.Connection):
-        if (random.randint(1, 100) <= self.schedule_freq):
-            flight_ids = self.flights(conn)
-            values = ','.join(f"%s" for i in range(len(flight_ids)))
-            query = f"""
+        if (self.rng.randint(1, 100) <= self.schedule_freq):
+            with self.timed("schedule"):
+                flight_ids = self.flights(conn)
+                values = ','.join(f"%s" for i in range(len(flight_ids)))
+                query = f"""
 UPDATE flights
 SET scheduled_departure = scheduled_departure
         + (
@@ -80,8 +386,8 @@ SET scheduled_departure = scheduled_departure
     updated_at = now()
 WHERE flight_id IN ({values});
 """
-            with conn.cursor() as cur:
-                cur.execute(query, tuple(flight_ids))
+                with conn.cursor() as cur:
+                    cur.execute(query, tuple(flight_ids))
             time.sleep(self.delay / 1000)
 
 
@@ -89,10 +395,11 @@ WHERE flight_id IN ({values});
     # conn is an instance of a psycopg connection object
     # conn is set by default with autocommit=True, so no need to send a commit message
     def status(self, conn: psycopg.Connection):
-        if (random.randint(1, 100) <= self.status_freq):
-            flight_ids = self.flights(conn)
-            values = ','.join(f"%s" for i in range(len(flight_ids)))
-            query = f"""
+        if (self.rng.randint(1, 100) <= self.status_freq):
+            with self.timed("status"):
+                flight_ids = self.flights(conn)
+                values = ','.join(f"%s" for i in range(len(flight_ids)))
+                query = f"""
 UPDATE flight_status
 SET status = (
         ARRAY['on_time','delayed','cancelled']
@@ -100,8 +407,8 @@ SET status = (
     updated_at = now()
 WHERE flight_id IN ({values});
 """
-            with conn.cursor() as cur:
-                cur.execute(query, tuple(flight_ids))
+                with conn.cursor() as cur:
+                    cur.execute(query, tuple(flight_ids))
             time.sleep(self.delay / 1000)
 
 
@@ -109,17 +416,18 @@ WHERE flight_id IN ({values});
     # conn is an instance of a psycopg connection object
     # conn is set by default with autocommit=True, so no need to send a commit message
     def inventory(self, conn: psycopg.Connection):
-        if (random.randint(1, 100) <= self.inventory_freq):
-            flight_ids = self.flights(conn)
-            values = ','.join(f"%s" for i in range(len(flight_ids)))
-            query = f"""
+        if (self.rng.randint(1, 100) <= self.inventory_freq):
+            with self.timed("inventory"):
+                flight_ids = self.flights(conn)
+                values = ','.join(f"%s" for i in range(len(flight_ids)))
+                query = f"""
 UPDATE seat_inventory
 SET seats_available = (seats_available::FLOAT * (1 + (random()-0.25)/10))::INT,
     updated_at = now()
 WHERE flight_id IN ({values});
 """
-            with conn.cursor() as cur:
-                cur.execute(query, tuple(flight_ids))
+                with conn.cursor() as cur:
+                    cur.execute(query, tuple(flight_ids))
             time.sleep(self.delay / 1000)
 
 
@@ -127,17 +435,18 @@ WHERE flight_id IN ({values});
     # conn is an instance of a psycopg connection object
     # conn is set by default with autocommit=True, so no need to send a commit message
     def price(self, conn: psycopg.Connection):
-        if (random.randint(1, 100) <= self.price_freq):
-            flight_ids = self.flights(conn)
-            values = ','.join(f"%s" for i in range(len(flight_ids)))
-            query = f"""
+        if (self.rng.randint(1, 100) <= self.price_freq):
+            with self.timed("price"):
+                flight_ids = self.flights(conn)
+                values = ','.join(f"%s" for i in range(len(flight_ids)))
+                query = f"""
 UPDATE flight_prices
 SET price_usd = price_usd * (1 + (random()-0.5)/10)::DECIMAL,
     updated_at = now()
 WHERE flight_id IN ({values});
 """
-            with conn.cursor() as cur:
-                cur.execute(query, tuple(flight_ids))
+                with conn.cursor() as cur:
+                    cur.execute(query, tuple(flight_ids))
             time.sleep(self.delay / 1000)
 
 
@@ -146,15 +455,16 @@ WHERE flight_id IN ({values});
     # conn is an instance of a psycopg connection object
     # conn is set by default with autocommit=True, so no need to send a commit message
     def contention(self, conn: psycopg.Connection):
-        if (random.randint(1, 100) <= self.contention_freq):
+        if (self.rng.randint(1, 100) <= self.contention_freq):
             original_autocommit = conn.autocommit
             try:
                 conn.autocommit = False
-                with conn.cursor() as cur:
-                    cur.execute("SELECT * FROM airports WHERE city = 'City_1';")
-                    time.sleep(random.uniform(0.01, 0.05))
-                    cur.execute("UPDATE airports SET country = 'CRDB' WHERE city = 'City_1';")
-                conn.commit()
+                with self.timed("contention"):
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT * FROM airports WHERE city = 'City_1';")
+                        time.sleep(self.rng.uniform(0.01, 0.05))
+                        cur.execute("UPDATE airports SET country = 'CRDB' WHERE city = 'City_1';")
+                    conn.commit()
             except Exception as e:
                 print(f"Error occurred: {e}")
                 conn.rollback()